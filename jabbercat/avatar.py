@@ -1,7 +1,18 @@
 import abc
 import asyncio
+import bisect
+import collections
+import contextlib
 import functools
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import os
+import pathlib
+import time
+import types
 import typing
 import unicodedata
 
@@ -19,6 +30,10 @@ from . import Qt
 
 BASE_SIZE = 48
 
+# images are decoded at twice the base size so that they stay crisp on HiDPI
+# screens
+DECODED_AVATAR_SIZE = BASE_SIZE * 2
+
 AVATAR_DUMMY_PATH = Qt.QPainterPath()
 AVATAR_DUMMY_PATH.moveTo(2.4732999999999947, 0.006839999999982638)
 AVATAR_DUMMY_PATH.cubicTo(2.3338799999999935, 0.00283999999999196,
@@ -59,6 +74,15 @@ AVATAR_DUMMY_PATH.cubicTo(6.261529999999993, 2.528419999999983,
 AVATAR_DUMMY_PATH.lineTo(2.4732999999999947, 0.006839999999982638)
 
 
+def default_avatar_store_path() -> pathlib.Path:
+    """
+    Return the directory in which avatars are persisted by default.
+    """
+    return pathlib.Path(Qt.QStandardPaths.writableLocation(
+        Qt.QStandardPaths.CacheLocation,
+    )) / "avatars"
+
+
 def _connect(tokens, signal, cb):
     tokens.append((signal, signal.connect(cb)))
 
@@ -143,6 +167,33 @@ def render_dummy_avatar(font: Qt.QFont,
     return picture
 
 
+_DUMMY_AVATAR_CACHE = aioxmpp.cache.LRUDict()
+_DUMMY_AVATAR_CACHE.maxsize = 2048
+
+
+def get_dummy_avatar(font: Qt.QFont,
+                     name: str,
+                     size: float,
+                     colour_text: str=None):
+    """
+    Return a placeholder avatar as generated by :func:`render_dummy_avatar`.
+
+    The arguments are the same as for :func:`render_dummy_avatar`. The
+    pictures are kept in an LRU cache keyed by the name, the colour input,
+    the font key and the size, so that repainting a large number of
+    placeholders does not need to render them over and over again.
+    """
+    key = name, colour_text, font.key(), size
+    try:
+        return _DUMMY_AVATAR_CACHE[key]
+    except KeyError:
+        pass
+
+    picture = render_dummy_avatar(font, name, size, colour_text)
+    _DUMMY_AVATAR_CACHE[key] = picture
+    return picture
+
+
 def render_avatar_image(image: Qt.QImage, size: float):
     if image.isNull():
         return None
@@ -168,6 +219,942 @@ def render_avatar_image(image: Qt.QImage, size: float):
     return picture
 
 
+def decode_avatar_image(data: bytes, size: int) \
+        -> typing.Optional[Qt.QImage]:
+    """
+    Decode avatar image data, scaling it down to fit into `size` pixels.
+
+    :return: The decoded image or :data:`None` if the data cannot be decoded.
+
+    Where the image format supports it, the image is decoded at the reduced
+    size directly. Images which fit into `size` are not scaled.
+
+    This does not touch any GUI state and is meant to be run in a worker
+    thread.
+    """
+    buffer_ = Qt.QBuffer()
+    buffer_.setData(data)
+    buffer_.open(Qt.QIODevice.ReadOnly)
+    reader = Qt.QImageReader(buffer_)
+
+    original_size = reader.size()
+    if (original_size.isValid() and
+            (original_size.width() > size or original_size.height() > size)):
+        reader.setScaledSize(original_size.scaled(
+            size, size,
+            Qt.Qt.KeepAspectRatio,
+        ))
+
+    image = reader.read()
+    buffer_.close()
+    if image.isNull():
+        return None
+
+    return image.convertToFormat(Qt.QImage.Format_ARGB32_Premultiplied)
+
+
+def render_avatar_pixmap(picture: Qt.QPicture,
+                         size: int,
+                         device_pixel_ratio: float) -> Qt.QPixmap:
+    """
+    Rasterise an avatar picture into a pixmap.
+
+    :param picture: The avatar picture, drawn at :data:`BASE_SIZE`.
+    :param size: The size of the pixmap in device independent pixels.
+    :param device_pixel_ratio: The device pixel ratio of the target device.
+
+    The returned pixmap has its device pixel ratio set accordingly, so that it
+    can be drawn at `size` logical pixels without scaling.
+    """
+    pixel_size = round(size * device_pixel_ratio)
+    pixmap = Qt.QPixmap(pixel_size, pixel_size)
+    pixmap.fill(Qt.Qt.transparent)
+
+    painter = Qt.QPainter(pixmap)
+    painter.setRenderHint(Qt.QPainter.Antialiasing, True)
+    painter.setRenderHint(Qt.QPainter.SmoothPixmapTransform, True)
+    scale = pixel_size / BASE_SIZE
+    painter.scale(scale, scale)
+    painter.drawPicture(Qt.QPointF(), picture)
+    painter.end()
+
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    return pixmap
+
+
+class AvatarDiskStore:
+    """
+    Content-addressed on-disk store for avatar image data.
+
+    :param path: Directory in which the store keeps its files.
+    :param max_size: Maximum number of bytes of image data to keep.
+
+    Image data is keyed by the normalised SHA-1 id advertised in the XEP-0084
+    (or XEP-0153) avatar metadata. Next to the image data, the store keeps an
+    index which maps ``(account, address)`` pairs to the id of the avatar
+    which was last seen for that peer. This allows to load avatars after a
+    restart without asking the network.
+
+    When the total size of the stored images exceeds `max_size`, the least
+    recently used images are evicted, together with all index entries which
+    refer to them.
+
+    The index is written back lazily, :attr:`FLUSH_DELAY` seconds after the
+    last change, and when :meth:`close` is called.
+    """
+
+    INDEX_FILE = "index.json"
+    INDEX_VERSION = 1
+    FLUSH_DELAY = 5
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self,
+                 path: pathlib.Path,
+                 max_size: int=DEFAULT_MAX_SIZE):
+        super().__init__()
+        self._path = path
+        self._max_size = max_size
+        # id -> size, in least-recently-used-first order
+        self._blobs = collections.OrderedDict()
+        self._total_size = 0
+        # account jid -> {address -> id}
+        self._peers = {}
+        self._flush_handle = None
+        self.logger = logging.getLogger(
+            ".".join([__name__, type(self).__qualname__])
+        )
+        self._load_index()
+
+    @property
+    def max_size(self) -> int:
+        """
+        The maximum number of bytes of image data to keep on disk.
+        """
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        self._max_size = value
+        self._evict()
+
+    @property
+    def total_size(self) -> int:
+        """
+        The number of bytes of image data currently stored.
+        """
+        return self._total_size
+
+    def _blob_path(self, id_: str) -> pathlib.Path:
+        return self._path / id_[:2] / id_
+
+    def _load_index(self):
+        try:
+            with (self._path / self.INDEX_FILE).open("r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            self.logger.warning("failed to load avatar index: %s", exc)
+            return
+
+        if data.get("version") != self.INDEX_VERSION:
+            self.logger.info("discarding avatar index with version %r",
+                             data.get("version"))
+            return
+
+        for id_, size in data.get("blobs", []):
+            self._blobs[id_] = size
+            self._total_size += size
+
+        for account_jid, peers in data.get("peers", {}).items():
+            self._peers[account_jid] = {
+                address: id_
+                for address, id_ in peers.items()
+                if id_ in self._blobs
+            }
+
+    def flush(self):
+        """
+        Write the index to disk immediately.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        data = {
+            "version": self.INDEX_VERSION,
+            "blobs": list(self._blobs.items()),
+            "peers": self._peers,
+        }
+
+        index_path = self._path / self.INDEX_FILE
+        tmp_path = index_path.with_suffix(".tmp")
+        try:
+            self._path.mkdir(parents=True, exist_ok=True)
+            with tmp_path.open("w") as f:
+                json.dump(data, f)
+            os.replace(str(tmp_path), str(index_path))
+        except OSError as exc:
+            self.logger.warning("failed to write avatar index: %s", exc)
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            return
+        self._flush_handle = asyncio.get_event_loop().call_later(
+            self.FLUSH_DELAY,
+            self.flush,
+        )
+
+    def close(self):
+        """
+        Write back pending changes to the index.
+        """
+        if self._flush_handle is not None:
+            self.flush()
+
+    def _drop_blob(self, id_: str):
+        size = self._blobs.pop(id_)
+        self._total_size -= size
+        try:
+            self._blob_path(id_).unlink()
+        except OSError:
+            pass
+
+        for peers in self._peers.values():
+            for address in [address for address, peer_id in peers.items()
+                            if peer_id == id_]:
+                del peers[address]
+
+    def _evict(self):
+        evicted = False
+        while self._total_size > self._max_size and self._blobs:
+            id_ = next(iter(self._blobs))
+            self.logger.debug("evicting avatar %s", id_)
+            self._drop_blob(id_)
+            evicted = True
+        if evicted:
+            self._schedule_flush()
+
+    def get_id(self, account_jid: str,
+               address: aioxmpp.JID) -> typing.Optional[str]:
+        """
+        Return the id of the avatar last stored for a peer.
+
+        :return: The avatar id or :data:`None` if the index does not have an
+            entry for the peer.
+        """
+        return self._peers.get(account_jid, {}).get(str(address))
+
+    def set_id(self, account_jid: str, address: aioxmpp.JID, id_: str):
+        """
+        Record that the avatar of a peer has the given id.
+
+        The image data for `id_` must have been stored with :meth:`store`
+        before.
+        """
+        if id_ not in self._blobs:
+            return
+        peers = self._peers.setdefault(account_jid, {})
+        if peers.get(str(address)) == id_:
+            return
+        peers[str(address)] = id_
+        self._schedule_flush()
+
+    def forget(self, account_jid: str, address: aioxmpp.JID):
+        """
+        Drop the index entry for a peer, if any.
+        """
+        try:
+            del self._peers[account_jid][str(address)]
+        except KeyError:
+            return
+        self._schedule_flush()
+
+    @staticmethod
+    def _read_blob(path: pathlib.Path) -> bytes:
+        with path.open("rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _write_blob(path: pathlib.Path, id_: str, data: bytes) -> bool:
+        if hashlib.sha1(data).hexdigest() != id_:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(data)
+        os.replace(str(tmp_path), str(path))
+        return True
+
+    @asyncio.coroutine
+    def load(self, id_: str) -> typing.Optional[bytes]:
+        """
+        Load image data from the store.
+
+        :return: The image data or :data:`None` if the store has no data for
+            the id.
+
+        The file is read in the default executor of the event loop.
+        """
+        if id_ not in self._blobs:
+            return None
+        self._blobs.move_to_end(id_)
+
+        try:
+            return (yield from asyncio.get_event_loop().run_in_executor(
+                None,
+                self._read_blob,
+                self._blob_path(id_),
+            ))
+        except OSError as exc:
+            self.logger.debug("failed to read avatar %s: %s", id_, exc)
+            if id_ in self._blobs:
+                self._drop_blob(id_)
+                self._schedule_flush()
+            return None
+
+    @asyncio.coroutine
+    def store(self, id_: str, data: bytes):
+        """
+        Store image data under its id.
+
+        The data is only stored if its SHA-1 hash matches the id, so that
+        peers cannot poison the store with mislabeled data. The file is
+        written in the default executor of the event loop.
+        """
+        if id_ in self._blobs:
+            self._blobs.move_to_end(id_)
+            return
+        if len(data) > self._max_size:
+            return
+
+        try:
+            stored = yield from asyncio.get_event_loop().run_in_executor(
+                None,
+                self._write_blob,
+                self._blob_path(id_),
+                id_,
+                data,
+            )
+        except OSError as exc:
+            self.logger.warning("failed to write avatar %s: %s", id_, exc)
+            return
+
+        if not stored:
+            self.logger.debug("not storing avatar %s: hash mismatch", id_)
+            return
+
+        if id_ not in self._blobs:
+            self._blobs[id_] = len(data)
+            self._total_size += len(data)
+        self._schedule_flush()
+        self._evict()
+
+
+class Histogram:
+    """
+    Histogram of durations with fixed bucket bounds.
+
+    :param bounds: Upper bounds of the buckets, in seconds, in ascending
+        order. A final bucket for larger values is added implicitly.
+    """
+
+    DEFAULT_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, bounds: typing.Sequence[float]=DEFAULT_BOUNDS):
+        super().__init__()
+        self.bounds = tuple(bounds)
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> typing.Optional[float]:
+        if not self.count:
+            return None
+        return self.sum / self.count
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "buckets": [
+                [bound, count]
+                for bound, count in zip(self.bounds + (None,), self.buckets)
+            ],
+        }
+
+
+class AvatarMetrics:
+    """
+    Counters, gauges and duration histograms of the avatar pipeline.
+
+    Counters are incremented with :meth:`increment` and durations are
+    recorded with :meth:`observe` or the :meth:`timed` context manager.
+    Gauges are callables registered with :meth:`register_gauge`, which are
+    evaluated when a snapshot is taken.
+
+    The data is meant for humans tuning the pipeline; it can be inspected
+    via ``avatar_metrics`` in the Python console, or written to a file with
+    :meth:`dump`.
+
+    The metrics are not thread-safe; they must only be updated from the
+    thread of the event loop.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.counters = collections.Counter()
+        self.histograms = collections.defaultdict(Histogram)
+        self._gauges = {}
+        self._started = time.time()
+
+    def increment(self, name: str, n: int=1):
+        self.counters[name] += n
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    @contextlib.contextmanager
+    def timed(self, name: str):
+        """
+        Record the duration of the ``with`` block in the histogram `name`.
+        """
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - t0)
+
+    def register_gauge(self, name: str, func: typing.Callable[[], float]):
+        self._gauges[name] = func
+
+    def ratio(self, hits: str, misses: str) -> typing.Optional[float]:
+        """
+        Return the ratio of the counter `hits` to the sum of `hits` and
+        `misses`, or :data:`None` if both are zero.
+        """
+        total = self.counters[hits] + self.counters[misses]
+        if not total:
+            return None
+        return self.counters[hits] / total
+
+    def reset(self):
+        """
+        Reset all counters and histograms.
+        """
+        self.counters.clear()
+        self.histograms.clear()
+        self._started = time.time()
+
+    def snapshot(self) -> dict:
+        """
+        Return the current state as JSON-serialisable dict.
+        """
+        return {
+            "since": self._started,
+            "now": time.time(),
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {
+                name: func()
+                for name, func in sorted(self._gauges.items())
+            },
+            "histograms": {
+                name: histogram.to_dict()
+                for name, histogram in sorted(self.histograms.items())
+            },
+        }
+
+    def dump(self, path):
+        """
+        Write a :meth:`snapshot` to the file at `path` as JSON.
+        """
+        with open(str(path), "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def __str__(self):
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot["counters"].items():
+            lines.append("{:<32} {:>10}".format(name, value))
+        for name, value in snapshot["gauges"].items():
+            lines.append("{:<32} {:>10}".format(name, value))
+        for name, histogram in snapshot["histograms"].items():
+            lines.append(
+                "{:<32} n={} mean={:.4f}s min={:.4f}s max={:.4f}s".format(
+                    name,
+                    histogram["count"],
+                    histogram["mean"] or 0,
+                    histogram["min"] or 0,
+                    histogram["max"] or 0,
+                )
+            )
+        return "\n".join(lines)
+
+
+class FetchScheduler:
+    """
+    Run avatar fetch jobs by priority, with per-account concurrency limits.
+
+    :param max_running: Maximum number of jobs to run at the same time.
+    :param max_running_per_account: Maximum number of jobs to run at the same
+        time for a single account.
+
+    Jobs are identified by an ``(account, address)`` pair; at most one job is
+    pending or running for each pair. Lower priority values are run first;
+    jobs with the same priority are run in the order they were submitted.
+
+    Views can mark the pairs which are currently on screen with
+    :meth:`mark_visible`, which runs their jobs with :attr:`PRIORITY_VISIBLE`
+    and demotes jobs of pairs which are not visible anymore. Each view uses
+    its own `group`, so that views do not reset each other's visible pairs.
+    """
+
+    PRIORITY_VISIBLE = 0
+    PRIORITY_DEFAULT = 10
+
+    def __init__(self,
+                 max_running: int=10,
+                 max_running_per_account: int=4,
+                 metrics: typing.Optional[AvatarMetrics]=None):
+        super().__init__()
+        self.metrics = metrics if metrics is not None else AvatarMetrics()
+        self.metrics.register_gauge("scheduler.pending",
+                                    lambda: len(self._pending))
+        self.metrics.register_gauge("scheduler.running",
+                                    lambda: len(self._running))
+        self.max_running = max_running
+        self.max_running_per_account = max_running_per_account
+        # account -> heap of (priority, seq, key); entries whose seq does not
+        # match the entry in _pending are stale and skipped
+        self._heaps = {}
+        # heap of (priority, seq, account) with the head of the heap of each
+        # account which may start a job; entries which do not match the
+        # current head anymore are stale and skipped
+        self._ready = []
+        # key -> [priority, seq, job]
+        self._pending = {}
+        # key -> task
+        self._running = {}
+        self._running_per_account = collections.Counter()
+        # key -> loop time of submission
+        self._submitted = {}
+        # group -> frozenset of keys
+        self._visible = {}
+        self._seq = itertools.count()
+        self.logger = logging.getLogger(
+            ".".join([__name__, type(self).__qualname__])
+        )
+
+    def __contains__(self, key):
+        return key in self._pending or key in self._running
+
+    def submit(self,
+               account: jclib.identity.Account,
+               address: aioxmpp.JID,
+               job: typing.Callable[[], typing.Awaitable],
+               priority: typing.Optional[int]=None):
+        """
+        Schedule a job.
+
+        :param job: Coroutine function to call without arguments to run the
+            job.
+        :param priority: Priority of the job. Defaults to
+            :attr:`PRIORITY_VISIBLE` for visible pairs and
+            :attr:`PRIORITY_DEFAULT` otherwise.
+
+        If a job for the pair is already running, nothing happens. If one is
+        pending, its priority is raised to `priority` if that is more urgent.
+        """
+        key = account, address
+        if key in self._running:
+            self.metrics.increment("scheduler.deduplicated")
+            return
+
+        if priority is None:
+            priority = (self.PRIORITY_VISIBLE if self._is_visible(key)
+                        else self.PRIORITY_DEFAULT)
+
+        try:
+            entry = self._pending[key]
+        except KeyError:
+            pass
+        else:
+            self.metrics.increment("scheduler.deduplicated")
+            if priority < entry[0]:
+                self._push(key, priority, entry[2])
+            return
+
+        self.metrics.increment("scheduler.submitted")
+        self._push(key, priority, job)
+        self._pump()
+
+    def _push(self, key, priority, job):
+        self._submitted.setdefault(key, asyncio.get_event_loop().time())
+        seq = next(self._seq)
+        self._pending[key] = [priority, seq, job]
+        account, _ = key
+        heap = self._heaps.setdefault(account, [])
+        entry = priority, seq, key
+        heapq.heappush(heap, entry)
+        if heap[0] is entry:
+            self._offer(account)
+
+    def _head(self, account):
+        """
+        Return the most urgent valid entry of the heap of `account`, dropping
+        stale entries on the way, or :data:`None` if there is none.
+        """
+        heap = self._heaps.get(account)
+        while heap:
+            _, seq, key = heap[0]
+            entry = self._pending.get(key)
+            if entry is not None and entry[1] == seq:
+                return heap[0]
+            heapq.heappop(heap)
+        self._heaps.pop(account, None)
+        return None
+
+    def _offer(self, account):
+        """
+        Make the head of the heap of `account` available to :meth:`_pump`,
+        unless the account is at its limit.
+        """
+        if (self._running_per_account[account] >=
+                self.max_running_per_account):
+            # offered again when one of its jobs is done
+            return
+        head = self._head(account)
+        if head is not None:
+            priority, seq, _ = head
+            heapq.heappush(self._ready, (priority, seq, account))
+
+    def set_priority(self,
+                     account: jclib.identity.Account,
+                     address: aioxmpp.JID,
+                     priority: int):
+        """
+        Change the priority of a pending job.
+
+        If no job is pending for the pair, nothing happens.
+        """
+        key = account, address
+        try:
+            old_priority, _, job = self._pending[key]
+        except KeyError:
+            return
+        if old_priority != priority:
+            self._push(key, priority, job)
+
+    def cancel(self,
+               account: jclib.identity.Account,
+               address: aioxmpp.JID):
+        """
+        Drop a pending job.
+
+        Jobs which are already running are not affected.
+        """
+        # the heap entry becomes stale and is skipped when it is popped
+        if self._pending.pop((account, address), None) is not None:
+            self.metrics.increment("scheduler.cancelled")
+            del self._submitted[account, address]
+
+    def _is_visible(self, key) -> bool:
+        return any(key in keys for keys in self._visible.values())
+
+    def is_visible(self,
+                   account: jclib.identity.Account,
+                   address: aioxmpp.JID) -> bool:
+        """
+        Return whether the pair is visible in any group; see
+        :meth:`mark_visible`.
+        """
+        return self._is_visible((account, address))
+
+    def mark_visible(self,
+                     keys: typing.Iterable[
+                         typing.Tuple[jclib.identity.Account, aioxmpp.JID]],
+                     group: typing.Hashable=None):
+        """
+        Set the ``(account, address)`` pairs which are currently visible.
+
+        :param keys: The visible pairs.
+        :param group: Identifies the view the pairs are visible in.
+
+        Pending jobs for the pairs are raised to :attr:`PRIORITY_VISIBLE`.
+        Pending jobs which were visible before, but are not anymore in any
+        group, are lowered to :attr:`PRIORITY_DEFAULT`.
+
+        Passing an empty `keys` drops the group.
+        """
+        visible = frozenset(keys)
+        old_visible = self._visible.pop(group, frozenset())
+        if visible:
+            self._visible[group] = visible
+
+        for key in old_visible - visible:
+            if not self._is_visible(key):
+                self.set_priority(*key, self.PRIORITY_DEFAULT)
+        for key in visible - old_visible:
+            self.set_priority(*key, self.PRIORITY_VISIBLE)
+
+    def _pump(self):
+        # accounts at their limit are never in _ready with a valid entry, so
+        # each iteration either starts a job or drops a stale entry
+        while self._ready and len(self._running) < self.max_running:
+            priority, seq, account = heapq.heappop(self._ready)
+            if (self._running_per_account[account] >=
+                    self.max_running_per_account):
+                continue
+
+            head = self._head(account)
+            if head is None:
+                continue
+            if head[:2] != (priority, seq):
+                # the head changed (cancelled, re-prioritised or already
+                # started); make sure the current one is offered
+                self._offer(account)
+                continue
+
+            _, _, key = heapq.heappop(self._heaps[account])
+            _, _, job = self._pending.pop(key)
+            self.metrics.observe("scheduler.wait",
+                                 asyncio.get_event_loop().time() -
+                                 self._submitted.pop(key))
+            self._start(key, job)
+            self._offer(account)
+
+    def _start(self, key, job):
+        account, _ = key
+        task = asyncio.ensure_future(job())
+        self._running[key] = task
+        self._running_per_account[account] += 1
+        task.add_done_callback(functools.partial(self._job_done, key))
+
+    def _job_done(self, key, task):
+        account, _ = key
+        del self._running[key]
+        self._running_per_account[account] -= 1
+        if not self._running_per_account[account]:
+            del self._running_per_account[account]
+        self._offer(account)
+
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning("background job failed",
+                                exc_info=task.exception())
+
+        self._pump()
+
+    def close(self):
+        """
+        Drop all pending jobs and cancel the running ones.
+        """
+        self._heaps.clear()
+        self._ready.clear()
+        self._pending.clear()
+        self._submitted.clear()
+        for task in list(self._running.values()):
+            task.cancel()
+
+
+class AvatarContentCache:
+    """
+    Content-addressed cache of avatar pictures, shared between accounts.
+
+    :param maxsize: Maximum number of pictures to keep.
+
+    Pictures are keyed by the normalised id (the SHA-1 hash of the image
+    data) from the avatar metadata. The same image is thus only fetched,
+    decoded and kept in memory once, no matter through how many accounts or
+    rooms it is seen. Concurrent :meth:`fetch` calls for the same id share a
+    single load.
+
+    The id is advertised by the peer, so it is not trusted: pictures are
+    only cached and shared if the SHA-1 hash of the loaded data matches the
+    id. Otherwise, the picture is only returned to the caller which loaded
+    the data.
+    """
+
+    def __init__(self,
+                 maxsize: int=1024,
+                 metrics: typing.Optional[AvatarMetrics]=None):
+        super().__init__()
+        self.metrics = metrics if metrics is not None else AvatarMetrics()
+        self._pictures = aioxmpp.cache.LRUDict()
+        self._pictures.maxsize = maxsize
+        self._loading = {}
+
+    def get(self, id_: str) -> Qt.QPicture:
+        """
+        Return a cached picture.
+
+        :raises KeyError: if no picture is cached for `id_`.
+        """
+        return self._pictures[id_]
+
+    @asyncio.coroutine
+    def fetch(self,
+              id_: str,
+              load_bytes: typing.Callable[[], typing.Awaitable[
+                  typing.Optional[bytes]]]) \
+            -> typing.Optional[Qt.QPicture]:
+        """
+        Return the picture for an id, loading it if necessary.
+
+        :param id_: The normalised avatar id.
+        :param load_bytes: Coroutine function which returns the image data
+            or :data:`None`. It is only called if the picture is neither
+            cached nor already being loaded.
+        :return: The picture or :data:`None` if the data could not be loaded
+            or decoded.
+
+        Exceptions raised by `load_bytes` are propagated to all callers
+        waiting for the id. Cancelling a caller does not cancel the load.
+
+        If the data loaded for another caller does not match the id, callers
+        which waited for that load call their own `load_bytes`.
+        """
+        try:
+            result = self._pictures[id_]
+        except KeyError:
+            pass
+        else:
+            self.metrics.increment("content.hit")
+            return result
+
+        try:
+            fut = self._loading[id_]
+        except KeyError:
+            self.metrics.increment("content.miss")
+            fut = asyncio.ensure_future(self._load(id_, load_bytes))
+            self._loading[id_] = fut
+            fut.add_done_callback(functools.partial(self._load_done, id_))
+            own_load = True
+        else:
+            self.metrics.increment("content.shared")
+            own_load = False
+
+        picture, verified = yield from asyncio.shield(fut)
+        if verified or own_load:
+            return picture
+
+        picture, _ = yield from self._load(id_, load_bytes)
+        return picture
+
+    def _load_done(self, id_, fut):
+        if self._loading.get(id_) is fut:
+            del self._loading[id_]
+        if not fut.cancelled():
+            # avoid "exception was never retrieved" if all callers are gone
+            fut.exception()
+
+    @staticmethod
+    def _decode(data):
+        # runs in the executor, so the duration is returned to be recorded
+        # on the event loop
+        t0 = time.monotonic()
+        image = decode_avatar_image(data, DECODED_AVATAR_SIZE)
+        return image, time.monotonic() - t0
+
+    @asyncio.coroutine
+    def _load(self, id_, load_bytes):
+        # returns the picture and whether it may be shared with other callers
+        with self.metrics.timed("content.load"):
+            data = yield from load_bytes()
+        if data is None:
+            return None, True
+
+        verified = hashlib.sha1(data).hexdigest() == id_
+        if not verified:
+            self.metrics.increment("content.unverified")
+
+        image, duration = yield from asyncio.get_event_loop().run_in_executor(
+            None,
+            self._decode,
+            data,
+        )
+        self.metrics.observe("content.decode", duration)
+        if image is None:
+            self.metrics.increment("content.decode_failed")
+            return None, verified
+
+        with self.metrics.timed("content.render"):
+            picture = render_avatar_image(image, BASE_SIZE)
+        if picture is not None and verified:
+            self._pictures[id_] = picture
+        return picture, verified
+
+
+class RetryState:
+    """
+    Book-keeping for failed attempts to fetch an avatar.
+
+    .. attribute:: failures
+
+        Number of consecutive failed attempts.
+
+    .. attribute:: last_error
+
+        Description of the error of the last failed attempt.
+
+    .. attribute:: next_attempt
+
+        Event loop time before which no further attempt is made.
+    """
+
+    __slots__ = ("failures", "last_error", "next_attempt")
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 0
+        self.last_error = None
+        self.next_attempt = 0
+
+    def __repr__(self):
+        return "<{} failures={} last_error={!r} next_attempt={}>".format(
+            type(self).__qualname__,
+            self.failures,
+            self.last_error,
+            self.next_attempt,
+        )
+
+    def record_failure(self, error: str, now: float,
+                       base_delay: float, max_delay: float):
+        """
+        Record a failed attempt and compute the next allowed attempt.
+
+        The delay doubles with each consecutive failure, starting at
+        `base_delay` and capped at `max_delay`.
+        """
+        self.failures += 1
+        self.last_error = error
+        delay = min(base_delay * 2 ** (self.failures - 1), max_delay)
+        self.next_attempt = now + delay
+
+    def may_retry(self, now: float) -> bool:
+        """
+        Return whether a new attempt may be made at `now`.
+        """
+        return now >= self.next_attempt
+
+
 class XMPPAvatarProvider:
     """
     .. signal:: on_avatar_changed(address)
@@ -176,15 +1163,39 @@ class XMPPAvatarProvider:
 
         The image needs to be fetched separately and explicitly.
 
+    :param account: The account for which avatars are provided.
+    :param store: Optional :class:`AvatarDiskStore` to persist avatars in.
+    :param content: Optional :class:`AvatarContentCache` to share pictures
+        with other providers.
+
+    If a `store` is given, image data is looked up in the store before it is
+    fetched from the network, and fetched image data is written to it.
+
+    Pictures are obtained through the `content` cache, so that the per-peer
+    cache of this provider only references pictures shared with other
+    providers. If no `content` cache is given, a private one is used.
     """
 
     on_avatar_changed = aioxmpp.callbacks.Signal()
 
-    def __init__(self, account: jclib.identity.Account):
+    #: Number of seconds for which a peer without avatar is remembered as
+    #: such before :meth:`get_avatar` asks for another fetch.
+    NEGATIVE_TTL = 15 * 60
+
+    def __init__(self,
+                 account: jclib.identity.Account,
+                 store: typing.Optional[AvatarDiskStore]=None,
+                 content: typing.Optional[AvatarContentCache]=None):
         super().__init__()
         self.__tokens = []
         self._account = account
+        self._account_jid = str(account.jid.bare())
+        self._store = store
+        self._content = content if content is not None \
+            else AvatarContentCache()
         self._avatar_svc = None
+        # address -> (picture, expiry); the expiry is the loop time at which
+        # a negative entry (picture is None) expires and None otherwise
         self._cache = aioxmpp.cache.LRUDict()
         self._cache.maxsize = 1024
         self.logger = logging.getLogger(".".join([
@@ -207,10 +1218,57 @@ class XMPPAvatarProvider:
         self._avatar_svc = None
 
     def _on_metadata_changed(self, jid, metadata):
+        if self._store is not None:
+            stored_id = self._store.get_id(self._account_jid, jid)
+            if stored_id is not None:
+                if any(descriptor.normalized_id == stored_id
+                       for descriptor in metadata):
+                    # we already have this avatar on disk
+                    return
+                self._store.forget(self._account_jid, jid)
         self.on_avatar_changed(jid)
 
     @asyncio.coroutine
-    def _get_image(self, address: aioxmpp.JID) -> typing.Optional[Qt.QImage]:
+    def _get_stored_picture(self, address: aioxmpp.JID) \
+            -> typing.Optional[Qt.QPicture]:
+        id_ = self._store.get_id(self._account_jid, address)
+        if id_ is None:
+            return None
+
+        picture = yield from self._content.fetch(
+            id_,
+            functools.partial(self._store.load, id_),
+        )
+        if picture is not None:
+            self.logger.debug("loaded avatar %s for %s from disk",
+                              id_, address)
+            return picture
+
+        self._store.forget(self._account_jid, address)
+        return None
+
+    @asyncio.coroutine
+    def _get_image_bytes(self, descriptor) -> bytes:
+        if self._store is None:
+            return (yield from descriptor.get_image_bytes())
+
+        id_ = descriptor.normalized_id
+        data = yield from self._store.load(id_)
+        if data is not None:
+            return data
+
+        data = yield from descriptor.get_image_bytes()
+        yield from self._store.store(id_, data)
+        return data
+
+    @asyncio.coroutine
+    def _get_picture(self, address: aioxmpp.JID) \
+            -> typing.Optional[Qt.QPicture]:
+        if self._store is not None:
+            picture = yield from self._get_stored_picture(address)
+            if picture is not None:
+                return picture
+
         try:
             metadata = yield from self._avatar_svc.get_avatar_metadata(address)
         except (aioxmpp.errors.XMPPError,
@@ -221,27 +1279,34 @@ class XMPPAvatarProvider:
 
         for descriptor in metadata:
             try:
-                data = yield from descriptor.get_image_bytes()
+                picture = yield from self._content.fetch(
+                    descriptor.normalized_id,
+                    functools.partial(self._get_image_bytes, descriptor),
+                )
             except (NotImplementedError, RuntimeError,
                     aioxmpp.errors.XMPPCancelError):
                 continue
-            img = Qt.QImage.fromData(data)
-            if not img.isNull():
-                return img
+            if picture is not None:
+                if self._store is not None:
+                    self._store.set_id(self._account_jid, address,
+                                       descriptor.normalized_id)
+                return picture
 
     @asyncio.coroutine
     def fetch_avatar(self, address: aioxmpp.JID) \
             -> typing.Optional[Qt.QPicture]:
         """
-        Fetch an avatar and wrap it in a QPicture.
+        Fetch an avatar as QPicture.
         """
-        img = yield from self._get_image(address)
-        if img is None:
-            self._cache[address] = None
+        picture = yield from self._get_picture(address)
+        if picture is None:
+            self._cache[address] = (
+                None,
+                asyncio.get_event_loop().time() + self.NEGATIVE_TTL,
+            )
             return None
 
-        picture = render_avatar_image(img, BASE_SIZE)
-        self._cache[address] = picture
+        self._cache[address] = picture, None
         return picture
 
     def get_avatar(self, address: aioxmpp.JID) \
@@ -250,7 +1315,10 @@ class XMPPAvatarProvider:
         Return an avatar from the cache.
 
         The result of :meth:`fetch_avatar` is stored in an LRU cache
-        internally. If no cached result is found, :data:`None` is returned.
+        internally. If no cached result is found, :class:`KeyError` is raised.
+        If the peer was found to have no avatar, :data:`None` is returned
+        for :attr:`NEGATIVE_TTL` seconds; after that, :class:`KeyError` is
+        raised again so that the caller fetches the avatar anew.
 
         .. note::
 
@@ -258,7 +1326,12 @@ class XMPPAvatarProvider:
             been refreshed. Consumers of this signal should always call
             :meth:`fetch_avatar`.
         """
-        return self._cache[address]
+        result, expiry = self._cache[address]
+        if (expiry is not None and
+                expiry <= asyncio.get_event_loop().time()):
+            del self._cache[address]
+            raise KeyError(address)
+        return result
 
 
 class RosterNameAvatarProvider:
@@ -311,8 +1384,8 @@ class RosterNameAvatarProvider:
             return
         if name is None:
             return
-        return render_dummy_avatar(font, name, BASE_SIZE,
-                                   str(address))
+        return get_dummy_avatar(font, name, BASE_SIZE,
+                                str(address))
 
     def _on_entry_updated(self, item):
         self.on_avatar_changed(item.jid)
@@ -327,20 +1400,44 @@ class AvatarManager:
         At the point the signal is emitted, :meth:`get_avatar` already returns
         the new avatar (it has already been obtained from the network, if
         needed).
+
+    :param store: Optional :class:`AvatarDiskStore` in which avatars fetched
+        via XMPP are persisted across restarts.
     """
 
     on_avatar_changed = aioxmpp.callbacks.Signal()
 
+    #: Timeout for a single avatar fetch, in seconds.
+    FETCH_TIMEOUT = 10
+
+    #: Delay before the first retry after a failed fetch, in seconds. It
+    #: doubles with each consecutive failure, up to :attr:`RETRY_MAX_DELAY`.
+    RETRY_BASE_DELAY = 5
+
+    RETRY_MAX_DELAY = 10 * 60
+
     def __init__(self,
                  client: jclib.client.Client,
-                 writeman: jclib.storage.WriteManager):
+                 writeman: jclib.storage.WriteManager,
+                 store: typing.Optional[AvatarDiskStore]=None):
         super().__init__()
-        self._queue = asyncio.Queue()
-        self._enqueued = set()
-        self._workers = [
-            asyncio.ensure_future(self._worker())
-            for i in range(10)
-        ]
+        self._store = store
+        self.metrics = AvatarMetrics()
+        self._scheduler = FetchScheduler(metrics=self.metrics)
+        self._content = AvatarContentCache(metrics=self.metrics)
+        # (account, address) -> RetryState
+        self._retry_states = {}
+        # (account, address) -> {(size, dpr, name_surrogate) ->
+        #                        (pixmap, is_fallback)}
+        # fallback entries were rendered while no XMPP avatar was cached for
+        # the peer
+        self._pixmap_cache = aioxmpp.cache.LRUDict()
+        self._pixmap_cache.maxsize = 512
+        # (account, address) -> {(size, name_surrogate) ->
+        #                        (data URI, is_fallback)}
+        self._data_uri_cache = aioxmpp.cache.LRUDict()
+        self._data_uri_cache.maxsize = 512
+        self._avatar_font = None
         self.logger = logging.getLogger(
             ".".join([__name__, type(self).__qualname__])
         )
@@ -351,50 +1448,187 @@ class AvatarManager:
         client.on_client_stopped.connect(self._shutdown_client)
 
     def close(self):
-        for worker in self._workers:
-            worker.cancel()
-
-    @asyncio.coroutine
-    def _worker(self):
-        while True:
-            task = yield from self._queue.get()
-            try:
-                yield from task
-            except Exception as exc:
-                self.logger.warning("background job failed", exc_info=True)
+        self._scheduler.close()
+        if self._store is not None:
+            self._store.close()
 
     def get_avatar_font(self):
-        return Qt.QFontDatabase.systemFont(
-            Qt.QFontDatabase.GeneralFont
-        )
+        """
+        Return the font used for placeholder avatars.
+
+        The font is looked up once and cached until :meth:`flush_font_caches`
+        is called.
+        """
+        if self._avatar_font is None:
+            self._avatar_font = Qt.QFontDatabase.systemFont(
+                Qt.QFontDatabase.GeneralFont
+            )
+        return self._avatar_font
+
+    def flush_font_caches(self):
+        """
+        Drop all cached data which depends on the system font.
+
+        This must be called when the application or system font changes.
+        """
+        self._avatar_font = None
+        _DUMMY_AVATAR_CACHE.clear()
+        self._pixmap_cache.clear()
+        self._data_uri_cache.clear()
 
     @asyncio.coroutine
     def _fetch_avatar_and_emit_signal(self, fetch_func, account, address):
         self.logger.debug("fetching avatar for %s", address)
+        t0 = time.monotonic()
         try:
-            yield from asyncio.wait_for(fetch_func(address), timeout=10)
+            yield from asyncio.wait_for(fetch_func(address),
+                                        timeout=self.FETCH_TIMEOUT)
         except asyncio.TimeoutError:
             self.logger.info("failed to fetch avatar for %s (timeout)",
                              address)
+            self.metrics.increment("fetch.timeout")
+            self._record_failure(account, address, "timeout")
             return
-        finally:
-            self._enqueued.discard((account, address))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.logger.info("failed to fetch avatar for %s (%s)",
+                             address, exc)
+            self.metrics.increment("fetch.error")
+            self._record_failure(account, address, str(exc))
+            return
+        self.metrics.observe("fetch.duration", time.monotonic() - t0)
+        self.metrics.increment("fetch.success")
+        self._retry_states.pop((account, address), None)
         self.logger.debug("avatar for %s fetched", address)
-        self.on_avatar_changed(account, address)
+        self._avatar_changed(account, address)
+
+    def _record_failure(self, account, address, error):
+        now = asyncio.get_event_loop().time()
+        state = self._retry_states.setdefault((account, address),
+                                              RetryState())
+        state.record_failure(
+            error,
+            now,
+            self.RETRY_BASE_DELAY,
+            self.RETRY_MAX_DELAY,
+        )
+        self.logger.debug("retrying avatar fetch for %s in %.0f s",
+                          address,
+                          state.next_attempt - now)
 
-    def _fetch_in_background(self, account, provider, address):
-        key = account, address
-        if key in self._enqueued:
-            return
-        self._enqueued.add(key)
-        self._queue.put_nowait(
-            self._fetch_avatar_and_emit_signal(
+    def _fetch_in_background(self, account, provider, address,
+                             priority=None):
+        try:
+            state = self._retry_states[account, address]
+        except KeyError:
+            pass
+        else:
+            if not state.may_retry(asyncio.get_event_loop().time()):
+                self.metrics.increment("fetch.backoff")
+                return
+
+        self._scheduler.submit(
+            account, address,
+            functools.partial(
+                self._fetch_avatar_and_emit_signal,
                 provider.fetch_avatar,
                 account,
                 address,
-            )
+            ),
+            priority,
         )
 
+    def get_retry_state(self,
+                        account: jclib.identity.Account,
+                        address: aioxmpp.JID) -> typing.Optional[RetryState]:
+        """
+        Return the state of failed fetches of an avatar.
+
+        :return: The :class:`RetryState` or :data:`None` if the last fetch of
+            the avatar did not fail.
+        """
+        return self._retry_states.get((account, address))
+
+    @property
+    def retry_states(self) -> typing.Mapping[
+            typing.Tuple[jclib.identity.Account, aioxmpp.JID],
+            RetryState]:
+        """
+        Read-only view of all :class:`RetryState` objects, keyed by
+        ``(account, address)``.
+        """
+        return types.MappingProxyType(self._retry_states)
+
+    def mark_visible(self,
+                     keys: typing.Iterable[
+                         typing.Tuple[jclib.identity.Account, aioxmpp.JID]],
+                     group: typing.Hashable=None):
+        """
+        Tell the manager which avatars are currently on screen.
+
+        :param keys: The ``(account, address)`` pairs which are visible.
+        :param group: Identifies the view the pairs are visible in.
+
+        Pending fetches for visible avatars are run before all others;
+        pending fetches for avatars which scrolled out of view are demoted.
+        See :meth:`FetchScheduler.mark_visible`.
+        """
+        self._scheduler.mark_visible(keys, group)
+
+    def prefetch(self, keys: typing.Iterable[
+            typing.Tuple[jclib.identity.Account, aioxmpp.JID]]):
+        """
+        Start fetching avatars which are about to be painted.
+
+        :param keys: The ``(account, address)`` pairs to fetch avatars for.
+
+        For each pair whose avatar is not cached yet, a background fetch is
+        scheduled, just like :meth:`get_avatar` would do. Pairs of unknown
+        accounts are ignored. Fetches for pairs passed to
+        :meth:`mark_visible` run first.
+        """
+        for account, address in keys:
+            self._fetch_if_not_cached(account, address)
+
+    def _fetch_if_not_cached(self, account, address):
+        """
+        Fetch the XMPP avatar of a peer in the background if it is not in
+        the cache of the provider, like :meth:`get_avatar` does.
+
+        A fetch is also started if the negative cache entry of the peer has
+        expired. Pending back-offs of failed fetches are respected.
+        """
+        try:
+            _, _, xmpp_avatar = self.__accountmap[account]
+        except KeyError:
+            return
+
+        try:
+            xmpp_avatar.get_avatar(address)
+        except KeyError:
+            self._fetch_in_background(account, xmpp_avatar, address)
+
+    def _has_xmpp_avatar(self, account, address) -> bool:
+        try:
+            _, _, xmpp_avatar = self.__accountmap[account]
+            return xmpp_avatar.get_avatar(address) is not None
+        except KeyError:
+            return False
+
+    def cancel_fetch(self,
+                     account: jclib.identity.Account,
+                     address: aioxmpp.JID):
+        """
+        Drop a pending background fetch of an avatar, if any.
+
+        Fetches of avatars which are visible in any view (see
+        :meth:`mark_visible`) are kept.
+        """
+        if self._scheduler.is_visible(account, address):
+            return
+        self._scheduler.cancel(account, address)
+
     def get_avatar(self,
                    account: jclib.identity.Account,
                    address: aioxmpp.JID,
@@ -424,8 +1658,11 @@ class AvatarManager:
             try:
                 result = xmpp_avatar.get_avatar(address)
             except KeyError:
+                self.metrics.increment("avatar.miss")
                 self._fetch_in_background(account, xmpp_avatar, address)
                 result = None
+            else:
+                self.metrics.increment("avatar.hit")
 
             if result is not None:
                 return result
@@ -433,11 +1670,120 @@ class AvatarManager:
             font = self.get_avatar_font()
             result = generator.get_avatar(address, font)
             if result is not None:
+                self.metrics.increment("avatar.roster_name")
                 return result
 
-        return render_dummy_avatar(font,
-                                   name_surrogate or str(address),
-                                   BASE_SIZE)
+        self.metrics.increment("avatar.placeholder")
+        return get_dummy_avatar(font,
+                                name_surrogate or str(address),
+                                BASE_SIZE)
+
+    def get_avatar_pixmap(self,
+                          account: jclib.identity.Account,
+                          address: aioxmpp.JID,
+                          size: int,
+                          device_pixel_ratio: float=1.0,
+                          name_surrogate: typing.Optional[str]=None) \
+            -> Qt.QPixmap:
+        """
+        Return an avatar for an entity, rasterised for painting.
+
+        :param size: Size of the avatar in device independent pixels.
+        :param device_pixel_ratio: Device pixel ratio of the paint device.
+
+        The other arguments and the fallback behaviour are the same as for
+        :meth:`get_avatar`.
+
+        The pixmaps are cached until :meth:`on_avatar_changed` is emitted for
+        the entity. Delegates should prefer this over :meth:`get_avatar` and
+        draw the pixmap unscaled.
+        """
+        peer_key = account, address
+        try:
+            pixmaps = self._pixmap_cache[peer_key]
+        except KeyError:
+            pixmaps = {}
+            self._pixmap_cache[peer_key] = pixmaps
+
+        key = size, device_pixel_ratio, name_surrogate
+        try:
+            result, is_fallback = pixmaps[key]
+        except KeyError:
+            self.metrics.increment("pixmap.miss")
+        else:
+            self.metrics.increment("pixmap.hit")
+            if is_fallback:
+                # keep retrying like get_avatar would on each paint, once
+                # the negative entry or the back-off have expired; the
+                # fallback is dropped with on_avatar_changed on success
+                self._fetch_if_not_cached(account, address)
+                self._scheduler.set_priority(account, address,
+                                             FetchScheduler.PRIORITY_VISIBLE)
+            return result
+
+        pixmap = render_avatar_pixmap(
+            self.get_avatar(account, address, name_surrogate),
+            size,
+            device_pixel_ratio,
+        )
+        pixmaps[key] = pixmap, not self._has_xmpp_avatar(account, address)
+        # the avatar is about to be painted, so it is visible
+        self._scheduler.set_priority(account, address,
+                                     FetchScheduler.PRIORITY_VISIBLE)
+        return pixmap
+
+    def get_avatar_data_uri(self,
+                            account: jclib.identity.Account,
+                            address: aioxmpp.JID,
+                            name_surrogate: typing.Optional[str]=None,
+                            size: int=BASE_SIZE) -> str:
+        """
+        Return an avatar for an entity as PNG ``data:`` URI.
+
+        :param size: Width and height of the image in pixels.
+
+        The other arguments and the fallback behaviour are the same as for
+        :meth:`get_avatar`. This is meant for rich text such as tool tips;
+        the URIs are cached like the pixmaps of :meth:`get_avatar_pixmap`.
+        """
+        peer_key = account, address
+        try:
+            uris = self._data_uri_cache[peer_key]
+        except KeyError:
+            uris = {}
+            self._data_uri_cache[peer_key] = uris
+
+        key = size, name_surrogate
+        try:
+            uri, is_fallback = uris[key]
+        except KeyError:
+            pass
+        else:
+            if is_fallback:
+                self._fetch_if_not_cached(account, address)
+            return uri
+
+        uri = jabbercat.utils.qtpicture_to_data_uri(
+            self.get_avatar(account, address, name_surrogate),
+            size, size,
+        )
+        uris[key] = uri, not self._has_xmpp_avatar(account, address)
+        return uri
+
+    def _flush_account_pixmaps(self, account: jclib.identity.Account):
+        for cache in [self._pixmap_cache, self._data_uri_cache]:
+            for key in [key for key in cache if key[0] == account]:
+                del cache[key]
+
+    def _avatar_changed(self,
+                        account: jclib.identity.Account,
+                        address: aioxmpp.JID):
+        for cache in [self._pixmap_cache, self._data_uri_cache]:
+            try:
+                del cache[account, address]
+            except KeyError:
+                pass
+        self.on_avatar_changed(account, address)
 
     def _on_xmpp_avatar_changed(self,
                                 account: jclib.identity.Account,
@@ -456,12 +1802,12 @@ class AvatarManager:
     def _on_backend_avatar_changed(self,
                                    account: jclib.identity.Account,
                                    address: aioxmpp.JID):
-        self.on_avatar_changed(account, address)
+        self._avatar_changed(account, address)
 
     def _prepare_client(self,
                         account: jclib.identity.Account,
                         client: jclib.client.Client):
-        xmpp_avatar = XMPPAvatarProvider(account)
+        xmpp_avatar = XMPPAvatarProvider(account, self._store, self._content)
         xmpp_avatar.prepare_client(client)
 
         generator = RosterNameAvatarProvider()
@@ -475,9 +1821,13 @@ class AvatarManager:
                                    account, xmpp_avatar))
 
         self.__accountmap[account] = tokens, generator, xmpp_avatar
+        self._flush_account_pixmaps(account)
 
     def _shutdown_client(self,
                          account: jclib.identity.Account,
                          client: jclib.client.Client):
         tokens, *_ = self.__accountmap.pop(account)
         _disconnect_all(tokens)
+        for key in [key for key in self._retry_states if key[0] == account]:
+            del self._retry_states[key]
+        self._flush_account_pixmaps(account)
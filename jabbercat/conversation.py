@@ -12,6 +12,7 @@ import lxml.builder
 import lxml.etree
 
 import aioxmpp
+import aioxmpp.callbacks
 import aioxmpp.forms
 import aioxmpp.im.conversation
 import aioxmpp.im.p2p
@@ -32,7 +33,7 @@ import jclib.utils
 import jabbercat.avatar
 
 from . import Qt, utils, models, avatar, emoji, model_adaptor
-from .widgets import messageinput, member_list, forms
+from .widgets import messageinput, member_list, forms, misc
 
 from .ui import p2p_conversation
 
@@ -79,9 +80,29 @@ class MemberList(jclib.instrumentable_list.ModelListView):
             self._on_leave,
         )
 
+        _connect_and_store_token(
+            self._tokens,
+            self._conversation.on_nick_changed,
+            self._on_nick_changed,
+        )
+
+        # only MUCs have affiliations
+        try:
+            on_affiliation_changed = \
+                self._conversation.on_muc_affiliation_changed
+        except AttributeError:
+            pass
+        else:
+            _connect_and_store_token(
+                self._tokens,
+                on_affiliation_changed,
+                self._on_affiliation_changed,
+            )
+
     def _disconnect(self):
         for signal, token in self._tokens:
             signal.disconnect(token)
+        self._tokens.clear()
         self._backend.clear()
 
     def _on_enter(self, **kwargs):
@@ -98,10 +119,19 @@ class MemberList(jclib.instrumentable_list.ModelListView):
     def _on_leave(self, member, **kwargs):
         self._backend.remove(member)
 
-    def _on_nick_changed(self, member, old_nick, new_nickm, **kwargs):
-        member_index = self._backend.index(member)
+    def _refresh_member(self, member):
+        try:
+            member_index = self._backend.index(member)
+        except ValueError:
+            return
         self._backend.refresh_data(slice(member_index, member_index+1))
 
+    def _on_nick_changed(self, member, old_nick, new_nick, **kwargs):
+        self._refresh_member(member)
+
+    def _on_affiliation_changed(self, member, **kwargs):
+        self._refresh_member(member)
+
     @property
     def conversation(self):
         return self._conversation
@@ -127,6 +157,61 @@ class MemberModel(Qt.QAbstractListModel):
         self.__metadata = metadata
         self.__avatar_manager = avatar_manager
         self.__adaptor = model_adaptor.ModelListAdaptor(self.__members, self)
+        # member -> tool tip HTML
+        self.__tooltips = {}
+        # member -> collation key of the display name
+        self.__sort_keys = {}
+        self.__members.data_changed.connect(self._data_changed)
+        self.rowsAboutToBeRemoved.connect(self._rows_about_to_be_removed)
+        self.__avatar_manager.on_avatar_changed.connect(
+            self._on_avatar_changed,
+            self.__avatar_manager.on_avatar_changed.WEAK,
+        )
+        self.__metadata.changed_signal(
+            jclib.roster.RosterMetadata.NAME
+        ).connect(
+            self._on_name_changed,
+            aioxmpp.callbacks.AdHocSignal.WEAK,
+        )
+
+    def _data_changed(self, _, index1, index2, column1, column2, roles):
+        for row in range(index1, index2 + 1):
+            member = self.__members[row]
+            self.__tooltips.pop(member, None)
+            self.__sort_keys.pop(member, None)
+        self.dataChanged.emit(
+            self.index(index1, 0),
+            self.index(index2, 0),
+            roles or [],
+        )
+
+    def _rows_about_to_be_removed(self, parent, index1, index2):
+        for row in range(index1, index2 + 1):
+            member = self.__members[row]
+            self.__tooltips.pop(member, None)
+            self.__sort_keys.pop(member, None)
+
+    def _on_name_changed(self, key, account, peer, value):
+        if account != self.__account:
+            return
+        for row, member in enumerate(self.__members):
+            if hasattr(member, "nick"):
+                continue
+            if (member.direct_jid or member.conversation_jid) != peer:
+                continue
+            self.__tooltips.pop(member, None)
+            self.__sort_keys.pop(member, None)
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index,
+                                  [Qt.Qt.DisplayRole, models.ROLE_SORT_KEY])
+
+    def _on_avatar_changed(self, account, address):
+        if account != self.__account:
+            return
+        for member in [member for member in self.__tooltips
+                       if (member.direct_jid or
+                           member.conversation_jid) == address]:
+            del self.__tooltips[member]
 
     def _display_name(self, member):
         if hasattr(member, "nick"):
@@ -139,15 +224,22 @@ class MemberModel(Qt.QAbstractListModel):
             )
         return label
 
+    def _get_tooltip(self, member):
+        try:
+            return self.__tooltips[member]
+        except KeyError:
+            pass
+        result = self._format_tooltip(member)
+        self.__tooltips[member] = result
+        return result
+
     def _format_tooltip(self, member):
-        picture = self.__avatar_manager.get_avatar(
+        picture_base64 = self.__avatar_manager.get_avatar_data_uri(
             self.__account,
             member.direct_jid or member.conversation_jid,
             getattr(member, "nick", None)
         )
 
-        picture_base64 = jabbercat.utils.qtpicture_to_data_uri(picture)
-
         label = self._display_name(member)
 
         H = lxml.builder.ElementMaker()
@@ -205,8 +297,16 @@ class MemberModel(Qt.QAbstractListModel):
 
         if role == Qt.Qt.DisplayRole:
             return self._display_name(member)
+        elif role == models.ROLE_SORT_KEY:
+            try:
+                return self.__sort_keys[member]
+            except KeyError:
+                pass
+            result = models.collation_key(self._display_name(member) or "")
+            self.__sort_keys[member] = result
+            return result
         elif role == Qt.Qt.ToolTipRole:
-            return self._format_tooltip(member)
+            return self._get_tooltip(member)
         elif role == models.ROLE_OBJECT:
             return member
 
@@ -560,13 +660,19 @@ class ConversationView(Qt.QWidget):
             avatars,
         )
 
-        self.__sorted_member_model = Qt.QSortFilterProxyModel()
-        self.__sorted_member_model.setSortRole(Qt.Qt.DisplayRole)
+        self.__sorted_member_model = models.SortKeyProxyModel()
+        self.__sorted_member_model.setSortRole(models.ROLE_SORT_KEY)
         self.__sorted_member_model.setSortCaseSensitivity(Qt.Qt.CaseInsensitive)
         self.__sorted_member_model.setSourceModel(self.__member_model)
         self.__sorted_member_model.sort(0, Qt.Qt.AscendingOrder)
 
         self.ui.member_view.setModel(self.__sorted_member_model)
+        self.__member_prefetcher = misc.AvatarPrefetcher(
+            self.ui.member_view,
+            avatars,
+            functools.partial(self._member_avatar_key,
+                              conversation_node.account),
+        )
 
         self._ui_initialised = False
 
@@ -669,6 +775,11 @@ class ConversationView(Qt.QWidget):
             )
         )
 
+    @staticmethod
+    def _member_avatar_key(account, index):
+        member = index.data(models.ROLE_OBJECT)
+        return account, member.direct_jid or member.conversation_jid
+
     def _http_upload_address_changed(self, key, account, peer, address):
         if account is not self.__node.account:
             return
@@ -101,6 +101,10 @@ class PythonConsole(Qt.QDialog):
         self._execute_single("import jabbercat.Qt as Qt")
         self._stdin_file.write(">>> main = {!r}\n".format(main))
         self._globals["main"] = main
+        self._stdin_file.write(
+            ">>> avatar_metrics = main.avatar.metrics\n"
+        )
+        self._globals["avatar_metrics"] = main.avatar.metrics
 
         self.addAction(self.ui.action_execute)
         self.addAction(self.ui.action_cancel)
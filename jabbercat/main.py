@@ -37,6 +37,7 @@ from .widgets import (
     roster_view,
     tagsmenu,
     collapsible,
+    misc,
 )
 
 from .ui.main import Ui_Main
@@ -46,6 +47,10 @@ logger = logging.getLogger(__name__)
 
 
 class MainWindow(Qt.QMainWindow):
+    #: Time in milliseconds to wait after the last keystroke in the magic bar
+    #: before the roster filter is updated.
+    FILTER_DEBOUNCE_INTERVAL = 150
+
     def __init__(self, main, parent=None):
         super().__init__(parent=parent)
 
@@ -89,7 +94,8 @@ class MainWindow(Qt.QMainWindow):
         self._tags_menu.source_model = self.checked_tags
 
         self.roster_model = models.RosterModel(main.roster, main.avatar,
-                                               main.metadata)
+                                               main.metadata,
+                                               batched=True)
         self.roster_model.on_label_edited.connect(
             self._roster_label_edited,
         )
@@ -102,9 +108,9 @@ class MainWindow(Qt.QMainWindow):
         self.filtered_roster.setSourceModel(self.roster_model)
         self.filtered_roster.tags_filter_model = self.checked_tags
 
-        self.sorted_roster = Qt.QSortFilterProxyModel()
+        self.sorted_roster = models.RosterSortModel()
         self.sorted_roster.setSourceModel(self.filtered_roster)
-        self.sorted_roster.setSortRole(Qt.Qt.DisplayRole)
+        self.sorted_roster.setSortRole(models.ROLE_SORT_KEY)
         self.sorted_roster.setSortLocaleAware(True)
         self.sorted_roster.setSortCaseSensitivity(False)
         self.sorted_roster.setDynamicSortFilter(True)
@@ -118,8 +124,14 @@ class MainWindow(Qt.QMainWindow):
         )
         self.ui.roster_view.setItemDelegate(self._roster_item_delegate)
         self.ui.roster_view.setMouseTracking(True)
+        self._roster_item_delegate.watch_view(self.ui.roster_view)
         self.ui.roster_view.setModel(self.sorted_roster)
         self.ui.roster_view.setContextMenuPolicy(Qt.Qt.CustomContextMenu)
+        self._roster_prefetcher = misc.AvatarPrefetcher(
+            self.ui.roster_view,
+            main.avatar,
+            self._roster_avatar_key,
+        )
 
         self.ui.roster_view.activated.connect(
             self._roster_item_activated,
@@ -183,9 +195,9 @@ class MainWindow(Qt.QMainWindow):
             self.main.metadata,
         )
 
-        self.sorted_conversations = Qt.QSortFilterProxyModel()
+        self.sorted_conversations = models.SortKeyProxyModel()
         self.sorted_conversations.setSourceModel(self.__conversation_model)
-        self.sorted_conversations.setSortRole(Qt.Qt.DisplayRole)
+        self.sorted_conversations.setSortRole(models.ROLE_SORT_KEY)
         self.sorted_conversations.setSortLocaleAware(True)
         self.sorted_conversations.setSortCaseSensitivity(False)
         self.sorted_conversations.setDynamicSortFilter(True)
@@ -200,6 +212,11 @@ class MainWindow(Qt.QMainWindow):
         self.ui.conversations_view.setItemDelegate(
             self._conversation_item_delegate
         )
+        self._conversations_prefetcher = misc.AvatarPrefetcher(
+            self.ui.conversations_view,
+            main.avatar,
+            self._conversation_avatar_key,
+        )
         self.ui.conversations_view.selectionModel().selectionChanged.connect(
             self._conversation_selected,
         )
@@ -263,6 +280,12 @@ class MainWindow(Qt.QMainWindow):
         )
         self.addAction(self.ui.action_focus_search_bar)
 
+        self._filter_debounce_timer = Qt.QTimer(self)
+        self._filter_debounce_timer.setSingleShot(True)
+        self._filter_debounce_timer.setInterval(
+            self.FILTER_DEBOUNCE_INTERVAL
+        )
+        self._filter_debounce_timer.timeout.connect(self._apply_filter_text)
         self.ui.magic_bar.textChanged.connect(self._filter_text_changed)
         self.ui.magic_bar.tags_filter_model = self.checked_tags
         self.ui.magic_bar.installEventFilter(self)
@@ -351,6 +374,7 @@ class MainWindow(Qt.QMainWindow):
         if obj is self.ui.magic_bar:
             if event.type() == Qt.QEvent.KeyPress:
                 if event.key() == Qt.Qt.Key_Down:
+                    self._apply_filter_text()
                     self.ui.roster_view.setFocus()
                     return True
             elif event.type() == Qt.QEvent.FocusIn:
@@ -369,8 +393,37 @@ class MainWindow(Qt.QMainWindow):
                 return index
         return Qt.QModelIndex()
 
+    @staticmethod
+    def _roster_avatar_key(index):
+        item = index.data(models.ROLE_OBJECT)
+        return item.account, item.address
+
+    @staticmethod
+    def _conversation_avatar_key(index):
+        item = index.data(models.ROLE_OBJECT)
+        return item.account, item.conversation_address
+
+    @property
+    def filter_debounce_interval(self) -> int:
+        return self._filter_debounce_timer.interval()
+
+    @filter_debounce_interval.setter
+    def filter_debounce_interval(self, value: int):
+        self._filter_debounce_timer.setInterval(value)
+
     def _filter_text_changed(self, new_text):
-        self.filtered_roster.filter_by_text = new_text
+        if not new_text:
+            # clearing is a single action, no need to wait for more input
+            self._apply_filter_text()
+            return
+        self._filter_debounce_timer.start()
+
+    def _apply_filter_text(self):
+        self._filter_debounce_timer.stop()
+        new_text = self.ui.magic_bar.text()
+        if (models.normalize_for_search(new_text) !=
+                self.filtered_roster.filter_by_text):
+            self.filtered_roster.filter_by_text = new_text
 
     def _clear_filters(self):
         self.checked_tags.clear_check_states()
@@ -557,7 +610,7 @@ class MainWindow(Qt.QMainWindow):
             page.set_focus_to_message_input()
 
     def _select_conversation(self, conversation):
-        index = self.main.conversations.index(conversation)
+        index = self.__conversation_model.row_of(conversation)
         self.ui.conversations_view.selectionModel().select(
             self.sorted_conversations.mapFromSource(
                 self.__conversation_model.index(index, 0,
@@ -616,7 +669,7 @@ class MainWindow(Qt.QMainWindow):
             conversation = self.__pagemap[page]
         except KeyError:
             return
-        conv_index = self.main.conversations.index(conversation)
+        conv_index = self.__conversation_model.row_of(conversation)
 
         model_index = self.sorted_conversations.mapFromSource(
             self.__conversation_model.index(
@@ -757,6 +810,12 @@ class MainWindow(Qt.QMainWindow):
         room, fut = muc.join(mucjid, nick)
         yield from fut
 
+    def changeEvent(self, ev):
+        if ev.type() in (Qt.QEvent.FontChange,
+                         Qt.QEvent.ApplicationFontChange):
+            self.main.avatar.flush_font_caches()
+        return super().changeEvent(ev)
+
     def closeEvent(self, ev):
         result = super().closeEvent(ev)
         self.main.quit()
@@ -771,11 +830,17 @@ class QtMain(jclib.main.Main):
         self.avatar = jabbercat.avatar.AvatarManager(
             self.client,
             self.writeman,
+            jabbercat.avatar.AvatarDiskStore(
+                jabbercat.avatar.default_avatar_store_path(),
+            ),
         )
         self.avatar_urls = webintegration.AvatarURLSchemeHandler(
             self.accounts,
             self.avatar,
         )
+        Qt.QApplication.instance().fontDatabaseChanged.connect(
+            self.avatar.flush_font_caches,
+        )
         self.web_profile = Qt.QWebEngineProfile()
         self.web_profile.installUrlSchemeHandler(
             b"avatar",
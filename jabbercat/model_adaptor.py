@@ -2,6 +2,10 @@ from . import Qt
 
 
 class ModelListAdaptor:
+    #: Number of rows at the end of the list which have not been announced to
+    #: the model yet; see :class:`BatchedModelListAdaptor`.
+    pending_rows = 0
+
     def __init__(self, mlist, model):
         super().__init__()
         self.model = model
@@ -50,6 +54,232 @@ class ModelListAdaptor:
         self.model.endMoveRows()
 
 
+class BatchedModelListAdaptor(ModelListAdaptor):
+    """
+    :class:`ModelListAdaptor` which coalesces rows appended to the list.
+
+    :param threshold: Number of rows above which a batch is announced as a
+        model reset.
+
+    Rows appended to the end of the list are not announced to the model
+    right away. All rows appended within one event loop iteration are
+    announced together, as one contiguous insertion or, if there are more
+    than `threshold` of them, as a model reset. Any other structural change
+    to the list announces the pending rows first.
+
+    The model must hide the rows which have not been announced yet, that
+    is, report the length of the list minus :attr:`pending_rows` as its row
+    count.
+    """
+
+    DEFAULT_THRESHOLD = 100
+
+    def __init__(self, mlist, model, threshold=DEFAULT_THRESHOLD):
+        super().__init__(mlist, model)
+        self._mlist = mlist
+        self.threshold = threshold
+        self.pending_rows = 0
+        self._appending = None
+        self._flush_timer = Qt.QTimer()
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(0)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def flush(self):
+        """
+        Announce the pending rows to the model immediately.
+        """
+        self._flush_timer.stop()
+        if not self.pending_rows:
+            return
+
+        count = len(self._mlist)
+        if self.pending_rows > self.threshold:
+            self.model.beginResetModel()
+            self.pending_rows = 0
+            self.model.endResetModel()
+        else:
+            self.model.beginInsertRows(
+                Qt.QModelIndex(),
+                count - self.pending_rows,
+                count - 1,
+            )
+            self.pending_rows = 0
+            self.model.endInsertRows()
+
+    def begin_insert_rows(self, _, index1, index2):
+        if index1 == len(self._mlist):
+            self._appending = index2 - index1 + 1
+            return
+        self.flush()
+        super().begin_insert_rows(_, index1, index2)
+
+    def end_insert_rows(self):
+        if self._appending is not None:
+            self.pending_rows += self._appending
+            self._appending = None
+            self._flush_timer.start()
+            return
+        super().end_insert_rows()
+
+    def begin_remove_rows(self, _, index1, index2):
+        self.flush()
+        super().begin_remove_rows(_, index1, index2)
+
+    def begin_move_rows(self,
+                        srcparent, srcindex1, srcindex2,
+                        destparent, destindex):
+        self.flush()
+        super().begin_move_rows(srcparent, srcindex1, srcindex2,
+                                destparent, destindex)
+
+
+class ModelRowIndex:
+    """
+    Map the keys of the items of a list model to their rows.
+
+    :param model: The Qt model which presents `mlist`.
+    :param mlist: The list backing `model`.
+    :param key_func: Function returning the key of an item.
+
+    Only the rows `model` has announced are indexed, so that rows still
+    pending in a :class:`BatchedModelListAdaptor` cannot be looked up before
+    the model reports them.
+
+    The index follows the row signals of `model`. Inserting or removing
+    rows only marks the rows from the change to the end of the list as
+    dirty; moving rows marks the moved range. The dirty rows are re-keyed
+    once, when a lookup hits one of them or misses, so a burst of changes
+    costs a single pass over the affected rows, and lookups of rows before
+    the first change stay constant-time. Layout changes and model resets
+    invalidate the index, which is then rebuilt on the next lookup.
+
+    If several items share a key, the lowest row wins. Shifting rows cannot
+    tell which duplicate becomes the lowest, so while the list contains
+    duplicate keys, every structural change invalidates the index instead.
+    """
+
+    def __init__(self, model, mlist, key_func):
+        super().__init__()
+        self._model = model
+        self._mlist = mlist
+        self._key_func = key_func
+        self._rows = {}
+        self._valid = False
+        self._unique = False
+        # (first, last) rows whose entries may be stale; last is None if
+        # the range extends to the end of the list
+        self._dirty = None
+
+        model.rowsInserted.connect(self._rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._rows_about_to_be_removed)
+        model.rowsMoved.connect(self._rows_moved)
+        model.modelReset.connect(self.invalidate)
+        model.layoutChanged.connect(self.invalidate)
+
+    def invalidate(self, *args):
+        self._valid = False
+        self._dirty = None
+        self._rows.clear()
+
+    def _row_count(self):
+        return self._model.rowCount(Qt.QModelIndex())
+
+    def _rebuild(self):
+        rows = {}
+        count = self._row_count()
+        for row in range(count):
+            rows.setdefault(self._key_func(self._mlist[row]), row)
+        self._rows = rows
+        self._valid = True
+        self._unique = len(rows) == count
+
+    def _is_dirty(self, row):
+        if self._dirty is None:
+            return False
+        first, last = self._dirty
+        return row >= first and (last is None or row <= last)
+
+    def _mark_dirty(self, first, last=None):
+        if self._dirty is not None:
+            old_first, old_last = self._dirty
+            first = min(first, old_first)
+            if last is not None and old_last is not None:
+                last = max(last, old_last)
+            else:
+                last = None
+        self._dirty = first, last
+
+    def _rekey_dirty(self):
+        first, last = self._dirty
+        if last is None:
+            last = self._row_count() - 1
+        rows = self._rows
+        keys = []
+        for row in range(first, last + 1):
+            key = self._key_func(self._mlist[row])
+            old_row = rows.get(key)
+            if old_row is not None and not self._is_dirty(old_row):
+                # another item outside of the dirty rows has the same key
+                self.invalidate()
+                return
+            keys.append(key)
+
+        if len(set(keys)) != len(keys):
+            self.invalidate()
+            return
+
+        for row, key in enumerate(keys, first):
+            rows[key] = row
+        self._dirty = None
+
+    def _rows_inserted(self, parent, first, last):
+        if not self._valid:
+            return
+        if not self._unique:
+            self.invalidate()
+            return
+        self._mark_dirty(first)
+
+    def _rows_about_to_be_removed(self, parent, first, last):
+        if not self._valid:
+            return
+        if not self._unique:
+            self.invalidate()
+            return
+        rows = self._rows
+        for row in range(first, last + 1):
+            key = self._key_func(self._mlist[row])
+            old_row = rows.get(key)
+            if old_row is not None and (first <= old_row <= last or
+                                        self._is_dirty(old_row)):
+                del rows[key]
+        self._mark_dirty(first)
+
+    def _rows_moved(self, parent, start, end, destination, dest_row):
+        if not self._valid:
+            return
+        if not self._unique:
+            self.invalidate()
+            return
+        self._mark_dirty(min(start, dest_row), max(end, dest_row - 1))
+
+    def row_of(self, key) -> int:
+        """
+        Return the row of the item with the given `key`.
+
+        :raises KeyError: if no item has that key.
+        """
+        if self._valid and self._dirty is not None:
+            row = self._rows.get(key)
+            if row is not None and not self._is_dirty(row):
+                return row
+            self._rekey_dirty()
+        if not self._valid:
+            self._rebuild()
+        return self._rows[key]
+
+
 # class ListModel(Qt.QAbstractListModel):
 #     def __init__(self, mlist, handler, *, parent=None):
 #         super().__init__(parent)
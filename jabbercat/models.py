@@ -1,5 +1,5 @@
-import bisect
 import enum
+import functools
 import typing
 import unicodedata
 import itertools
@@ -18,14 +18,55 @@ import jclib.roster
 import jclib.utils
 
 import jabbercat.avatar
-import jabbercat.utils
 
-from . import Qt, model_adaptor, utils
+from . import Qt, model_adaptor, search, utils
 
 
 ROLE_OBJECT = Qt.Qt.UserRole + 1
 ROLE_TAGS = Qt.Qt.UserRole + 2
 ROLE_FILTER_SCORE = Qt.Qt.UserRole + 3
+ROLE_SEARCH_KEY = Qt.Qt.UserRole + 4
+ROLE_SORT_KEY = Qt.Qt.UserRole + 5
+ROLE_TAG_KEY = Qt.Qt.UserRole + 6
+# (sender, body, timestamp) of the most recent message of a conversation
+ROLE_PREVIEW = Qt.Qt.UserRole + 7
+
+
+def normalize_for_search(s: str) -> str:
+    return unicodedata.normalize("NFKC", s).casefold()
+
+
+def tag_key(tags: typing.Iterable[str]) -> typing.Tuple[
+        typing.Tuple[str, str], ...]:
+    """
+    Return the tuple of ``(tag, normalized tag)`` pairs of `tags`, sorted by
+    the normalized tag.
+
+    The tags are normalized with :func:`jclib.utils.normalise_text_for_hash`.
+    """
+    return tuple(sorted(
+        ((tag, jclib.utils.normalise_text_for_hash(tag)) for tag in tags),
+        key=lambda x: x[1]
+    ))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_collator() -> Qt.QCollator:
+    collator = Qt.QCollator()
+    collator.setCaseSensitivity(Qt.Qt.CaseInsensitive)
+    return collator
+
+
+def collation_key(s: str) -> Qt.QCollatorSortKey:
+    """
+    Return a key to sort `s` locale-aware and case-insensitively.
+
+    Models return these for :data:`ROLE_SORT_KEY`; see
+    :class:`SortKeyProxyModel`.
+    """
+    # QCollator's POSIX backend (used for the C locale) ignores the case
+    # sensitivity when building sort keys, so fold the case ourselves
+    return _get_collator().sortKey(s.casefold())
 
 
 class AccountsModel(Qt.QAbstractTableModel):
@@ -143,6 +184,29 @@ class ConversationsModel(Qt.QAbstractTableModel):
         self.__adaptor = model_adaptor.ModelListAdaptor(
             self.__conversations, self
         )
+        self.__row_index = model_adaptor.ModelRowIndex(
+            self, self.__conversations,
+            lambda item: (item.account, item.conversation_address),
+        )
+        self.__node_index = model_adaptor.ModelRowIndex(
+            self, self.__conversations,
+            lambda item: item,
+        )
+        # node -> label
+        self.__labels = {}
+        # node -> collation key of the label
+        self.__sort_keys = {}
+        # node -> (sender, body, timestamp) of the last message or None;
+        # nodes in here are connected to in __message_tokens
+        self.__previews = {}
+        self.__message_tokens = {}
+        self.rowsAboutToBeRemoved.connect(self._rows_about_to_be_removed)
+        self._metadata.changed_signal(
+            jclib.roster.RosterMetadata.NAME
+        ).connect(
+            self._on_name_changed,
+            aioxmpp.callbacks.AdHocSignal.WEAK,
+        )
 
     def columnCount(self, index):
         return self.COLUMN_COUNT
@@ -152,15 +216,119 @@ class ConversationsModel(Qt.QAbstractTableModel):
             return 0
         return len(self.__conversations)
 
+    def row_of(self,
+               conversation_node: jclib.conversation.ConversationNode) -> int:
+        """
+        Return the row of `conversation_node`.
+
+        :raises KeyError: if the node is not in the model.
+        """
+        return self.__node_index.row_of(conversation_node)
+
     def _handle_unread_count_changed(
             self,
             conversation_node: jclib.conversation.ConversationNode,
             new_counter: int):
-        index = self.index(self.__conversations.index(conversation_node),
-                           0,
-                           Qt.QModelIndex())
+        try:
+            row = self.row_of(conversation_node)
+        except KeyError:
+            return
+        index = self.index(row, 0, Qt.QModelIndex())
         self.dataChanged.emit(index, index, [Qt.Qt.DisplayRole])
 
+    def _rows_about_to_be_removed(self, parent, index1, index2):
+        for row in range(index1, index2 + 1):
+            conversation = self.__conversations[row]
+            self.__labels.pop(conversation, None)
+            self.__sort_keys.pop(conversation, None)
+            self.__previews.pop(conversation, None)
+            try:
+                token = self.__message_tokens.pop(conversation)
+            except KeyError:
+                pass
+            else:
+                conversation.on_message.disconnect(token)
+
+    @staticmethod
+    def _make_preview(timestamp, from_, message):
+        return (
+            from_,
+            message.body.any().strip().replace("\n", " "),
+            timestamp,
+        )
+
+    def _on_message(self, conversation, timestamp, message_uid, is_self,
+                    from_jid, from_, color_input, message, tracker=None):
+        old_preview = self.__previews.get(conversation)
+        if old_preview is not None and timestamp < old_preview[2]:
+            return
+        self.__previews[conversation] = self._make_preview(
+            timestamp, from_, message,
+        )
+        try:
+            row = self.row_of(conversation)
+        except KeyError:
+            return
+        index = self.index(row, 0, Qt.QModelIndex())
+        self.dataChanged.emit(index, index, [ROLE_PREVIEW])
+
+    def _get_preview(self, conversation):
+        try:
+            return self.__previews[conversation]
+        except KeyError:
+            pass
+
+        # follow new messages from now on, so that the archive is only
+        # asked once per conversation
+        self.__message_tokens[conversation] = conversation.on_message.connect(
+            functools.partial(self._on_message, conversation)
+        )
+        try:
+            (timestamp, _, _, _, from_, _, message), = \
+                conversation.get_last_messages(max_count=1)
+        except ValueError:
+            result = None
+        else:
+            result = self._make_preview(timestamp, from_, message)
+        self.__previews[conversation] = result
+        return result
+
+    def _on_name_changed(self, key, account, peer, value):
+        for conversation in [conversation
+                             for conversation in self.__labels
+                             if conversation.account == account and
+                             conversation.address == peer]:
+            del self.__labels[conversation]
+            self.__sort_keys.pop(conversation, None)
+            try:
+                row = self.row_of(conversation)
+            except KeyError:
+                continue
+            index = self.index(row, 0, Qt.QModelIndex())
+            self.dataChanged.emit(index, index,
+                                  [Qt.Qt.DisplayRole, ROLE_SORT_KEY])
+
+    def _get_label(self, conversation):
+        try:
+            return self.__labels[conversation]
+        except KeyError:
+            pass
+        name = self._metadata.get(jclib.roster.RosterMetadata.NAME,
+                                  conversation.account,
+                                  conversation.address)
+        name = name or str(conversation.address)
+        self.__labels[conversation] = name
+        return name
+
+    def _get_sort_key(self, conversation):
+        try:
+            return self.__sort_keys[conversation]
+        except KeyError:
+            pass
+        result = collation_key(self._get_label(conversation))
+        self.__sort_keys[conversation] = result
+        return result
+
     def data(self,
              index: Qt.QModelIndex,
              role: Qt.Qt.ItemDataRole=Qt.Qt.DisplayRole):
@@ -170,21 +338,21 @@ class ConversationsModel(Qt.QAbstractTableModel):
         if role == Qt.Qt.DisplayRole:
             # return self.__conversations[index.row()].label
             conversation = self.__conversations[index.row()]
-            name = self._metadata.get(jclib.roster.RosterMetadata.NAME,
-                                      conversation.account,
-                                      conversation.address)
-            name = name or str(conversation.address)
-            return name
+            return self._get_label(conversation)
+        elif role == ROLE_SORT_KEY:
+            return self._get_sort_key(self.__conversations[index.row()])
+        elif role == ROLE_PREVIEW:
+            return self._get_preview(self.__conversations[index.row()])
         elif role == ROLE_OBJECT:
             return self.__conversations[index.row()]
 
     def _on_avatar_changed(self, account, address):
-        for i, item in enumerate(self.__conversations):
-            if item.account != account or item.conversation_address != address:
-                continue
-            index = self.index(i, 0)
-            self.dataChanged.emit(index, index, [Qt.Qt.DecorationRole])
+        try:
+            row = self.__row_index.row_of((account, address))
+        except KeyError:
             return
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [Qt.Qt.DecorationRole])
 
 
 class RosterTagsModel(Qt.QAbstractListModel):
@@ -344,26 +512,23 @@ class FilterDisabledItems(Qt.QSortFilterProxyModel):
 class FlattenModelToSeparators(Qt.QAbstractProxyModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._breaks = []
+        # number of rows each top-level source row occupies in the proxy,
+        # i.e. one for the separator plus one per child; the prefix sums are
+        # the rows of the separators
+        self._sizes = utils.FenwickTree()
         self._connections = []
 
     def setSourceModel(self, new_model):
         self.beginResetModel()
-        self._breaks.clear()
         for conn in self._connections:
             conn.disconnect()
         super().setSourceModel(new_model)
 
         model = self.sourceModel()
-        self._breaks.clear()
-        i_absolute = 0
-        for i in range(model.rowCount()):
-            idx = model.index(i, 0, Qt.QModelIndex())
-            nchildren = model.rowCount(idx)
-            self._breaks.append(
-                i_absolute
-            )
-            i_absolute += nchildren + 1
+        self._sizes = utils.FenwickTree(
+            model.rowCount(model.index(i, 0, Qt.QModelIndex())) + 1
+            for i in range(model.rowCount())
+        )
 
         self._connections.append(
             model.rowsInserted.connect(self._source_rowsInserted)
@@ -382,48 +547,24 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
         self.endResetModel()
 
     def _source_rowsInserted(self, parent, start, end):
-        # check if the parent maps to our root
-        if self.mapFromSource(parent).parent().isValid():
-            # drop
+        if parent.parent().isValid():
+            # we don’t support grandchildren
             return
 
         if parent.isValid():
             # adding inlined children
-            # map start index
-            mapped_parent = self.mapFromSource(parent)
-            offset = mapped_parent.row() + 1
-            start_mapped = start + offset
-            end_mapped = end + offset
-            new_children = (end - start) + 1
-            self.beginInsertRows(Qt.QModelIndex(), start_mapped, end_mapped)
-            for i, old_break in enumerate(
-                    self._breaks[parent.row() + 1:],
-                    parent.row() + 1):  # update breaks *after* the parent
-                self._breaks[i] += new_children
+            offset = self._sizes.prefix_sum(parent.row()) + 1
+            self.beginInsertRows(Qt.QModelIndex(),
+                                 start + offset, end + offset)
+            self._sizes.add(parent.row(), end - start + 1)
             self.endInsertRows()
         else:
-            # adding new root
-            # find break for start index
-            if start >= len(self._breaks):
-                offset = self._len() - start
-            else:
-                offset = self._breaks[start + 1] - start
-
-            start_mapped = start + offset
-            end_mapped = end + offset
-            new_children = (end - start) + 1
-
-            self.beginInsertRows(Qt.QModelIndex(), start_mapped, end_mapped)
-            for i, old_break in enumerate(
-                    self._breaks[start + 1:],
-                    start + 1):  # update breaks *after* the newly inserted ones
-                self._breaks[i] += new_children
-
-            # insert new breaks
-            self._breaks[start + 1:start + 1] = range(
-                start_mapped,
-                end_mapped + 1
-            )
+            # adding new roots, first without their children
+            start_mapped = self._sizes.prefix_sum(start)
+            new_roots = end - start + 1
+            self.beginInsertRows(Qt.QModelIndex(),
+                                 start_mapped, start_mapped + new_roots - 1)
+            self._sizes.insert(start, [1] * new_roots)
             self.endInsertRows()
 
             source = self.sourceModel()
@@ -436,64 +577,29 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
                 self._source_rowsInserted(new_idx, 0, nchildren - 1)
 
     def _source_rowsAboutToBeRemoved(self, parent, start, end):
-        if self.mapFromSource(parent).parent().isValid():
+        if parent.parent().isValid():
             return
 
         if parent.isValid():
-            mapped_parent = self.mapFromSource(parent)
-            offset = mapped_parent.row() + 1
-            start_mapped = start + offset
-            end_mapped = end + offset
-            new_children = (end - start) + 1
-            self.beginRemoveRows(Qt.QModelIndex(), start_mapped, end_mapped)
-            for i, old_break in enumerate(
-                    self._breaks[start + 1:],
-                    start + 1):  # update breaks *after* the newly inserted ones
-                self._breaks[i] -= new_children
+            offset = self._sizes.prefix_sum(parent.row()) + 1
+            self.beginRemoveRows(Qt.QModelIndex(),
+                                 start + offset, end + offset)
+            self._sizes.add(parent.row(), -(end - start + 1))
         else:
-            # remove root item
-            # find break for start index
-            if start >= len(self._breaks):
-                offset = self._len() - start
-            else:
-                offset = self._breaks[start] - start
-
-            start_mapped = start + offset
-            end_mapped = end + offset
-
-            end_mapped_inlined = end_mapped
-            source = self.sourceModel()
-            for source_row in range(start, end + 1):
-                source_idx = source.index(source_row, 0, parent)
-                end_mapped_inlined += source.rowCount(source_idx)
-            to_remove = (end_mapped_inlined - start_mapped) + 1
-
-            self.beginRemoveRows(Qt.QModelIndex(), start_mapped,
-                                 end_mapped_inlined)
-
-            del self._breaks[start:end + 1]
-
-            for i, old_break in enumerate(
-                    self._breaks[start:],
-                    start):  # update breaks *after* the newly inserted ones
-                self._breaks[i] -= to_remove
+            # remove root items along with their children
+            self.beginRemoveRows(Qt.QModelIndex(),
+                                 self._sizes.prefix_sum(start),
+                                 self._sizes.prefix_sum(end + 1) - 1)
+            self._sizes.delete(start, end + 1)
 
     def _source_rowsRemoved(self, parent, start, end):
-        if self.mapFromSource(parent).parent().isValid():
+        if parent.parent().isValid():
             return
 
         self.endRemoveRows()
 
     def _len(self):
-        if not self._breaks:
-            return 0
-        return self._breaks[-1] + self.sourceModel().rowCount(
-            self.sourceModel().index(
-                len(self._breaks) - 1,
-                0,
-                Qt.QModelIndex()
-            )
-        ) + 1
+        return self._sizes.total()
 
     def rowCount(self, parent):
         if parent.isValid():
@@ -520,9 +626,10 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
 
     def _map_firstlevel_to_source(self, proxyIndex):
         row = proxyIndex.row()
-        # find the row in the breaks list
-        mapping = bisect.bisect(self._breaks, row) - 1
-        if self._breaks[mapping] == row:
+        # find the top-level row which covers the row
+        mapping = self._sizes.find(row)
+        separator_row = self._sizes.prefix_sum(mapping)
+        if separator_row == row:
             # first level in source
             return self.sourceModel().index(
                 mapping,
@@ -535,7 +642,7 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
                 mapping,
                 0,
             )
-            child_row = (row - self._breaks[mapping]) - 1
+            child_row = (row - separator_row) - 1
             return self.sourceModel().index(
                 child_row,
                 0,
@@ -546,7 +653,7 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
         parent = sourceIndex.parent()
         if not parent.isValid():  # root
             return self.index(
-                self._breaks[sourceIndex.row()],
+                self._sizes.prefix_sum(sourceIndex.row()),
                 sourceIndex.column(),
                 Qt.QModelIndex(),
             )
@@ -557,7 +664,7 @@ class FlattenModelToSeparators(Qt.QAbstractProxyModel):
             return Qt.QModelIndex()
 
         return self.index(
-            self._breaks[parent.row()] + sourceIndex.row() + 1,
+            self._sizes.prefix_sum(parent.row()) + sourceIndex.row() + 1,
             sourceIndex.column(),
             Qt.QModelIndex(),
         )
@@ -584,7 +691,8 @@ class RosterModel(Qt.QAbstractListModel):
                  items: jclib.instrumentable_list.AbstractModelListView[
                      jclib.roster.AbstractRosterItem],
                  avatar_manager: jabbercat.avatar.AvatarManager,
-                 metadata: jclib.metadata.MetadataFrontend):
+                 metadata: jclib.metadata.MetadataFrontend,
+                 batched: bool=False):
         super().__init__()
         self._items = items
         self._avatar_manager = avatar_manager
@@ -592,17 +700,96 @@ class RosterModel(Qt.QAbstractListModel):
             self._on_avatar_changed,
             self._avatar_manager.on_avatar_changed.WEAK)
         self._metadata = metadata
-        self.__adaptor = model_adaptor.ModelListAdaptor(
-            self._items, self
+        if batched:
+            self.__adaptor = model_adaptor.BatchedModelListAdaptor(
+                self._items, self
+            )
+        else:
+            self.__adaptor = model_adaptor.ModelListAdaptor(
+                self._items, self
+            )
+        self.__row_index = model_adaptor.ModelRowIndex(
+            self, self._items,
+            lambda item: (item.account, item.address),
+        )
+        # item -> normalized search strings
+        self._search_keys = {}
+        # item -> tool tip HTML
+        self._tooltips = {}
+        # item -> collation key of the label
+        self._sort_keys = {}
+        # item -> tag_key() of the tags
+        self._tag_keys = {}
+        self._items.data_changed.connect(self._data_changed)
+        self.rowsAboutToBeRemoved.connect(self._rows_about_to_be_removed)
+        self._metadata.changed_signal(
+            jclib.metadata.PresenceMetadata.STANZA
+        ).connect(
+            self._on_presence_changed,
+            aioxmpp.callbacks.AdHocSignal.WEAK,
+        )
+
+    def _data_changed(self, _, index1, index2, column1, column2, roles):
+        for row in range(index1, index2 + 1):
+            item = self._items[row]
+            self._search_keys.pop(item, None)
+            self._tooltips.pop(item, None)
+            self._sort_keys.pop(item, None)
+            self._tag_keys.pop(item, None)
+        # rows which have not been announced yet need no update
+        index2 = min(index2, self.rowCount(Qt.QModelIndex()) - 1)
+        if index2 < index1:
+            return
+        self.dataChanged.emit(
+            self.index(index1, 0),
+            self.index(index2, 0),
+            roles or [],
         )
 
+    def _rows_about_to_be_removed(self, parent, index1, index2):
+        for row in range(index1, index2 + 1):
+            item = self._items[row]
+            self._search_keys.pop(item, None)
+            self._tooltips.pop(item, None)
+            self._sort_keys.pop(item, None)
+            self._tag_keys.pop(item, None)
+
+    def _on_presence_changed(self, key, account, peer, value):
+        try:
+            row = self.row_of(account, peer.bare())
+        except KeyError:
+            return
+        self._tooltips.pop(self._items[row], None)
+
+    def _get_search_key(self, item) -> typing.Tuple[str, ...]:
+        try:
+            return self._search_keys[item]
+        except KeyError:
+            pass
+        result = tuple(
+            normalize_for_search(s)
+            for s in itertools.chain(
+                [str(item.address), item.label],
+                item.tags,
+            )
+        )
+        self._search_keys[item] = result
+        return result
+
+    def _get_tooltip(self, item):
+        try:
+            return self._tooltips[item]
+        except KeyError:
+            pass
+        result = self._format_tooltip(item)
+        self._tooltips[item] = result
+        return result
+
     def _format_tooltip(self, item):
-        picture = self._avatar_manager.get_avatar(
+        picture_base64 = self._avatar_manager.get_avatar_data_uri(
             item.account, item.address,
         )
 
-        picture_base64 = jabbercat.utils.qtpicture_to_data_uri(picture)
-
         H = lxml.builder.ElementMaker()
 
         avatar = H.img(width="48", height="48", src=picture_base64)
@@ -706,7 +893,7 @@ class RosterModel(Qt.QAbstractListModel):
     def rowCount(self, parent):
         if parent.isValid():
             return 0
-        return len(self._items)
+        return len(self._items) - self.__adaptor.pending_rows
 
     def data(self, index, role):
         if not index.isValid():
@@ -717,13 +904,31 @@ class RosterModel(Qt.QAbstractListModel):
         if role == Qt.Qt.DisplayRole or role == Qt.Qt.EditRole:
             return item.label
         elif role == Qt.Qt.ToolTipRole:
-            return self._format_tooltip(item)
+            return self._get_tooltip(item)
         elif role == ROLE_OBJECT:
             return item
         elif role == ROLE_TAGS:
             return "".join(
                 tag + "\n" for tag in sorted(item.tags)
             )
+        elif role == ROLE_SEARCH_KEY:
+            return self._get_search_key(item)
+        elif role == ROLE_SORT_KEY:
+            try:
+                return self._sort_keys[item]
+            except KeyError:
+                pass
+            result = collation_key(item.label)
+            self._sort_keys[item] = result
+            return result
+        elif role == ROLE_TAG_KEY:
+            try:
+                return self._tag_keys[item]
+            except KeyError:
+                pass
+            result = tag_key(item.tags)
+            self._tag_keys[item] = result
+            return result
 
     def setData(self, index, value, role):
         if not index.isValid():
@@ -735,16 +940,148 @@ class RosterModel(Qt.QAbstractListModel):
         self.on_label_edited(self._items[index.row()], value)
         return False
 
+    def row_of(self, account, address) -> int:
+        """
+        Return the row of the roster item for `address` on `account`.
+
+        :raises KeyError: if there is no such item.
+        """
+        return self.__row_index.row_of((account, address))
+
     def _on_avatar_changed(self, account, address):
-        for i, item in enumerate(self._items):
-            if item.account != account or item.address != address:
-                continue
-            index = self.index(i, 0)
-            self.dataChanged.emit(index, index, [Qt.Qt.DecorationRole])
+        try:
+            row = self.row_of(account, address)
+        except KeyError:
+            return
+        self._tooltips.pop(self._items[row], None)
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [Qt.Qt.DecorationRole])
+
+
+class RoleAwareProxyModel(Qt.QSortFilterProxyModel):
+    """
+    Sort/filter proxy which only re-sorts and re-filters rows if a relevant
+    role changed.
+
+    Sorting and filtering stays dynamic, so that inserted rows are placed
+    by :class:`QSortFilterProxyModel` as usual. On a :meth:`dataChanged` of
+    the source however, it evaluates the filter for each changed row and
+    compares the row with its neighbours to find out whether it has to
+    move, no matter which roles changed.
+
+    That handling cannot be replaced, so this proxy brackets it instead.
+    While a :meth:`dataChanged` is handled whose roles include none of the
+    :meth:`filter_roles`, :attr:`_filter_unchanged` is true; subclasses
+    which filter in Python keep their previous decision then. If the roles
+    include none of the :meth:`sort_roles` either, :meth:`lessThan` reports
+    the rows as equal without comparing them, so that no row moves and the
+    change is forwarded as a plain repaint. An empty list of roles counts
+    as a change of all roles.
+
+    Subclasses compare rows in :meth:`_less_than` instead of
+    :meth:`lessThan`.
+    """
+
+    def __init__(self, parent: Qt.QObject=None):
+        super().__init__(parent)
+        self._filter_unchanged = False
+        self._order_unchanged = False
+
+    def setSourceModel(self, model: Qt.QAbstractItemModel):
+        old_model = self.sourceModel()
+        if old_model is not None:
+            old_model.dataChanged.disconnect(self._source_data_changing)
+            old_model.dataChanged.disconnect(self._source_data_changed)
+
+        # slots are invoked in the order they were connected; bracket the
+        # handler which QSortFilterProxyModel connects in setSourceModel
+        if model is not None:
+            model.dataChanged.connect(self._source_data_changing)
+        super().setSourceModel(model)
+        if model is not None:
+            model.dataChanged.connect(self._source_data_changed)
+
+    def sort_roles(self) -> typing.Set[int]:
+        """
+        Return the roles which affect the order of the rows.
+
+        By default, this is only the :meth:`sortRole`. Subclasses whose
+        :meth:`_less_than` looks at other roles must add them.
+        """
+        return {self.sortRole()}
+
+    def filter_roles(self) -> typing.Set[int]:
+        """
+        Return the roles which affect whether a row is accepted.
+
+        By default, this is only the :meth:`filterRole`. Subclasses whose
+        :meth:`filterAcceptsRow` looks at other roles must return those.
+        """
+        return {self.filterRole()}
+
+    def _source_data_changing(self, top_left, bottom_right, roles=[]):
+        if not roles:
             return
+        self._filter_unchanged = self.filter_roles().isdisjoint(roles)
+        # rows may only be accepted anew if the filter roles changed, and
+        # those have to be placed by actually comparing them
+        self._order_unchanged = (self._filter_unchanged and
+                                 self.sort_roles().isdisjoint(roles))
+
+    def _source_data_changed(self, top_left, bottom_right, roles=[]):
+        self._filter_unchanged = False
+        self._order_unchanged = False
+
+    def lessThan(self, left: Qt.QModelIndex, right: Qt.QModelIndex):
+        if self._order_unchanged:
+            return False
+        return self._less_than(left, right)
+
+    def _less_than(self, left: Qt.QModelIndex, right: Qt.QModelIndex):
+        return super().lessThan(left, right)
+
 
+class SortKeyProxyModel(RoleAwareProxyModel):
+    """
+    Sort proxy which compares precomputed collation keys.
 
-class RosterFilterModel(Qt.QSortFilterProxyModel):
+    If the :meth:`~.QSortFilterProxyModel.sortRole` returns
+    :class:`QCollatorSortKey` objects (see :func:`collation_key`), they are
+    compared directly. Otherwise, the default comparison is used.
+    """
+
+    def _less_than(self, left: Qt.QModelIndex, right: Qt.QModelIndex):
+        role = self.sortRole()
+        left_key = left.data(role)
+        right_key = right.data(role)
+        if (isinstance(left_key, Qt.QCollatorSortKey) and
+                isinstance(right_key, Qt.QCollatorSortKey)):
+            return left_key.compare(right_key) < 0
+        return super()._less_than(left, right)
+
+
+class RosterSortModel(SortKeyProxyModel):
+    """
+    Sort proxy which orders roster items by relevance while a text filter is
+    active.
+
+    Items with a higher :data:`ROLE_FILTER_SCORE` sort first. Items with
+    equal or without scores are sorted like in :class:`SortKeyProxyModel`.
+    """
+
+    def sort_roles(self):
+        return super().sort_roles() | {ROLE_FILTER_SCORE}
+
+    def _less_than(self, left: Qt.QModelIndex, right: Qt.QModelIndex):
+        left_score = left.data(ROLE_FILTER_SCORE)
+        right_score = right.data(ROLE_FILTER_SCORE)
+        if (left_score is not None and right_score is not None and
+                left_score != right_score):
+            return left_score > right_score
+        return super()._less_than(left, right)
+
+
+class RosterFilterModel(RoleAwareProxyModel):
     def __init__(self, parent: Qt.QObject=None):
         super().__init__(parent)
 
@@ -752,10 +1089,63 @@ class RosterFilterModel(Qt.QSortFilterProxyModel):
         self._tags_filter_set = None
         self._tags_filter_set_connections = []
         self._filter_by_text = None
-
-    @staticmethod
-    def _normalize_for_comparison(s: str):
-        return unicodedata.normalize("NFKC", s).casefold()
+        self._search_index = search.TrigramIndex()
+        # item -> score for the current text filter
+        self._scores = {}
+        self._tag_index = search.TagIndex()
+        # items carrying all checked tags, None without tags filter model
+        self._tag_matches = None
+        # items rejected by the last evaluation of the filter; keyed by item
+        # instead of row so that it survives rows moving in the source
+        self._rejected_items = set()
+        self._narrowing = False
+        # while not None, only these items are evaluated again
+        self._refiltering = None
+
+    def _source_connections(self, model):
+        return [
+            (model.rowsAboutToBeRemoved,
+             self._source_rows_about_to_be_removed),
+            (model.modelAboutToBeReset,
+             self._source_model_about_to_be_reset),
+        ]
+
+    def setSourceModel(self, model: Qt.QAbstractItemModel):
+        old_model = self.sourceModel()
+        if old_model is not None:
+            for signal, slot in self._source_connections(old_model):
+                signal.disconnect(slot)
+
+        self._search_index.clear()
+        self._scores.clear()
+        self._tag_index.clear()
+        if self._tag_matches is not None:
+            self._tag_matches.clear()
+        self._rejected_items.clear()
+        super().setSourceModel(model)
+
+        if model is not None:
+            for signal, slot in self._source_connections(model):
+                signal.connect(slot)
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        source = self.sourceModel()
+        for row in range(first, last + 1):
+            item = source.data(source.index(row, 0, parent), ROLE_OBJECT)
+            self._search_index.remove(item)
+            self._scores.pop(item, None)
+            self._tag_index.remove(item)
+            if self._tag_matches is not None:
+                self._tag_matches.discard(item)
+            self._rejected_items.discard(item)
+
+    def _source_model_about_to_be_reset(self):
+        self._search_index.clear()
+        self._scores.clear()
+        self._tag_index.clear()
+        if self._tag_matches is not None:
+            self._tag_matches.clear()
+        self._rejected_items.clear()
 
     @property
     def tags_filter_model(self):
@@ -783,11 +1173,41 @@ class RosterFilterModel(Qt.QSortFilterProxyModel):
                     )
                 )
             )
+            self._tag_matches = self._tag_index.matching(
+                self._tags_filter_set.checked
+            )
+        else:
+            self._tags_filter_set = None
+            self._tag_matches = None
 
         self.invalidateFilter()
 
     def _tags_set_changed(self):
-        self.invalidateFilter()
+        old_matches = self._tag_matches
+        self._tag_matches = self._tag_index.matching(
+            self._tags_filter_set.checked
+        )
+        if self._filter_by_text:
+            # tags are not taken into account while filtering by text
+            return
+        self._refilter_items(old_matches ^ self._tag_matches)
+
+    def _refilter_items(self, items):
+        """
+        Re-evaluate the filter for `items` only.
+
+        :class:`QSortFilterProxyModel` offers no way to re-filter single
+        rows, so the whole filter is invalidated; every other row keeps the
+        decision recorded by its last evaluation.
+        """
+        if not items:
+            return
+
+        self._refiltering = items
+        try:
+            self.invalidateFilter()
+        finally:
+            self._refiltering = None
 
     @property
     def filter_by_text(self):
@@ -795,35 +1215,114 @@ class RosterFilterModel(Qt.QSortFilterProxyModel):
 
     @filter_by_text.setter
     def filter_by_text(self, value: str):
-        self._filter_by_text = self._normalize_for_comparison(value)
-        self.invalidateFilter()
+        value = normalize_for_search(value)
+        if value:
+            scores = self._search_index.search(value)
+        else:
+            scores = {}
+
+        # If no item matches which did not match the previous query, only
+        # the rows accepted so far need to be looked at again. That is
+        # usually the case when the query extends the previous one; fuzzy
+        # matches can still pull in new items though, hence the check on
+        # the actual match sets.
+        narrowing = (bool(self._filter_by_text) and bool(value) and
+                     scores.keys() <= self._scores.keys())
+
+        self._filter_by_text = value
+        self._scores = scores
+        self._narrowing = narrowing
+        try:
+            self.invalidateFilter()
+        finally:
+            self._narrowing = False
+        self._emit_scores_changed()
 
     @filter_by_text.deleter
     def filter_by_text(self):
         self._filter_by_text = None
+        self._scores = {}
+
+    def _emit_scores_changed(self):
+        nrows = self.rowCount(Qt.QModelIndex())
+        if not nrows:
+            return
+        self.dataChanged.emit(
+            self.index(0, 0, Qt.QModelIndex()),
+            self.index(nrows - 1, 0, Qt.QModelIndex()),
+            [ROLE_FILTER_SCORE],
+        )
+
+    def _update_item(self, item, search_key):
+        # the search key is cached by the source model until the item
+        # changes, so identity tells whether the item needs re-indexing
+        if self._search_index.strings_of(item) is search_key:
+            return
+
+        self._search_index.add(item, search_key)
+        if self._filter_by_text:
+            score = self._search_index.score(item, self._filter_by_text)
+            if score is None:
+                self._scores.pop(item, None)
+            else:
+                self._scores[item] = score
+
+        tags = frozenset(item.tags)
+        self._tag_index.add(item, tags)
+        if self._tag_matches is not None:
+            if self._tags_filter_set.checked <= tags:
+                self._tag_matches.add(item)
+            else:
+                self._tag_matches.discard(item)
+
+    def filter_roles(self):
+        return {ROLE_SEARCH_KEY, ROLE_TAGS, Qt.Qt.DisplayRole}
+
+    def data(self, index: Qt.QModelIndex, role: int=Qt.Qt.DisplayRole):
+        if role == ROLE_FILTER_SCORE:
+            if not self._filter_by_text:
+                return None
+            return self._scores.get(super().data(index, ROLE_OBJECT))
+        return super().data(index, role)
 
     def filterAcceptsRow(self,
                          source_row: int,
                          source_parent: Qt.QModelIndex):
         source = self.sourceModel()
-        item = source.data(
-            source.index(source_row, 0, source_parent), ROLE_OBJECT
-        )
+        item = source.data(source.index(source_row, 0, source_parent),
+                           ROLE_OBJECT)
+        if (self._filter_unchanged or
+                (self._refiltering is not None and
+                 item not in self._refiltering)):
+            return item not in self._rejected_items
+        if self._narrowing and item in self._rejected_items:
+            return False
+
+        accepted = self._filter_accepts_row(source_row, source_parent)
+        if accepted:
+            self._rejected_items.discard(item)
+        else:
+            self._rejected_items.add(item)
+        return accepted
+
+    def _filter_accepts_row(self,
+                            source_row: int,
+                            source_parent: Qt.QModelIndex):
+        source = self.sourceModel()
+        index = source.index(source_row, 0, source_parent)
+        item = source.data(index, ROLE_OBJECT)
 
         if isinstance(item, jclib.roster.SubscriptionRequestItem):
             # filter inbound subscription requests
             return False
 
+        self._update_item(item, source.data(index, ROLE_SEARCH_KEY))
+
         if self._filter_by_text:
-            query_args = [[str(item.address)], [item.label], item.tags]
-            normalized = [self._normalize_for_comparison(s)
-                          for s in itertools.chain.from_iterable(query_args)]
-            text_input = self._normalize_for_comparison(self._filter_by_text)
-            return any(text_input in n for n in normalized)
-
-        filter_tags = self._tags_filter_set.checked
-        if set(item.tags) & filter_tags != filter_tags:
-            return False
+            return item in self._scores
+
+        if self._tag_matches is not None:
+            return item in self._tag_matches
 
         return True
 
@@ -0,0 +1,271 @@
+import collections
+import typing
+
+
+#: Minimum fraction of query trigrams a document must share to match.
+MIN_SIMILARITY = 0.5
+
+#: Score of a document in which the query occurs verbatim.
+SCORE_SUBSTRING = 1.0
+
+#: Score of a document in which one of the strings starts with the query.
+SCORE_PREFIX = 2.0
+
+
+def trigrams(s: str) -> typing.Set[str]:
+    """
+    Return the set of trigrams of `s`, padded with a space on both ends.
+
+    The padding makes the first and last characters of `s` take part in
+    as many trigrams as the characters in the middle.
+    """
+    s = " {} ".format(s)
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+
+def query_trigrams(query: str) -> typing.FrozenSet[str]:
+    """
+    Return the set of unpadded trigrams of `query`.
+
+    Unlike :func:`trigrams`, no padding is added, so that a query which
+    occurs anywhere inside a document shares all of its trigrams with it.
+    Queries shorter than three characters have no trigrams.
+    """
+    return frozenset(query[i:i+3] for i in range(len(query) - 2))
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to documents, for fuzzy search.
+
+    A document is any hashable object; it is indexed under a sequence of
+    strings (for instance the label, address and tags of a roster item).
+    The strings must already be normalized in the same way as the queries
+    which are run against the index.
+
+    Documents can be added, replaced and removed at any time; the index is
+    updated incrementally.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # trigram -> set of documents
+        self._postings = collections.defaultdict(set)
+        # document -> (strings, text, set of trigrams)
+        # text is the strings joined with and prefixed by a newline, so that
+        # substring and prefix checks are a single ``in`` test
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, document):
+        return document in self._documents
+
+    def strings_of(self, document) -> typing.Optional[typing.Tuple[str]]:
+        """
+        Return the strings `document` is indexed under, or :data:`None` if
+        it is not in the index.
+        """
+        try:
+            strings, _, _ = self._documents[document]
+        except KeyError:
+            return None
+        return strings
+
+    def add(self, document, strings: typing.Iterable[str]):
+        """
+        Index `document` under `strings`.
+
+        If `document` is in the index already, its previous strings are
+        replaced.
+        """
+        strings = tuple(strings)
+        self.remove(document)
+        grams = set()
+        for s in strings:
+            grams |= trigrams(s)
+        text = "".join("\n" + s for s in strings)
+        self._documents[document] = strings, text, grams
+        for gram in grams:
+            self._postings[gram].add(document)
+
+    def remove(self, document):
+        """
+        Remove `document` from the index.
+
+        Removing a document which is not in the index is not an error.
+        """
+        try:
+            _, _, grams = self._documents.pop(document)
+        except KeyError:
+            return
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(document)
+            if not posting:
+                del self._postings[gram]
+
+    def clear(self):
+        self._postings.clear()
+        self._documents.clear()
+
+    @staticmethod
+    def _score(text, shared, query, qgrams, min_similarity):
+        # a query can only occur verbatim if all its trigrams are shared
+        if shared == len(qgrams):
+            if "\n" + query in text:
+                return SCORE_PREFIX
+            if query in text:
+                return SCORE_SUBSTRING
+            if not qgrams:
+                return None
+        similarity = shared / len(qgrams)
+        if similarity < min_similarity:
+            return None
+        return similarity
+
+    def score(self,
+              document,
+              query: str,
+              min_similarity: float=MIN_SIMILARITY) -> typing.Optional[float]:
+        """
+        Return the score of a single `document` for `query`.
+
+        :raises KeyError: if `document` is not in the index.
+        :return: The score, or :data:`None` if the document does not match.
+
+        The score is :data:`SCORE_PREFIX` if one of the strings starts with
+        `query`, :data:`SCORE_SUBSTRING` if `query` occurs in one of the
+        strings and otherwise the fraction of the trigrams of `query` which
+        occur in the document. Documents sharing less than `min_similarity`
+        of the trigrams do not match.
+        """
+        _, text, grams = self._documents[document]
+        qgrams = query_trigrams(query)
+        return self._score(text, len(qgrams & grams), query, qgrams,
+                           min_similarity)
+
+    def search(self,
+               query: str,
+               min_similarity: float=MIN_SIMILARITY) -> typing.Dict:
+        """
+        Return the scores of all documents which match `query`.
+
+        :return: A dictionary mapping the matching documents to their
+            scores; see :meth:`score` for details.
+
+        Only documents which share at least one trigram with `query` are
+        looked at. Queries shorter than three characters have no trigrams;
+        those are matched as substrings against all documents.
+        """
+        qgrams = query_trigrams(query)
+        prefix = "\n" + query
+        result = {}
+
+        if not qgrams:
+            for document, (_, text, _) in self._documents.items():
+                if prefix in text:
+                    result[document] = SCORE_PREFIX
+                elif query in text:
+                    result[document] = SCORE_SUBSTRING
+            return result
+
+        counts = collections.Counter()
+        for gram in qgrams:
+            posting = self._postings.get(gram)
+            if posting:
+                counts.update(posting)
+
+        # inlined version of _score, this loop is the hot path
+        documents = self._documents
+        nqgrams = len(qgrams)
+        threshold = min_similarity * nqgrams
+        for document, shared in counts.items():
+            if shared == nqgrams:
+                text = documents[document][1]
+                if prefix in text:
+                    result[document] = SCORE_PREFIX
+                    continue
+                if query in text:
+                    result[document] = SCORE_SUBSTRING
+                    continue
+            elif shared < threshold:
+                continue
+            result[document] = shared / nqgrams
+
+        return result
+
+
+class TagIndex:
+    """
+    Inverted index from tags to documents.
+
+    :meth:`matching` returns the documents which carry all of a set of
+    tags by intersecting the per-tag document sets, without looking at
+    the other documents.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # tag -> set of documents
+        self._postings = collections.defaultdict(set)
+        # document -> frozenset of tags
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, document):
+        return document in self._documents
+
+    def tags_of(self, document) -> typing.Optional[typing.FrozenSet[str]]:
+        """
+        Return the tags `document` is indexed under, or :data:`None` if it
+        is not in the index.
+        """
+        return self._documents.get(document)
+
+    def add(self, document, tags: typing.Iterable[str]):
+        """
+        Index `document` under `tags`, replacing its previous tags.
+        """
+        self.remove(document)
+        tags = frozenset(tags)
+        self._documents[document] = tags
+        for tag in tags:
+            self._postings[tag].add(document)
+
+    def remove(self, document):
+        """
+        Remove `document` from the index.
+
+        Removing a document which is not in the index is not an error.
+        """
+        try:
+            tags = self._documents.pop(document)
+        except KeyError:
+            return
+        for tag in tags:
+            posting = self._postings[tag]
+            posting.discard(document)
+            if not posting:
+                del self._postings[tag]
+
+    def clear(self):
+        self._postings.clear()
+        self._documents.clear()
+
+    def matching(self, tags: typing.AbstractSet[str]) -> typing.Set:
+        """
+        Return the set of documents which carry all `tags`.
+
+        If `tags` is empty, all documents are returned.
+        """
+        if not tags:
+            return set(self._documents)
+        postings = sorted(
+            (self._postings.get(tag, frozenset()) for tag in tags),
+            key=len,
+        )
+        return set(postings[0]).intersection(*postings[1:])
@@ -2,7 +2,7 @@ import asyncio
 
 import jclib.tasks
 
-from . import Qt
+from . import Qt, utils
 
 from .ui import tasks_status_widget, tasks_popup_frame
 
@@ -112,13 +112,25 @@ class TasksModel(Qt.QAbstractListModel):
 class TaskDelegate(Qt.QStyledItemDelegate):
     PADDING = 2
 
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fonts = utils.FontCache(self._derive_fonts)
+
+    def _derive_fonts(self, base_font):
+        metrics = Qt.QFontMetrics(base_font)
+        return {
+            "metrics": metrics,
+            "text_height": metrics.ascent() + metrics.descent(),
+            "percent_width": metrics.width("\u2007"*3 + "%"),
+        }
+
     def sizeHint(self, option, index):
-        font = option.font
-        metrics = Qt.QFontMetrics(font)
+        fonts = self._fonts.get(option.font)
+        metrics = fonts["metrics"]
 
-        text_height = metrics.ascent() + metrics.descent()
+        text_height = fonts["text_height"]
         text_width = metrics.width(index.data(Qt.Qt.DisplayRole))
-        percent_width = metrics.width("\u2007"*3 + "%")
+        percent_width = fonts["percent_width"]
         min_progress_bar = 24
 
         return Qt.QSize(
@@ -143,10 +155,10 @@ class TaskDelegate(Qt.QStyledItemDelegate):
             text_color = option.palette.text().color()
 
         painter.setPen(text_color)
-        font = option.font
-        metrics = Qt.QFontMetrics(font)
+        fonts = self._fonts.get(option.font)
+        metrics = fonts["metrics"]
 
-        text_height = metrics.ascent() + metrics.descent()
+        text_height = fonts["text_height"]
 
         top_left = option.rect.topLeft() + Qt.QPoint(
             self.PADDING,
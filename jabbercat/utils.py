@@ -6,6 +6,7 @@ import hashlib
 import math
 import random
 import struct
+import typing
 import unicodedata
 import urllib.parse
 
@@ -330,3 +331,138 @@ def qtpicture_to_data_uri(picture, w=48, h=48):
 
     return ("data:image/png;base64," +
             bytes(buffer_.data().toBase64()).decode("ascii"))
+
+
+class FenwickTree:
+    """
+    Sequence of non-negative integers with fast prefix sums.
+
+    :param values: Initial values.
+
+    This is a binary indexed tree: :meth:`prefix_sum`, :meth:`add`,
+    :meth:`__setitem__` and :meth:`find` take O(log n). Inserting or
+    deleting values rebuilds the tree in O(n).
+    """
+
+    def __init__(self, values: typing.Iterable[int]=()):
+        super().__init__()
+        self._values = list(values)
+        self._build()
+
+    def _build(self):
+        n = len(self._values)
+        tree = [0] * (n + 1)
+        for i, value in enumerate(self._values, 1):
+            tree[i] += value
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, index: int) -> int:
+        return self._values[index]
+
+    def __setitem__(self, index: int, value: int):
+        self.add(index, value - self._values[index])
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def add(self, index: int, delta: int):
+        """
+        Add `delta` to the value at `index`.
+        """
+        if index < 0:
+            index += len(self._values)
+        self._values[index] += delta
+        tree = self._tree
+        n = len(tree) - 1
+        i = index + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> int:
+        """
+        Return the sum of the values before `index`.
+        """
+        tree = self._tree
+        result = 0
+        i = index
+        while i > 0:
+            result += tree[i]
+            i -= i & -i
+        return result
+
+    def total(self) -> int:
+        return self.prefix_sum(len(self._values))
+
+    def find(self, position: int) -> int:
+        """
+        Return the index of the value which covers `position`.
+
+        That is the index ``i`` for which ``prefix_sum(i) <= position <
+        prefix_sum(i + 1)``, or the length of the sequence if `position` is
+        at or beyond the :meth:`total`.
+        """
+        tree = self._tree
+        n = len(tree) - 1
+        index = 0
+        step = 1 << (n.bit_length() - 1) if n else 0
+        while step:
+            next_index = index + step
+            if next_index <= n and tree[next_index] <= position:
+                index = next_index
+                position -= tree[next_index]
+            step >>= 1
+        return index
+
+    def insert(self, index: int, values: typing.Iterable[int]):
+        """
+        Insert `values` before `index`.
+        """
+        self._values[index:index] = values
+        self._build()
+
+    def delete(self, start: int, stop: int):
+        """
+        Delete the values from `start` up to, but excluding, `stop`.
+        """
+        del self._values[start:stop]
+        self._build()
+
+
+class FontCache:
+    """
+    Cache values derived from a base font.
+
+    :param factory: Callable which takes a :class:`QFont` and returns the
+        values derived from it.
+
+    Item delegates derive fonts, font metrics and row heights from the font
+    of the style option in every paint and size hint. :meth:`get` calls
+    `factory` only if the base font differs from the one of the previous
+    call, compared by :meth:`QFont.key`.
+
+    The returned values are shared between calls and must not be modified.
+    """
+
+    def __init__(self, factory: typing.Callable[[Qt.QFont], typing.Any]):
+        super().__init__()
+        self._factory = factory
+        self._key = None
+        self._value = None
+
+    def get(self, font: Qt.QFont):
+        key = font.key()
+        if key != self._key:
+            self._value = self._factory(font)
+            self._key = key
+        return self._value
+
+    def clear(self):
+        self._key = None
+        self._value = None
@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import logging
 import urllib.parse
@@ -12,7 +13,28 @@ from . import Qt, avatar, utils
 logger = logging.getLogger(__name__)
 
 
+def _encode_png(image: Qt.QImage) -> bytes:
+    array = Qt.QByteArray()
+    buffer_ = Qt.QBuffer(array)
+    buffer_.open(Qt.QIODevice.WriteOnly)
+    image.save(buffer_, "PNG")
+    buffer_.close()
+    return bytes(array)
+
+
 class AvatarURLSchemeHandler(Qt.QWebEngineUrlSchemeHandler):
+    """
+    Serve ``avatar:`` URLs from the :class:`~.avatar.AvatarManager`.
+
+    Encoded PNG data is cached per account, peer, nickname and avatar epoch
+    (the fragment of the URL) and dropped when the avatar manager reports a
+    change for the peer. The encoding itself happens in the default executor
+    of the event loop; requests for an image which is being encoded already
+    share that encoding, unless the avatar changed after it was started.
+    """
+
+    PNG_CACHE_SIZE = 256
+
     def __init__(self,
                  accounts: jclib.identity.Accounts,
                  avatar_manager: avatar.AvatarManager,
@@ -21,11 +43,74 @@ class AvatarURLSchemeHandler(Qt.QWebEngineUrlSchemeHandler):
         self._accounts = accounts
         self._avatar_manager = avatar_manager
         self._buffers = set()
+        # (account, peer) -> {(nickname, epoch) -> PNG bytes}
+        self._png_cache = aioxmpp.cache.LRUDict()
+        self._png_cache.maxsize = self.PNG_CACHE_SIZE
+        # (account, peer) -> {(nickname, epoch) -> future of PNG bytes}
+        self._encoding = {}
+        avatar_manager.on_avatar_changed.connect(self._on_avatar_changed)
 
     def buffer_closing(self, buf):
+        if buf not in self._buffers:
+            return
         self._buffers.discard(buf)
         buf.deleteLater()
 
+    def _on_avatar_changed(self, account, address):
+        try:
+            del self._png_cache[account, address]
+        except KeyError:
+            pass
+        # encodings in flight render the old avatar; they still complete for
+        # the requests waiting on them, but are not handed out anymore
+        self._encoding.pop((account, address), None)
+
+    def _render_avatar(self, account, peer, nickname) -> Qt.QImage:
+        picture = self._avatar_manager.get_avatar(account, peer, nickname)
+        canvas = Qt.QImage(48, 48, Qt.QImage.Format_ARGB32_Premultiplied)
+        canvas.fill(0)
+        painter = Qt.QPainter(canvas)
+        painter.drawPicture(0, 0, picture)
+        painter.end()
+        return canvas
+
+    async def _get_png(self, account, peer, nickname, epoch) -> bytes:
+        peer_key = account, peer
+        try:
+            pngs = self._png_cache[peer_key]
+        except KeyError:
+            pngs = {}
+            self._png_cache[peer_key] = pngs
+
+        key = nickname, epoch
+        try:
+            return pngs[key]
+        except KeyError:
+            pass
+
+        encodings = self._encoding.setdefault(peer_key, {})
+        fut = encodings.get(key)
+        if fut is not None:
+            return await fut
+
+        fut = asyncio.get_event_loop().run_in_executor(
+            None,
+            _encode_png,
+            self._render_avatar(account, peer, nickname),
+        )
+        encodings[key] = fut
+        try:
+            data = await fut
+        finally:
+            del encodings[key]
+            if not encodings and self._encoding.get(peer_key) is encodings:
+                del self._encoding[peer_key]
+
+        # if the avatar changed in the meantime, pngs is not referenced by
+        # the cache anymore and the stale data is discarded with it
+        pngs[key] = data
+        return data
+
     @utils.asyncify
     async def requestStarted(self, request: Qt.QWebEngineUrlRequestJob):
         url = request.requestUrl()
@@ -65,20 +150,25 @@ class AvatarURLSchemeHandler(Qt.QWebEngineUrlSchemeHandler):
             request.fail(Qt.QWebEngineUrlRequestJob.UrlNotFound)
             return
 
-        picture = self._avatar_manager.get_avatar(account, peer, nickname)
-        canvas = Qt.QImage(48, 48, Qt.QImage.Format_ARGB32_Premultiplied)
-        canvas.fill(0)
-        painter = Qt.QPainter(canvas)
-        painter.drawPicture(0, 0, picture)
-        painter.end()
+        # the job may be destroyed by the web engine while the image is
+        # encoded, in which case it must not be touched anymore
+        destroyed = False
 
-        buffer_ = Qt.QBuffer()
-        buffer_.open(Qt.QIODevice.WriteOnly)
-        assert buffer_.isOpen()
-        assert buffer_.isWritable()
-        canvas.save(buffer_, "PNG")
-        buffer_.close()
+        def on_destroyed(*args):
+            nonlocal destroyed
+            destroyed = True
+
+        request.destroyed.connect(on_destroyed)
+
+        data = await self._get_png(account, peer, nickname, url.fragment())
 
+        if destroyed:
+            logger.debug("request for %s went away while encoding", peer)
+            return
+        request.destroyed.disconnect(on_destroyed)
+
+        buffer_ = Qt.QBuffer()
+        buffer_.setData(data)
         buffer_.open(Qt.QIODevice.ReadOnly)
         assert buffer_.isOpen()
         assert buffer_.isReadable()
@@ -95,5 +185,13 @@ class AvatarURLSchemeHandler(Qt.QWebEngineUrlSchemeHandler):
                 buffer_,
             )
         )
+        # do not keep the buffer around for longer than the request, even if
+        # the web engine never closes it
+        request.destroyed.connect(
+            functools.partial(
+                self.buffer_closing,
+                buffer_,
+            )
+        )
 
         self._buffers.add(buffer_)
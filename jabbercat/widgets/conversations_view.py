@@ -1,6 +1,8 @@
 import typing
 
-from .. import Qt, models, avatar
+import aioxmpp.cache
+
+from .. import Qt, models, utils
 from .misc import PlaceholderListView
 
 
@@ -14,10 +16,15 @@ class ConversationItemDelegate(Qt.QItemDelegate):
     UNREAD_COUNTER_VERT_PADDING = 2
     UNREAD_COUNTER_FONT_SIZE = 0.9
     AVATAR_PADDING = SPACING
+    PREVIEW_CACHE_SIZE = 256
 
     def __init__(self, avatar_manager, parent=None):
         super().__init__(parent)
         self.avatar_manager = avatar_manager
+        # (preview font key, preview, width) -> elided preview text
+        self._elided_previews = aioxmpp.cache.LRUDict()
+        self._elided_previews.maxsize = self.PREVIEW_CACHE_SIZE
+        self._fonts = utils.FontCache(self._derive_fonts)
 
     def _get_fonts(self, base_font):
         name_font = Qt.QFont(base_font)
@@ -55,16 +62,35 @@ class ConversationItemDelegate(Qt.QItemDelegate):
         )
         return name_text_height, preview_text_height, avatar_size
 
-    def simpleSizeHint(self, font):
+    def _derive_fonts(self, base_font):
         name_font, preview_font, unread_counter_font = self._get_fonts(
-            font
+            base_font
         )
-        name_metrics = Qt.QFontMetrics(name_font)
+        bold_name_font = Qt.QFont(name_font)
+        bold_name_font.setWeight(Qt.QFont.Bold)
 
+        name_metrics = Qt.QFontMetrics(name_font)
         preview_metrics = Qt.QFontMetrics(preview_font)
-
         unread_counter_metrics = Qt.QFontMetrics(unread_counter_font)
 
+        return {
+            "name_font": name_font,
+            "name_metrics": name_metrics,
+            "bold_name_font": bold_name_font,
+            "bold_name_metrics": Qt.QFontMetrics(bold_name_font),
+            "preview_font": preview_font,
+            "preview_metrics": preview_metrics,
+            "unread_counter_font": unread_counter_font,
+            "unread_counter_metrics": unread_counter_metrics,
+            "size_hint": self._calculate_size_hint(name_metrics,
+                                                   preview_metrics,
+                                                   unread_counter_metrics),
+        }
+
+    def _calculate_size_hint(self,
+                             name_metrics: Qt.QFontMetrics,
+                             preview_metrics: Qt.QFontMetrics,
+                             unread_counter_metrics: Qt.QFontMetrics):
         name_text_height, preview_text_height, avatar_size = \
             self._get_additional_metrics(name_metrics, preview_metrics)
 
@@ -84,6 +110,9 @@ class ConversationItemDelegate(Qt.QItemDelegate):
 
         return Qt.QSize(min_width, total_height)
 
+    def simpleSizeHint(self, font):
+        return Qt.QSize(self._fonts.get(font)["size_hint"])
+
     def sizeHint(self, option, index):
         return self.simpleSizeHint(option.font)
 
@@ -102,6 +131,7 @@ class ConversationItemDelegate(Qt.QItemDelegate):
             text = str(value)
 
         # TODO: set this to bold again if a highlight/mention happened
+        font = Qt.QFont(font)
         font.setWeight(Qt.QFont.Normal)
 
         painter.setFont(font)
@@ -150,17 +180,10 @@ class ConversationItemDelegate(Qt.QItemDelegate):
                            top_left: Qt.QPoint,
                            preview_font: Qt.QFont,
                            preview_metrics: Qt.QFontMetrics,
-                           item):
-        try:
-            last_message, = item.get_last_messages(
-                max_count=1,
-            )
-        except ValueError:
+                           preview):
+        if preview is None:
             return
 
-        _, _, is_self, _, display_name, _, message = last_message
-        body = message.body.any()
-
         preview_height = (preview_metrics.ascent() +
                           preview_metrics.descent())
 
@@ -172,14 +195,19 @@ class ConversationItemDelegate(Qt.QItemDelegate):
             )
         )
 
-        body = preview_metrics.elidedText(
-            "{}: {}".format(
-                display_name,
-                body.strip().replace("\n", " ")
-            ),
-            Qt.Qt.ElideRight,
-            preview_rect.width()
-        )
+        # the elided text depends on the font metrics; key by the font so
+        # that entries for a font which is not in use anymore are not reused
+        cache_key = preview_font.key(), preview, preview_rect.width()
+        try:
+            body = self._elided_previews[cache_key]
+        except KeyError:
+            display_name, body, _ = preview
+            body = preview_metrics.elidedText(
+                "{}: {}".format(display_name, body),
+                Qt.Qt.ElideRight,
+                preview_rect.width()
+            )
+            self._elided_previews[cache_key] = body
 
         preview_color = Qt.QColor(textcolor)
         preview_color.setAlphaF(preview_color.alphaF() * 0.8)
@@ -192,9 +220,9 @@ class ConversationItemDelegate(Qt.QItemDelegate):
     def paint(self, painter, option, index):
         item = index.data(models.ROLE_OBJECT)
         unread_counter_value = item.get_unread_count()
-        name_font, preview_font, unread_counter_font = self._get_fonts(
-            option.font
-        )
+        fonts = self._fonts.get(option.font)
+        preview_font = fonts["preview_font"]
+        unread_counter_font = fonts["unread_counter_font"]
 
         painter.setRenderHint(Qt.QPainter.Antialiasing, False)
         painter.setPen(Qt.Qt.NoPen)
@@ -209,11 +237,13 @@ class ConversationItemDelegate(Qt.QItemDelegate):
         )
 
         if unread_counter_value > 0:
-            name_font.setWeight(Qt.QFont.Bold)
-
-        name_metrics = Qt.QFontMetrics(name_font)
-        preview_metrics = Qt.QFontMetrics(preview_font)
-        unread_counter_metrics = Qt.QFontMetrics(unread_counter_font)
+            name_font = fonts["bold_name_font"]
+            name_metrics = fonts["bold_name_metrics"]
+        else:
+            name_font = fonts["name_font"]
+            name_metrics = fonts["name_metrics"]
+        preview_metrics = fonts["preview_metrics"]
+        unread_counter_metrics = fonts["unread_counter_metrics"]
         name_height, _, avatar_size = \
             self._get_additional_metrics(name_metrics, preview_metrics)
 
@@ -222,16 +252,13 @@ class ConversationItemDelegate(Qt.QItemDelegate):
             self.PADDING + self.UNREAD_COUNTER_VERT_PADDING,
         )
 
-        pic = self.avatar_manager.get_avatar(
+        pixmap = self.avatar_manager.get_avatar_pixmap(
             item.account,
             item.conversation_address,
+            avatar_size,
+            painter.device().devicePixelRatioF(),
         )
-        backup = painter.worldTransform()
-        avatar_scale_factor = avatar_size / avatar.BASE_SIZE
-        painter.translate(top_left)
-        painter.scale(avatar_scale_factor, avatar_scale_factor)
-        painter.drawPicture(Qt.QPointF(), pic)
-        painter.setWorldTransform(backup)
+        painter.drawPixmap(top_left, pixmap)
 
         top_left += Qt.QPoint(
             avatar_size + self.AVATAR_PADDING,
@@ -290,7 +317,7 @@ class ConversationItemDelegate(Qt.QItemDelegate):
             top_left,
             preview_font,
             preview_metrics,
-            item,
+            index.data(models.ROLE_PREVIEW),
         )
 
 
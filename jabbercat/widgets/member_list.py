@@ -1,7 +1,7 @@
 import jclib.identity
 import jclib.metadata
 
-from .. import Qt, avatar, models
+from .. import Qt, avatar, models, utils
 
 
 class MemberItemDelegate(Qt.QItemDelegate):
@@ -20,15 +20,20 @@ class MemberItemDelegate(Qt.QItemDelegate):
         self.avatar_manager = avatar_manager
         self.account = account
         self.compact = compact
+        self._fonts = utils.FontCache(self._derive_fonts)
 
-    def simpleSizeHint(self, font):
-        font = Qt.QFont(font)
-        metrics = Qt.QFontMetrics(font)
+    def _derive_fonts(self, base_font):
+        metrics = Qt.QFontMetrics(base_font)
         text_height = metrics.ascent() + metrics.descent()
+        return {
+            "metrics": metrics,
+            "height": max(text_height, self.AVATAR_SIZE) + self.PADDING * 2,
+        }
 
+    def simpleSizeHint(self, font):
         return Qt.QSize(
             self.AVATAR_SIZE + self.SPACING + self.PADDING * 2,
-            max(text_height, self.AVATAR_SIZE) + self.PADDING * 2,
+            self._fonts.get(font)["height"],
         )
 
     def sizeHint(self, option, index):
@@ -37,15 +42,13 @@ class MemberItemDelegate(Qt.QItemDelegate):
 
         text = index.data(Qt.Qt.DisplayRole)
 
-        font = Qt.QFont(option.font)
-        metrics = Qt.QFontMetrics(font)
-        text_height = metrics.ascent() + metrics.descent()
-        text_width = metrics.boundingRect(text).width()
+        fonts = self._fonts.get(option.font)
+        text_width = fonts["metrics"].boundingRect(text).width()
 
         return Qt.QSize(
             self.AVATAR_SIZE + self.SPACING +
             text_width + self.PADDING * 2,
-            max(text_height, self.AVATAR_SIZE) + self.PADDING * 2,
+            fonts["height"],
         )
 
     def paint(self, painter, option, index):
@@ -67,18 +70,14 @@ class MemberItemDelegate(Qt.QItemDelegate):
                      option.rect.bottomRight() - padding_point)
         )
 
-        pic = self.avatar_manager.get_avatar(
+        pixmap = self.avatar_manager.get_avatar_pixmap(
             self.account,
             item.direct_jid or item.conversation_jid,
+            self.AVATAR_SIZE,
+            painter.device().devicePixelRatioF(),
             getattr(item, "nick", None),
         )
-
-        backup = painter.worldTransform()
-        avatar_scale_factor = self.AVATAR_SIZE / avatar.BASE_SIZE
-        painter.translate(top_left)
-        painter.scale(avatar_scale_factor, avatar_scale_factor)
-        painter.drawPicture(Qt.QPointF(), pic)
-        painter.setWorldTransform(backup)
+        painter.drawPixmap(top_left, pixmap)
 
         painter.setRenderHint(Qt.QPainter.Antialiasing, True)
 
@@ -87,7 +86,7 @@ class MemberItemDelegate(Qt.QItemDelegate):
             0,
         )
 
-        name_metrics = Qt.QFontMetrics(option.font)
+        name_metrics = self._fonts.get(option.font)["metrics"]
 
         name_rect = Qt.QRect(
             top_left,
@@ -1,3 +1,5 @@
+import functools
+
 import jclib.identity
 
 from .. import Qt, models
@@ -192,3 +194,140 @@ class NestedFocusFrame(Qt.QFrame):
             painter,
             self,
         )
+
+
+class AvatarPrefetcher(Qt.QObject):
+    """
+    Request avatars for the rows in and around the viewport of a list view.
+
+    :param view: The view to watch.
+    :param avatar_manager: The :class:`~.avatar.AvatarManager` to use.
+    :param key_func: Called with a model index; returns the
+        ``(account, address)`` pair to fetch the avatar for or :data:`None`.
+    :param overscan: Number of rows above and below the viewport to fetch
+        avatars for.
+
+    Whenever the view is scrolled or resized, or its model changes, the
+    visible pairs are passed to :meth:`~.avatar.AvatarManager.mark_visible`
+    and the visible pairs plus the overscan are passed to
+    :meth:`~.avatar.AvatarManager.prefetch`. Pending fetches for pairs which
+    left that range since the last update are cancelled with
+    :meth:`~.avatar.AvatarManager.cancel_fetch`. Updates are coalesced to
+    once per event loop iteration.
+    """
+
+    DEFAULT_OVERSCAN = 10
+
+    def __init__(self, view, avatar_manager, key_func,
+                 overscan=DEFAULT_OVERSCAN):
+        super().__init__(view)
+        self._view = view
+        self._avatar_manager = avatar_manager
+        self._key_func = key_func
+        self._overscan = overscan
+        self._model = None
+        self._group = object()
+        # pairs passed to prefetch by the last update
+        self._prefetched = frozenset()
+
+        self._timer = Qt.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.update)
+
+        view.verticalScrollBar().valueChanged.connect(self.schedule_update)
+        view.viewport().installEventFilter(self)
+        view.destroyed.connect(functools.partial(
+            self._drop_visible,
+            avatar_manager,
+            self._group,
+        ))
+
+        self._set_model(view.model())
+
+    @staticmethod
+    def _drop_visible(avatar_manager, group, *args):
+        # must not refer to self, which is gone when the view is destroyed
+        avatar_manager.mark_visible((), group)
+
+    @property
+    def overscan(self):
+        return self._overscan
+
+    @overscan.setter
+    def overscan(self, value):
+        self._overscan = value
+        self.schedule_update()
+
+    def _set_model(self, model):
+        signals = [
+            "rowsInserted",
+            "rowsRemoved",
+            "rowsMoved",
+            "modelReset",
+            "layoutChanged",
+        ]
+
+        if self._model is not None:
+            for signal in signals:
+                getattr(self._model, signal).disconnect(self.schedule_update)
+
+        self._model = model
+
+        if self._model is not None:
+            for signal in signals:
+                getattr(self._model, signal).connect(self.schedule_update)
+
+        self.schedule_update()
+
+    def schedule_update(self, *args):
+        if self._view.model() is not self._model:
+            self._set_model(self._view.model())
+        self._timer.start()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (Qt.QEvent.Resize, Qt.QEvent.Show):
+            self.schedule_update()
+        return False
+
+    def _keys(self, model, start, stop):
+        root = self._view.rootIndex()
+        result = []
+        for row in range(start, stop):
+            key = self._key_func(model.index(row, 0, root))
+            if key is not None:
+                result.append(key)
+        return result
+
+    def update(self):
+        model = self._model
+        nrows = model.rowCount(self._view.rootIndex()) if model else 0
+        if not nrows or not self._view.isVisible():
+            self._avatar_manager.mark_visible((), self._group)
+            self._cancel_prefetched(frozenset())
+            return
+
+        viewport_rect = self._view.viewport().rect()
+        first = self._view.indexAt(viewport_rect.topLeft())
+        last = self._view.indexAt(viewport_rect.bottomLeft())
+        first_row = first.row() if first.isValid() else 0
+        last_row = last.row() if last.isValid() else nrows - 1
+
+        visible = self._keys(model, first_row, last_row + 1)
+        overscan = (
+            self._keys(model,
+                       max(first_row - self._overscan, 0),
+                       first_row) +
+            self._keys(model,
+                       last_row + 1,
+                       min(last_row + 1 + self._overscan, nrows))
+        )
+
+        self._avatar_manager.mark_visible(visible, self._group)
+        self._cancel_prefetched(frozenset(visible + overscan))
+        self._avatar_manager.prefetch(visible + overscan)
+
+    def _cancel_prefetched(self, keep):
+        for key in self._prefetched - keep:
+            self._avatar_manager.cancel_fetch(*key)
+        self._prefetched = keep
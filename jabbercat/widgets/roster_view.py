@@ -2,9 +2,6 @@ import aioxmpp.callbacks
 
 import random
 
-import jclib.utils
-
-import jabbercat.avatar
 import jabbercat.utils as utils
 
 from .. import Qt, models
@@ -29,13 +26,24 @@ class RosterItemDelegate(Qt.QItemDelegate):
     AVATAR_SMALL_THRESHOLD = 120
     AVATAR_ZERO_THRESHOLD = 60
 
+    MIN_CACHE_SIZE = 32
+    CACHE_SCREENS = 2
+
     on_tag_clicked = aioxmpp.callbacks.Signal()
 
     def __init__(self, avatar_manager, parent=None):
         super().__init__(parent=parent)
         self.avatar_manager = avatar_manager
+        # tag key -> layout at full width
+        self._natural_layouts = aioxmpp.cache.LRUDict()
+        self._natural_layouts.maxsize = self.MIN_CACHE_SIZE
+        # (tag key, width) -> layout squeezed into width
         self._cache = aioxmpp.cache.LRUDict()
-        self._cache.maxsize = 128
+        self._cache.maxsize = self.MIN_CACHE_SIZE
+        self._fonts = utils.FontCache(self._derive_fonts)
+        # (persistent index, tag, tag rectangle relative to the item, view)
+        # of the tag under the mouse cursor
+        self._hover = None
 
     def _get_fonts(self, base_font):
         name_font = Qt.QFont(base_font)
@@ -46,8 +54,53 @@ class RosterItemDelegate(Qt.QItemDelegate):
         tag_font.setPointSizeF(tag_font.pointSizeF() * self.TAG_FONT_SIZE)
         return name_font, tag_font
 
+    def _derive_fonts(self, base_font):
+        # the tag layouts depend on the font metrics
+        self._natural_layouts.clear()
+        self._cache.clear()
+
+        name_font, tag_font = self._get_fonts(base_font)
+        name_metrics = Qt.QFontMetrics(name_font)
+        name_height = name_metrics.ascent() + name_metrics.descent()
+        tag_metrics = Qt.QFontMetrics(tag_font)
+        tag_text_height = tag_metrics.ascent() + tag_metrics.descent()
+
+        height = (self.PADDING * 2 +
+                  name_height +
+                  self.SPACING +
+                  tag_text_height +
+                  self.SPACING +
+                  tag_text_height +
+                  self.TAG_PADDING * 2 +
+                  self.TAG_MARGIN * 2)
+
+        return {
+            "name_font": name_font,
+            "name_metrics": name_metrics,
+            "name_height": name_height,
+            "tag_font": tag_font,
+            "tag_metrics": tag_metrics,
+            "tag_text_height": tag_text_height,
+            "height": height,
+        }
+
     def flush_caches(self):
+        self._natural_layouts.clear()
         self._cache.clear()
+        self._fonts.clear()
+
+    def _fit_caches(self, widget, row_height):
+        """
+        Size the layout caches to hold the rows of a few screens of
+        `widget`.
+        """
+        if widget is None:
+            return
+        rows = widget.height() // max(row_height, 1) + 1
+        size = max(rows * self.CACHE_SCREENS, self.MIN_CACHE_SIZE)
+        if size != self._cache.maxsize:
+            self._natural_layouts.maxsize = size
+            self._cache.maxsize = size
 
     def _desaturate_tag_color(self, colour: Qt.QColor) -> Qt.QColor:
         colour = Qt.QColor(colour)
@@ -56,21 +109,7 @@ class RosterItemDelegate(Qt.QItemDelegate):
         colour.setHsvF(h, s, v, a)
         return colour
 
-    def layout_tags(self, font_metrics: Qt.QFontMetrics, tags, width):
-        tags = tuple(sorted(
-            ((tag_full,
-              jclib.utils.normalise_text_for_hash(tag_full))
-             for tag_full in tags),
-            key=lambda x: x[1]
-        ))
-
-        cache_key = tags, width
-
-        try:
-            return self._cache[cache_key]
-        except KeyError:
-            pass
-
+    def _layout_tags_natural(self, font_metrics: Qt.QFontMetrics, tags):
         text_widths = [
             max(font_metrics.width(tag), self.MIN_TAG_WIDTH)
             for tag, _ in tags
@@ -92,21 +131,58 @@ class RosterItemDelegate(Qt.QItemDelegate):
             0,
         )
 
-        total_width = sum(tag_widths) + margin_width
+        return {
+            "tags": tags,
+            "texts": [text for text, _ in tags],
+            "width": sum(tag_widths) + margin_width,
+            "text_widths": text_widths,
+            "text_colours": text_colours,
+            "tag_widths": tag_widths,
+            "scale": 1,
+        }
+
+    def layout_tags(self, font_metrics: Qt.QFontMetrics, tags, width):
+        """
+        Lay out `tags` in `width` pixels.
+
+        :param tags: The tags as returned by :func:`models.tag_key`.
+
+        `tags` is used as cache key as is; the layout at full width is
+        shared by all widths which are large enough to hold it.
+        """
+        try:
+            natural = self._natural_layouts[tags]
+        except KeyError:
+            natural = self._layout_tags_natural(font_metrics, tags)
+            self._natural_layouts[tags] = natural
+
+        total_width = natural["width"]
+        if total_width <= width:
+            return natural
+
+        cache_key = tags, width
+
+        try:
+            return self._cache[cache_key]
+        except KeyError:
+            pass
+
+        tag_widths = natural["tag_widths"]
+        margin_width = max(
+            (len(tags) - 1) * self.TAG_MARGIN,
+            0,
+        )
         min_tag_width_full = self.MIN_TAG_WIDTH + self.TAG_PADDING * 2
 
-        if total_width > width:
-            min_width = len(tags) * min_tag_width_full + margin_width
-            if width <= min_width:
-                scale = 0
-            else:
-                variable_width = total_width - min_width
-                if variable_width == 0:
-                    scale = 1
-                else:
-                    scale = (width - min_width) / variable_width
+        min_width = len(tags) * min_tag_width_full + margin_width
+        if width <= min_width:
+            scale = 0
         else:
-            scale = 1
+            variable_width = total_width - min_width
+            if variable_width == 0:
+                scale = 1
+            else:
+                scale = (width - min_width) / variable_width
 
         if scale < 1:
             tag_widths = [
@@ -127,36 +203,19 @@ class RosterItemDelegate(Qt.QItemDelegate):
         else:
             texts = [text for text, _ in tags]
 
-        item = {
-            "tags": tags,
+        item = dict(natural)
+        item.update({
             "texts": texts,
-            "width": total_width,
-            "text_widths": text_widths,
-            "text_colours": text_colours,
             "tag_widths": tag_widths,
             "scale": scale,
-        }
+        })
 
         self._cache[cache_key] = item
 
         return item
 
     def sizeHint(self, option, index):
-        name_font, tag_font = self._get_fonts(option.font)
-        name_metrics = Qt.QFontMetrics(name_font)
-        name_height = name_metrics.ascent() + name_metrics.descent()
-
-        tag_metrics = Qt.QFontMetrics(tag_font)
-        tag_text_height = tag_metrics.ascent() + tag_metrics.descent()
-
-        total_height = (self.PADDING * 2 +
-                        name_height +
-                        self.SPACING +
-                        tag_text_height +
-                        self.SPACING +
-                        tag_text_height +
-                        self.TAG_PADDING * 2 +
-                        self.TAG_MARGIN * 2)
+        total_height = self._fonts.get(option.font)["height"]
 
         item = index.data(models.ROLE_OBJECT)
         ntags = len(item.tags)
@@ -204,10 +263,16 @@ class RosterItemDelegate(Qt.QItemDelegate):
 
         return avatar_size
 
-    def _hits_tag(self, local_pos, option, item):
-        name_font, tag_font = self._get_fonts(option.font)
-        name_metrics = Qt.QFontMetrics(name_font)
-        tag_metrics = Qt.QFontMetrics(tag_font)
+    @staticmethod
+    def _get_tag_key(index, item):
+        result = index.data(models.ROLE_TAG_KEY)
+        if result is None:
+            result = models.tag_key(item.tags)
+        return result
+
+    def _hit_test_tags(self, local_pos, option, tags):
+        fonts = self._fonts.get(option.font)
+        tag_metrics = fonts["tag_metrics"]
 
         avatar_size = self._calculate_avatar_size(option.rect)
 
@@ -218,17 +283,17 @@ class RosterItemDelegate(Qt.QItemDelegate):
 
         top_left += Qt.QPoint(
             0,
-            name_metrics.ascent() + name_metrics.descent() + self.SPACING
+            fonts["name_height"] + self.SPACING
         )
 
         top_left += Qt.QPoint(
             self.TAG_MARGIN,
-            tag_metrics.ascent() + tag_metrics.descent() + self.SPACING
+            fonts["tag_text_height"] + self.SPACING
         )
 
         layout = self.layout_tags(
             tag_metrics,
-            item.tags,
+            tags,
             option.rect.width() - (
                 top_left.x() - option.rect.x()
             ) - self.PADDING
@@ -239,13 +304,75 @@ class RosterItemDelegate(Qt.QItemDelegate):
                 self._tag_rects(tag_metrics, top_left, layout)):
 
             if tag_rect.contains(local_pos):
-                return tag
+                return tag, tag_rect
+
+        return None, None
+
+    def _hits_tag(self, local_pos, option, tags):
+        tag, _ = self._hit_test_tags(local_pos, option, tags)
+        return tag
+
+    def _hovered_tag(self, index):
+        if self._hover is None:
+            return None
+        hover_index, tag, _, _ = self._hover
+        if hover_index != index:
+            return None
+        return tag
+
+    def _set_hover(self, hover):
+        old_hover = self._hover
+        if old_hover is not None and hover is not None:
+            old_index, old_tag, _, _ = old_hover
+            new_index, new_tag, _, _ = hover
+            if old_index == new_index and old_tag == new_tag:
+                return
+
+        self._hover = hover
+        for hover in (old_hover, hover):
+            if hover is None:
+                continue
+            index, _, rect, view = hover
+            if not index.isValid():
+                continue
+            # the item may have moved since the tag was hovered
+            item_rect = view.visualRect(Qt.QModelIndex(index))
+            view.viewport().update(
+                rect.translated(Qt.QPointF(item_rect.topLeft()))
+                .toAlignedRect()
+            )
 
-        return None
+    def clear_hover(self, *args):
+        """
+        Forget the hovered tag and repaint it without highlight.
+        """
+        self._set_hover(None)
+
+    def watch_view(self, view: Qt.QAbstractItemView):
+        """
+        Clear the hovered tag when the mouse leaves `view` or it scrolls.
+
+        The delegate only gets to see mouse moves over items; leaving them
+        or scrolling with the wheel would otherwise keep the highlight on
+        the old tag.
+        """
+        view.viewport().installEventFilter(self)
+        view.viewportEntered.connect(self.clear_hover)
+        view.verticalScrollBar().valueChanged.connect(self.clear_hover)
+        view.horizontalScrollBar().valueChanged.connect(self.clear_hover)
+
+    def eventFilter(self, obj: Qt.QObject, event: Qt.QEvent) -> bool:
+        if event.type() == Qt.QEvent.Leave:
+            self.clear_hover()
+        return False
 
     def paint(self, painter, option, index):
         item = index.data(models.ROLE_OBJECT)
-        name_font, tag_font = self._get_fonts(option.font)
+        tags = self._get_tag_key(index, item)
+        fonts = self._fonts.get(option.font)
+        name_font = fonts["name_font"]
+        tag_font = fonts["tag_font"]
+        self._fit_caches(option.widget, fonts["height"])
 
         painter.setRenderHint(Qt.QPainter.Antialiasing, False)
         painter.setPen(Qt.Qt.NoPen)
@@ -259,7 +386,7 @@ class RosterItemDelegate(Qt.QItemDelegate):
                      option.rect.bottomRight() - padding_point)
         )
 
-        cursor_pos = option.widget.mapFromGlobal(Qt.QCursor.pos())
+        hovered_tag = self._hovered_tag(index)
 
         name = item.label
 
@@ -277,17 +404,13 @@ class RosterItemDelegate(Qt.QItemDelegate):
                 self.PADDING,
             )
 
-            pic = self.avatar_manager.get_avatar(
+            pixmap = self.avatar_manager.get_avatar_pixmap(
                 item.account,
                 item.address,
+                avatar_size,
+                painter.device().devicePixelRatioF(),
             )
-
-            backup = painter.worldTransform()
-            avatar_scale_factor = avatar_size / jabbercat.avatar.BASE_SIZE
-            painter.translate(avatar_origin)
-            painter.scale(avatar_scale_factor, avatar_scale_factor)
-            painter.drawPicture(Qt.QPointF(), pic)
-            painter.setWorldTransform(backup)
+            painter.drawPixmap(avatar_origin, pixmap)
 
             top_left = option.rect.topLeft() + Qt.QPoint(
                 self.LEFT_PADDING + self.SPACING * 2 + avatar_size,
@@ -308,10 +431,10 @@ class RosterItemDelegate(Qt.QItemDelegate):
         else:
             painter.setPen(option.palette.text().color())
 
-        name_metrics = Qt.QFontMetrics(name_font)
+        name_metrics = fonts["name_metrics"]
         painter.setFont(name_font)
 
-        tag_metrics = Qt.QFontMetrics(tag_font)
+        tag_metrics = fonts["tag_metrics"]
 
         name_rect = Qt.QRect(
             top_left,
@@ -364,7 +487,7 @@ class RosterItemDelegate(Qt.QItemDelegate):
 
         tags_layout = self.layout_tags(
             tag_metrics,
-            item.tags,
+            tags,
             option.rect.width() - (
                 top_left.x() - option.rect.x()
             ) - self.PADDING,
@@ -372,11 +495,12 @@ class RosterItemDelegate(Qt.QItemDelegate):
 
         tag_text_ascent = tag_metrics.ascent()
 
-        for text, tag_rect, colour in zip(
+        for (tag, _), text, tag_rect, colour in zip(
+                tags_layout["tags"],
                 tags_layout["texts"],
                 self._tag_rects(tag_metrics, top_left, tags_layout),
                 tags_layout["text_colours"]):
-            if tag_rect.contains(cursor_pos):
+            if tag == hovered_tag:
                 colour = colour.lighter(125)
 
             painter.setPen(Qt.QPen(Qt.Qt.NoPen))
@@ -426,10 +550,24 @@ class RosterItemDelegate(Qt.QItemDelegate):
         if (event.type() == Qt.QEvent.MouseButtonPress and
                 event.button() == Qt.Qt.LeftButton):
             item = index.data(models.ROLE_OBJECT)
-            tag_hit = self._hits_tag(event.pos(), option, item)
+            tag_hit = self._hits_tag(event.pos(), option,
+                                     self._get_tag_key(index, item))
             if tag_hit is not None:
                 self.on_tag_clicked(tag_hit, event.modifiers())
                 return True
         elif event.type() == Qt.QEvent.MouseMove:
-            option.widget.update(index)
+            item = index.data(models.ROLE_OBJECT)
+            tag, tag_rect = self._hit_test_tags(
+                event.pos(), option,
+                self._get_tag_key(index, item)
+            )
+            if tag is None:
+                self._set_hover(None)
+            else:
+                self._set_hover((
+                    Qt.QPersistentModelIndex(index),
+                    tag,
+                    tag_rect.translated(-Qt.QPointF(option.rect.topLeft())),
+                    option.widget,
+                ))
         return super().editorEvent(event, model, option, index)
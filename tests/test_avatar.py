@@ -1,6 +1,10 @@
 import asyncio
 import contextlib
-import itertools
+import hashlib
+import json
+import pathlib
+import tempfile
+import threading
 import unittest
 import unittest.mock
 
@@ -90,6 +94,520 @@ class Testrender_avatar_image(unittest.TestCase):
         QPainter.assert_not_called()
 
 
+class Testdecode_avatar_image(unittest.TestCase):
+    def _decode(self, width, height):
+        with contextlib.ExitStack() as stack:
+            QBuffer = stack.enter_context(unittest.mock.patch(
+                "jabbercat.Qt.QBuffer"
+            ))
+            QImageReader = stack.enter_context(unittest.mock.patch(
+                "jabbercat.Qt.QImageReader"
+            ))
+            reader = QImageReader()
+            QImageReader.reset_mock()
+            reader.size().isValid.return_value = True
+            reader.size().width.return_value = width
+            reader.size().height.return_value = height
+            reader.read().isNull.return_value = False
+
+            result = avatar.decode_avatar_image(
+                unittest.mock.sentinel.data,
+                96,
+            )
+
+        QBuffer().setData.assert_called_once_with(unittest.mock.sentinel.data)
+        QImageReader.assert_called_once_with(QBuffer())
+        return reader, result
+
+    def test_decodes_small_image_at_original_size(self):
+        reader, result = self._decode(64, 32)
+        reader.setScaledSize.assert_not_called()
+        self.assertEqual(
+            result,
+            reader.read().convertToFormat(),
+        )
+
+    def test_decodes_large_image_at_reduced_size(self):
+        reader, result = self._decode(4000, 3000)
+        reader.size().scaled.assert_called_once_with(
+            96, 96,
+            Qt.Qt.KeepAspectRatio,
+        )
+        reader.setScaledSize.assert_called_once_with(reader.size().scaled())
+        self.assertEqual(
+            result,
+            reader.read().convertToFormat(),
+        )
+
+    def test_returns_none_for_undecodable_data(self):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch("jabbercat.Qt.QBuffer"))
+            QImageReader = stack.enter_context(unittest.mock.patch(
+                "jabbercat.Qt.QImageReader"
+            ))
+            QImageReader().size().isValid.return_value = False
+            QImageReader().read().isNull.return_value = True
+
+            result = avatar.decode_avatar_image(
+                unittest.mock.sentinel.data,
+                96,
+            )
+
+        self.assertIsNone(result)
+
+
+class TestAvatarDiskStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmpdir.name)
+        self.store = avatar.AvatarDiskStore(self.path, max_size=100)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def _store(self, data):
+        id_ = hashlib.sha1(data).hexdigest()
+        run_coroutine(self.store.store(id_, data))
+        return id_
+
+    def test_load_returns_none_for_unknown_id(self):
+        self.assertIsNone(run_coroutine(self.store.load("0" * 40)))
+
+    def test_store_and_load_roundtrip(self):
+        id_ = self._store(b"foo")
+        self.assertEqual(run_coroutine(self.store.load(id_)), b"foo")
+        self.assertEqual(self.store.total_size, 3)
+
+    def test_store_rejects_data_with_mismatching_hash(self):
+        id_ = hashlib.sha1(b"foo").hexdigest()
+        run_coroutine(self.store.store(id_, b"bar"))
+        self.assertIsNone(run_coroutine(self.store.load(id_)))
+        self.assertEqual(self.store.total_size, 0)
+
+    def test_set_id_and_get_id(self):
+        id_ = self._store(b"foo")
+        self.store.set_id("a@x", TEST_JID1, id_)
+        self.assertEqual(self.store.get_id("a@x", TEST_JID1), id_)
+        self.assertIsNone(self.store.get_id("b@x", TEST_JID1))
+        self.assertIsNone(self.store.get_id("a@x", TEST_JID2))
+
+    def test_set_id_ignores_unknown_ids(self):
+        self.store.set_id("a@x", TEST_JID1, "0" * 40)
+        self.assertIsNone(self.store.get_id("a@x", TEST_JID1))
+
+    def test_forget_drops_mapping(self):
+        id_ = self._store(b"foo")
+        self.store.set_id("a@x", TEST_JID1, id_)
+        self.store.forget("a@x", TEST_JID1)
+        self.assertIsNone(self.store.get_id("a@x", TEST_JID1))
+        self.store.forget("a@x", TEST_JID1)
+
+    def test_evicts_least_recently_used_and_its_mappings(self):
+        id1 = self._store(b"a" * 40)
+        id2 = self._store(b"b" * 40)
+        self.store.set_id("a@x", TEST_JID1, id1)
+        self.store.set_id("a@x", TEST_JID2, id2)
+        run_coroutine(self.store.load(id1))
+
+        id3 = self._store(b"c" * 40)
+
+        self.assertEqual(self.store.total_size, 80)
+        self.assertIsNone(run_coroutine(self.store.load(id2)))
+        self.assertIsNone(self.store.get_id("a@x", TEST_JID2))
+        self.assertEqual(self.store.get_id("a@x", TEST_JID1), id1)
+        self.assertEqual(run_coroutine(self.store.load(id3)), b"c" * 40)
+
+    def test_index_survives_reopen(self):
+        id_ = self._store(b"foo")
+        self.store.set_id("a@x", TEST_JID1, id_)
+        self.store.close()
+
+        store = avatar.AvatarDiskStore(self.path, max_size=100)
+        self.assertEqual(store.get_id("a@x", TEST_JID1), id_)
+        self.assertEqual(store.total_size, 3)
+        self.assertEqual(run_coroutine(store.load(id_)), b"foo")
+
+    def test_load_drops_entry_of_missing_file(self):
+        id_ = self._store(b"foo")
+        self.store.set_id("a@x", TEST_JID1, id_)
+        (self.path / id_[:2] / id_).unlink()
+
+        self.assertIsNone(run_coroutine(self.store.load(id_)))
+        self.assertIsNone(self.store.get_id("a@x", TEST_JID1))
+        self.assertEqual(self.store.total_size, 0)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        h = avatar.Histogram()
+        self.assertEqual(h.count, 0)
+        self.assertIsNone(h.mean)
+        self.assertIsNone(h.min)
+        self.assertIsNone(h.max)
+        self.assertEqual(h.buckets, [0] * (len(h.bounds) + 1))
+
+    def test_observe_sorts_into_buckets(self):
+        h = avatar.Histogram([1, 2, 3])
+        h.observe(0.5)
+        h.observe(1)
+        h.observe(2.5)
+        h.observe(10)
+
+        self.assertEqual(h.buckets, [2, 0, 1, 1])
+        self.assertEqual(h.count, 4)
+        self.assertEqual(h.sum, 14)
+        self.assertEqual(h.min, 0.5)
+        self.assertEqual(h.max, 10)
+        self.assertEqual(h.mean, 3.5)
+
+    def test_reset(self):
+        h = avatar.Histogram([1])
+        h.observe(2)
+        h.reset()
+        self.assertEqual(h.count, 0)
+        self.assertEqual(h.buckets, [0, 0])
+
+    def test_to_dict(self):
+        h = avatar.Histogram([1])
+        h.observe(0.5)
+        self.assertEqual(
+            h.to_dict(),
+            {
+                "count": 1,
+                "sum": 0.5,
+                "min": 0.5,
+                "max": 0.5,
+                "mean": 0.5,
+                "buckets": [[1, 1], [None, 0]],
+            }
+        )
+
+
+class TestAvatarMetrics(unittest.TestCase):
+    def setUp(self):
+        self.m = avatar.AvatarMetrics()
+
+    def test_increment(self):
+        self.m.increment("foo")
+        self.m.increment("foo", 2)
+        self.assertEqual(self.m.counters["foo"], 3)
+        self.assertEqual(self.m.counters["bar"], 0)
+
+    def test_timed_records_duration(self):
+        with contextlib.ExitStack() as stack:
+            monotonic = stack.enter_context(unittest.mock.patch(
+                "time.monotonic",
+            ))
+            monotonic.side_effect = [1.0, 1.25]
+
+            with self.m.timed("foo"):
+                pass
+
+        self.assertEqual(self.m.histograms["foo"].count, 1)
+        self.assertEqual(self.m.histograms["foo"].sum, 0.25)
+
+    def test_timed_records_duration_on_exception(self):
+        class FooException(Exception):
+            pass
+
+        with self.assertRaises(FooException):
+            with self.m.timed("foo"):
+                raise FooException()
+
+        self.assertEqual(self.m.histograms["foo"].count, 1)
+
+    def test_ratio(self):
+        self.assertIsNone(self.m.ratio("hit", "miss"))
+        self.m.increment("hit", 3)
+        self.m.increment("miss")
+        self.assertEqual(self.m.ratio("hit", "miss"), 0.75)
+
+    def test_snapshot_evaluates_gauges(self):
+        gauge = unittest.mock.Mock()
+        gauge.return_value = 23
+        self.m.register_gauge("g", gauge)
+        self.m.increment("c")
+        self.m.observe("h", 0.5)
+
+        snapshot = self.m.snapshot()
+
+        gauge.assert_called_once_with()
+        self.assertEqual(snapshot["gauges"], {"g": 23})
+        self.assertEqual(snapshot["counters"], {"c": 1})
+        self.assertEqual(snapshot["histograms"]["h"]["count"], 1)
+
+    def test_reset_keeps_gauges(self):
+        self.m.register_gauge("g", lambda: 1)
+        self.m.increment("c")
+        self.m.observe("h", 0.5)
+
+        self.m.reset()
+
+        snapshot = self.m.snapshot()
+        self.assertEqual(snapshot["counters"], {})
+        self.assertEqual(snapshot["histograms"], {})
+        self.assertEqual(snapshot["gauges"], {"g": 1})
+
+    def test_dump_writes_json(self):
+        self.m.increment("c", 2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = pathlib.Path(tmpdir) / "metrics.json"
+            self.m.dump(path)
+            with path.open() as f:
+                data = json.load(f)
+
+        self.assertEqual(data["counters"], {"c": 2})
+
+    def test_str(self):
+        self.m.increment("fetch.success")
+        self.m.observe("fetch.duration", 0.5)
+        text = str(self.m)
+        self.assertIn("fetch.success", text)
+        self.assertIn("fetch.duration", text)
+
+
+class TestAvatarContentCache(unittest.TestCase):
+    def test_records_decode_duration_on_event_loop_thread(self):
+        content = avatar.AvatarContentCache()
+        load_bytes = CoroutineMock()
+        load_bytes.return_value = b"data"
+        threads = []
+
+        def observe(name, value):
+            threads.append((name, threading.get_ident()))
+
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            decode_avatar_image.side_effect = \
+                lambda *args: threads.append(("decode",
+                                              threading.get_ident()))
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+            stack.enter_context(unittest.mock.patch.object(
+                content.metrics, "observe",
+                side_effect=observe,
+            ))
+
+            run_coroutine(content.fetch(
+                hashlib.sha1(b"data").hexdigest(),
+                load_bytes,
+            ))
+
+        threads = dict(threads)
+        self.assertNotEqual(threads["decode"], threading.get_ident())
+        self.assertEqual(threads["content.decode"], threading.get_ident())
+
+
+class TestFetchScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = avatar.FetchScheduler(
+            max_running=2,
+            max_running_per_account=1,
+        )
+        self.started = []
+        self.release = asyncio.Event()
+
+    def tearDown(self):
+        self.scheduler.close()
+        run_coroutine(asyncio.sleep(0))
+
+    def _job(self, name):
+        @asyncio.coroutine
+        def job():
+            self.started.append(name)
+            yield from self.release.wait()
+        return job
+
+    def _submit(self, account, address, priority=None):
+        self.scheduler.submit(account, address,
+                              self._job((account, address)),
+                              priority)
+
+    def test_runs_job(self):
+        self._submit("a", TEST_JID1)
+        run_coroutine(asyncio.sleep(0))
+        self.assertEqual(self.started, [("a", TEST_JID1)])
+        self.assertIn(("a", TEST_JID1), self.scheduler)
+
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertNotIn(("a", TEST_JID1), self.scheduler)
+
+    def test_deduplicates_submissions(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID1)
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertEqual(self.started, [("a", TEST_JID1)])
+
+        metrics = self.scheduler.metrics
+        self.assertEqual(metrics.counters["scheduler.submitted"], 1)
+        self.assertEqual(metrics.counters["scheduler.deduplicated"], 1)
+        self.assertEqual(metrics.histograms["scheduler.wait"].count, 1)
+
+    def test_exposes_queue_gauges(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        run_coroutine(asyncio.sleep(0))
+
+        gauges = self.scheduler.metrics.snapshot()["gauges"]
+        self.assertEqual(gauges["scheduler.running"], 1)
+        self.assertEqual(gauges["scheduler.pending"], 1)
+
+    def test_enforces_per_account_limit(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self._submit("b", TEST_JID1)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertCountEqual(
+            self.started,
+            [("a", TEST_JID1), ("b", TEST_JID1)],
+        )
+
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertEqual(self.started[-1], ("a", TEST_JID2))
+
+    def test_saturated_account_does_not_hold_back_others(self):
+        for i in range(100):
+            self._submit("a", TEST_JID1.replace(localpart=str(i)))
+        self._submit("b", TEST_JID1)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertCountEqual(
+            self.started,
+            [("a", TEST_JID1.replace(localpart="0")), ("b", TEST_JID1)],
+        )
+        # the jobs of the saturated account stay in its own queue instead of
+        # being looked at again on each submission
+        self.assertEqual(self.scheduler._ready, [])
+
+    def test_cancel_of_queue_head_runs_next_job(self):
+        self._submit("a", TEST_JID1)
+        self._submit("b", TEST_JID1)
+        self._submit("c", TEST_JID1)
+        self._submit("c", TEST_JID2)
+        self.scheduler.cancel("c", TEST_JID1)
+
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertCountEqual(
+            self.started,
+            [("a", TEST_JID1), ("b", TEST_JID1), ("c", TEST_JID2)],
+        )
+
+    def test_runs_urgent_jobs_first(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self._submit("a", TEST_JID1.replace(localpart="mercutio"))
+        self.scheduler.set_priority(
+            "a", TEST_JID1.replace(localpart="mercutio"),
+            self.scheduler.PRIORITY_VISIBLE,
+        )
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertEqual(
+            self.started,
+            [("a", TEST_JID1),
+             ("a", TEST_JID1.replace(localpart="mercutio")),
+             ("a", TEST_JID2)],
+        )
+
+    def test_cancel_drops_pending_job(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self.scheduler.cancel("a", TEST_JID2)
+        self.assertNotIn(("a", TEST_JID2), self.scheduler)
+
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertEqual(self.started, [("a", TEST_JID1)])
+
+    def test_mark_visible_raises_and_demotes(self):
+        jid3 = TEST_JID1.replace(localpart="mercutio")
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self._submit("a", jid3)
+
+        self.scheduler.mark_visible([("a", TEST_JID2)])
+        self.scheduler.mark_visible([("a", jid3)])
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertEqual(
+            self.started,
+            [("a", TEST_JID1), ("a", jid3), ("a", TEST_JID2)],
+        )
+
+    def test_submit_uses_visible_priority_for_visible_pairs(self):
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self.scheduler.mark_visible([("a", TEST_JID1.replace(
+            localpart="mercutio"))])
+        self._submit("a", TEST_JID1.replace(localpart="mercutio"))
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertEqual(
+            self.started,
+            [("a", TEST_JID1),
+             ("a", TEST_JID1.replace(localpart="mercutio")),
+             ("a", TEST_JID2)],
+        )
+
+
+    def test_mark_visible_groups_are_independent(self):
+        jid3 = TEST_JID1.replace(localpart="mercutio")
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self._submit("a", jid3)
+
+        self.scheduler.mark_visible([("a", TEST_JID2)], "view1")
+        self.scheduler.mark_visible([("a", jid3)], "view2")
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertEqual(
+            self.started,
+            [("a", TEST_JID1), ("a", TEST_JID2), ("a", jid3)],
+        )
+
+    def test_mark_visible_with_empty_keys_demotes_group(self):
+        jid3 = TEST_JID1.replace(localpart="mercutio")
+        self._submit("a", TEST_JID1)
+        self._submit("a", TEST_JID2)
+        self._submit("a", jid3)
+
+        self.scheduler.mark_visible([("a", jid3)], "view1")
+        self.scheduler.mark_visible([("a", TEST_JID2)], "view2")
+        self.scheduler.mark_visible([], "view2")
+        self.release.set()
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertEqual(
+            self.started,
+            [("a", TEST_JID1), ("a", jid3), ("a", TEST_JID2)],
+        )
+
+    def test_is_visible(self):
+        self.scheduler.mark_visible([("a", TEST_JID1)], "view1")
+        self.scheduler.mark_visible([("a", TEST_JID2)], "view2")
+
+        self.assertTrue(self.scheduler.is_visible("a", TEST_JID1))
+        self.assertTrue(self.scheduler.is_visible("a", TEST_JID2))
+        self.assertFalse(self.scheduler.is_visible("b", TEST_JID1))
+
+        self.scheduler.mark_visible([], "view2")
+
+        self.assertFalse(self.scheduler.is_visible("a", TEST_JID2))
+
 class XMPPAvatarProvider(unittest.TestCase):
     def setUp(self):
         self.account = unittest.mock.Mock(spec=jclib.identity.Account)
@@ -126,7 +644,105 @@ class XMPPAvatarProvider(unittest.TestCase):
         self.ap._on_metadata_changed(TEST_JID1, unittest.mock.sentinel.metadata)
         self.listener.on_avatar_changed.assert_called_once_with(TEST_JID1)
 
-    def test__get_image_returns_none_if_metadata_fetch_fails(self):
+    def _make_stored_provider(self):
+        store = unittest.mock.Mock(spec=avatar.AvatarDiskStore)
+        store.load = CoroutineMock()
+        store.store = CoroutineMock()
+        ap = avatar.XMPPAvatarProvider(self.account, store)
+        return store, ap
+
+    def test__on_metadata_changed_skips_signal_if_id_is_stored(self):
+        store, ap = self._make_stored_provider()
+        listener = make_listener(ap)
+        store.get_id.return_value = "abc"
+        descriptor = unittest.mock.Mock()
+        descriptor.normalized_id = "abc"
+
+        ap._on_metadata_changed(TEST_JID1, [descriptor])
+
+        store.get_id.assert_called_once_with(
+            str(self.account.jid.bare()),
+            TEST_JID1,
+        )
+        store.forget.assert_not_called()
+        listener.on_avatar_changed.assert_not_called()
+
+    def test__on_metadata_changed_forgets_stale_id(self):
+        store, ap = self._make_stored_provider()
+        listener = make_listener(ap)
+        store.get_id.return_value = "abc"
+        descriptor = unittest.mock.Mock()
+        descriptor.normalized_id = "def"
+
+        ap._on_metadata_changed(TEST_JID1, [descriptor])
+
+        store.forget.assert_called_once_with(
+            str(self.account.jid.bare()),
+            TEST_JID1,
+        )
+        listener.on_avatar_changed.assert_called_once_with(TEST_JID1)
+
+    def test__get_picture_loads_from_store_without_network(self):
+        store, ap = self._make_stored_provider()
+        ap.prepare_client(self._prep_client())
+        store.get_id.return_value = "abc"
+        store.load.return_value = b"data"
+
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+
+            result = run_coroutine(ap._get_picture(TEST_JID1))
+
+        store.load.assert_called_once_with("abc")
+        decode_avatar_image.assert_called_once_with(
+            b"data",
+            avatar.DECODED_AVATAR_SIZE,
+        )
+        render_avatar_image.assert_called_once_with(
+            decode_avatar_image(),
+            48,
+        )
+        self.assertEqual(result, render_avatar_image())
+        self.avatar.get_avatar_metadata.assert_not_called()
+
+    def test__get_picture_stores_fetched_data(self):
+        store, ap = self._make_stored_provider()
+        ap.prepare_client(self._prep_client())
+        store.get_id.return_value = None
+        store.load.return_value = None
+
+        descriptor = unittest.mock.Mock(
+            spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
+        descriptor.normalized_id = "abc"
+        descriptor.get_image_bytes = CoroutineMock()
+        descriptor.get_image_bytes.return_value = b"data"
+        self.avatar.get_avatar_metadata.return_value = [descriptor]
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+
+            run_coroutine(ap._get_picture(TEST_JID1))
+
+        store.store.assert_called_once_with(
+            "abc", b"data",
+        )
+        store.set_id.assert_called_once_with(
+            str(self.account.jid.bare()),
+            TEST_JID1,
+            "abc",
+        )
+
+    def test__get_picture_returns_none_if_metadata_fetch_fails(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -135,12 +751,12 @@ class XMPPAvatarProvider(unittest.TestCase):
             aioxmpp.errors.XMPPError(("foo", "bar"))
 
         result = run_coroutine(
-            self.ap._get_image(unittest.mock.sentinel.address)
+            self.ap._get_picture(unittest.mock.sentinel.address)
         )
 
         self.assertIsNone(result)
 
-    def test__get_image_uses_QImage(self):
+    def test__get_picture_uses_decode_avatar_image(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -150,19 +766,19 @@ class XMPPAvatarProvider(unittest.TestCase):
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar1.get_image_bytes = CoroutineMock()
         base.avatar1.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar1_bytes
+            b"avatar1"
 
         base.avatar2 = unittest.mock.Mock(
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar2.get_image_bytes = CoroutineMock()
         base.avatar2.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar2_bytes
+            b"avatar2"
 
         base.avatar3 = unittest.mock.Mock(
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar3.get_image_bytes = CoroutineMock()
         base.avatar3.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar3_bytes
+            b"avatar3"
 
         self.avatar.get_avatar_metadata.return_value = [
             base.avatar1,
@@ -170,11 +786,15 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar3,
         ]
 
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
-            QImage.fromData.return_value.isNull.return_value = False
-
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -185,13 +805,19 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar2.get_image_bytes.assert_not_called()
         base.avatar3.get_image_bytes.assert_not_called()
 
-        QImage.fromData.assert_called_once_with(
-            unittest.mock.sentinel.avatar1_bytes
+        decode_avatar_image.assert_called_once_with(
+            b"avatar1",
+            avatar.DECODED_AVATAR_SIZE,
+        )
+
+        render_avatar_image.assert_called_once_with(
+            decode_avatar_image(),
+            48,
         )
 
-        self.assertEqual(result, QImage.fromData())
+        self.assertEqual(result, render_avatar_image())
 
-    def test__get_image_tries_next_if_get_image_bytes_not_implemented(self):
+    def test__get_picture_tries_next_if_get_image_bytes_not_implemented(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -210,7 +836,7 @@ class XMPPAvatarProvider(unittest.TestCase):
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar3.get_image_bytes = CoroutineMock()
         base.avatar3.get_image_bytes.return_value = \
-            unittest.mock.sentinel.image_bytes
+            b"image"
 
         self.avatar.get_avatar_metadata.return_value = [
             base.avatar2,
@@ -218,11 +844,15 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar1,
         ]
 
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
-            QImage.fromData.return_value.isNull.return_value = False
-
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -233,13 +863,19 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar2.get_image_bytes.assert_called_once_with()
         base.avatar3.get_image_bytes.assert_called_once_with()
 
-        QImage.fromData.assert_called_once_with(
-            unittest.mock.sentinel.image_bytes
+        decode_avatar_image.assert_called_once_with(
+            b"image",
+            avatar.DECODED_AVATAR_SIZE,
         )
 
-        self.assertEqual(result, QImage.fromData())
+        render_avatar_image.assert_called_once_with(
+            decode_avatar_image(),
+            48,
+        )
+
+        self.assertEqual(result, render_avatar_image())
 
-    def test__get_image_tries_next_if_image_bytes_not_available(self):
+    def test__get_picture_tries_next_if_image_bytes_not_available(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -259,7 +895,7 @@ class XMPPAvatarProvider(unittest.TestCase):
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar3.get_image_bytes = CoroutineMock()
         base.avatar3.get_image_bytes.return_value = \
-            unittest.mock.sentinel.image_bytes
+            b"image"
 
         self.avatar.get_avatar_metadata.return_value = [
             base.avatar2,
@@ -267,11 +903,15 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar1,
         ]
 
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
-            QImage.fromData.return_value.isNull.return_value = False
-
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -282,13 +922,19 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar2.get_image_bytes.assert_called_once_with()
         base.avatar3.get_image_bytes.assert_called_once_with()
 
-        QImage.fromData.assert_called_once_with(
-            unittest.mock.sentinel.image_bytes
+        decode_avatar_image.assert_called_once_with(
+            b"image",
+            avatar.DECODED_AVATAR_SIZE,
+        )
+
+        render_avatar_image.assert_called_once_with(
+            decode_avatar_image(),
+            48,
         )
 
-        self.assertEqual(result, QImage.fromData())
+        self.assertEqual(result, render_avatar_image())
 
-    def test__get_image_tries_next_if_one_fails(self):
+    def test__get_picture_tries_next_if_one_fails(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -308,7 +954,7 @@ class XMPPAvatarProvider(unittest.TestCase):
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar3.get_image_bytes = CoroutineMock()
         base.avatar3.get_image_bytes.return_value = \
-            unittest.mock.sentinel.image_bytes
+            b"image"
 
         self.avatar.get_avatar_metadata.return_value = [
             base.avatar2,
@@ -316,11 +962,15 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar1,
         ]
 
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
-            QImage.fromData.return_value.isNull.return_value = False
-
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -331,13 +981,19 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar2.get_image_bytes.assert_called_once_with()
         base.avatar3.get_image_bytes.assert_called_once_with()
 
-        QImage.fromData.assert_called_once_with(
-            unittest.mock.sentinel.image_bytes
+        decode_avatar_image.assert_called_once_with(
+            b"image",
+            avatar.DECODED_AVATAR_SIZE,
+        )
+
+        render_avatar_image.assert_called_once_with(
+            decode_avatar_image(),
+            48,
         )
 
-        self.assertEqual(result, QImage.fromData())
+        self.assertEqual(result, render_avatar_image())
 
-    def test__get_image_returns_none_if_all_fail(self):
+    def test__get_picture_returns_none_if_all_fail(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -365,9 +1021,15 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar3,
         ]
 
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -378,11 +1040,12 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar2.get_image_bytes.assert_called_once_with()
         base.avatar3.get_image_bytes.assert_called_once_with()
 
-        QImage.fromData.assert_not_called()
+        decode_avatar_image.assert_not_called()
+        render_avatar_image.assert_not_called()
 
         self.assertIsNone(result)
 
-    def test__get_image_tries_next_if_QImage_fails_to_load(self):
+    def test__get_picture_tries_next_if_image_fails_to_decode(self):
         client = self._prep_client()
 
         self.ap.prepare_client(client)
@@ -392,19 +1055,19 @@ class XMPPAvatarProvider(unittest.TestCase):
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar1.get_image_bytes = CoroutineMock()
         base.avatar1.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar1_bytes
+            b"avatar1"
 
         base.avatar2 = unittest.mock.Mock(
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar2.get_image_bytes = CoroutineMock()
         base.avatar2.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar2_bytes
+            b"avatar2"
 
         base.avatar3 = unittest.mock.Mock(
             spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
         base.avatar3.get_image_bytes = CoroutineMock()
         base.avatar3.get_image_bytes.return_value = \
-            unittest.mock.sentinel.avatar3_bytes
+            b"avatar3"
 
         self.avatar.get_avatar_metadata.return_value = [
             base.avatar1,
@@ -412,19 +1075,17 @@ class XMPPAvatarProvider(unittest.TestCase):
             base.avatar3,
         ]
 
-        def images():
-            for i in itertools.count():
-                yield getattr(base, "image{}".format(i))
-
-        base.image0.isNull.return_value = True
-        base.image1.isNull.return_value = True
-        base.image2.isNull.return_value = False
-
-        with unittest.mock.patch("jabbercat.Qt.QImage") as QImage:
-            QImage.fromData.side_effect = images()
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+            decode_avatar_image.side_effect = [None, None, base.image2]
 
             result = run_coroutine(
-                self.ap._get_image(unittest.mock.sentinel.address)
+                self.ap._get_picture(unittest.mock.sentinel.address)
             )
 
         self.avatar.get_avatar_metadata.assert_called_once_with(
@@ -436,27 +1097,28 @@ class XMPPAvatarProvider(unittest.TestCase):
         base.avatar3.get_image_bytes.assert_called_once_with()
 
         self.assertSequenceEqual(
-            QImage.fromData.mock_calls,
+            decode_avatar_image.mock_calls,
             [
-                unittest.mock.call(unittest.mock.sentinel.avatar1_bytes),
-                unittest.mock.call(unittest.mock.sentinel.avatar2_bytes),
-                unittest.mock.call(unittest.mock.sentinel.avatar3_bytes),
+                unittest.mock.call(b"avatar1",
+                                   avatar.DECODED_AVATAR_SIZE),
+                unittest.mock.call(b"avatar2",
+                                   avatar.DECODED_AVATAR_SIZE),
+                unittest.mock.call(b"avatar3",
+                                   avatar.DECODED_AVATAR_SIZE),
             ]
         )
 
-        base.image0.isNull.assert_called_once_with()
-        base.image1.isNull.assert_called_once_with()
-        base.image2.isNull.assert_called_once_with()
+        render_avatar_image.assert_called_once_with(base.image2, 48)
 
-        self.assertEqual(result, base.image2)
+        self.assertEqual(result, render_avatar_image())
 
-    def test_fetch_avatar_returns_None_if__get_image_returns_None(self):
+    def test_fetch_avatar_returns_None_if__get_picture_returns_None(self):
         with contextlib.ExitStack() as stack:
-            _get_image = stack.enter_context(unittest.mock.patch.object(
-                self.ap, "_get_image",
+            _get_picture = stack.enter_context(unittest.mock.patch.object(
+                self.ap, "_get_picture",
                 new=CoroutineMock()
             ))
-            _get_image.return_value = None
+            _get_picture.return_value = None
 
             self.assertIsNone(
                 run_coroutine(self.ap.fetch_avatar(
@@ -464,63 +1126,174 @@ class XMPPAvatarProvider(unittest.TestCase):
                 ))
             )
 
-        _get_image.assert_called_once_with(
+        _get_picture.assert_called_once_with(
             unittest.mock.sentinel.address
         )
 
-    def test_fetch_avatar_uses__get_image_and_render_avatar_image(self):
+    def test_fetch_avatar_returns_result_from__get_picture(self):
         with contextlib.ExitStack() as stack:
-            _get_image = stack.enter_context(unittest.mock.patch.object(
-                self.ap, "_get_image",
+            _get_picture = stack.enter_context(unittest.mock.patch.object(
+                self.ap, "_get_picture",
                 new=CoroutineMock()
             ))
-            _get_image.return_value = unittest.mock.sentinel.image
-
-            render_avatar_image = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_avatar_image"
-            ))
+            _get_picture.return_value = unittest.mock.sentinel.picture
 
             result = run_coroutine(self.ap.fetch_avatar(
                 unittest.mock.sentinel.address
             ))
 
-        _get_image.assert_called_once_with(
+        _get_picture.assert_called_once_with(
             unittest.mock.sentinel.address
         )
 
-        render_avatar_image.assert_called_once_with(
-            unittest.mock.sentinel.image,
-            48
-        )
+        self.assertEqual(result, unittest.mock.sentinel.picture)
 
-        self.assertEqual(result, render_avatar_image())
+    def test__get_picture_shares_pictures_via_content_cache(self):
+        content = avatar.AvatarContentCache()
+        ap1 = avatar.XMPPAvatarProvider(self.account, content=content)
+        ap1.prepare_client(self._prep_client())
+        ap2 = avatar.XMPPAvatarProvider(self.account, content=content)
+        ap2.prepare_client(self._prep_client())
+
+        id_ = hashlib.sha1(b"data").hexdigest()
+        descriptor = unittest.mock.Mock(
+            spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
+        descriptor.normalized_id = id_
+        descriptor.get_image_bytes = CoroutineMock()
+        descriptor.get_image_bytes.return_value = b"data"
+        self.avatar.get_avatar_metadata.return_value = [descriptor]
+
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+
+            result1, result2 = run_coroutine(asyncio.gather(
+                ap1._get_picture(TEST_JID1),
+                ap2._get_picture(TEST_JID1),
+            ))
+            result3 = run_coroutine(ap1._get_picture(TEST_JID2))
+
+        descriptor.get_image_bytes.assert_called_once_with()
+        decode_avatar_image.assert_called_once_with(
+            b"data",
+            avatar.DECODED_AVATAR_SIZE,
+        )
+        render_avatar_image.assert_called_once_with(decode_avatar_image(), 48)
+        self.assertIs(result1, render_avatar_image())
+        self.assertIs(result2, result1)
+        self.assertIs(result3, result1)
+        self.assertIs(content.get(id_), result1)
+
+        self.assertEqual(content.metrics.counters["content.miss"], 1)
+        self.assertEqual(content.metrics.counters["content.shared"], 1)
+        self.assertEqual(content.metrics.counters["content.hit"], 1)
+        self.assertEqual(content.metrics.histograms["content.decode"].count,
+                         1)
+
+    def test__get_picture_does_not_share_unverified_pictures(self):
+        content = avatar.AvatarContentCache()
+        ap1 = avatar.XMPPAvatarProvider(self.account, content=content)
+        ap1.prepare_client(self._prep_client())
+        ap2 = avatar.XMPPAvatarProvider(self.account, content=content)
+        ap2.prepare_client(self._prep_client())
+
+        id_ = hashlib.sha1(b"data").hexdigest()
+        forged = unittest.mock.Mock(
+            spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
+        forged.normalized_id = id_
+        forged.get_image_bytes = CoroutineMock()
+        forged.get_image_bytes.return_value = b"forged data"
+        genuine = unittest.mock.Mock(
+            spec=aioxmpp.avatar.service.AbstractAvatarDescriptor)
+        genuine.normalized_id = id_
+        genuine.get_image_bytes = CoroutineMock()
+        genuine.get_image_bytes.return_value = b"data"
+
+        metadata = {TEST_JID1: [forged], TEST_JID2: [genuine]}
+        self.avatar.get_avatar_metadata.side_effect = metadata.get
+
+        with contextlib.ExitStack() as stack:
+            decode_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.decode_avatar_image"
+            ))
+            decode_avatar_image.side_effect = lambda data, size: data
+            render_avatar_image = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_image"
+            ))
+            render_avatar_image.side_effect = lambda image, size: image
+
+            forged_result, genuine_result = run_coroutine(asyncio.gather(
+                ap1._get_picture(TEST_JID1),
+                ap2._get_picture(TEST_JID2),
+            ))
+
+        # the peer with the forged data still sees it, but nobody else does
+        self.assertEqual(forged_result, b"forged data")
+        self.assertEqual(genuine_result, b"data")
+        self.assertEqual(content.get(id_), b"data")
+        self.assertEqual(content.metrics.counters["content.unverified"], 1)
 
     def test_get_avatar_raises_KeyError_when_cold(self):
         with self.assertRaises(KeyError):
             self.ap.get_avatar(unittest.mock.sentinel.address)
 
-    def test_get_avatar_returns_result_from_fetch_avatar(self):
-        def generate_images():
-            for i in itertools.count():
-                yield getattr(unittest.mock.sentinel, "image{}".format(i))
+    def test_get_avatar_returns_None_for_fresh_negative_entry(self):
+        with unittest.mock.patch.object(self.ap, "_get_picture",
+                                        new=CoroutineMock()) as _get_picture:
+            _get_picture.return_value = None
+            run_coroutine(self.ap.fetch_avatar(TEST_JID1))
+
+        self.assertIsNone(self.ap.get_avatar(TEST_JID1))
+
+    def test_get_avatar_raises_KeyError_for_expired_negative_entry(self):
+        self.ap.NEGATIVE_TTL = -1
+
+        with unittest.mock.patch.object(self.ap, "_get_picture",
+                                        new=CoroutineMock()) as _get_picture:
+            _get_picture.return_value = None
+            run_coroutine(self.ap.fetch_avatar(TEST_JID1))
+
+        with self.assertRaises(KeyError):
+            self.ap.get_avatar(TEST_JID1)
+
+    def test_negative_entry_expires_after_evictions(self):
+        self.ap.NEGATIVE_TTL = 0.05
+        self.ap._cache.maxsize = 2
+        peers = [TEST_JID2.replace(localpart="peer{}".format(i))
+                 for i in range(4)]
 
-        def generate_bytes():
-            for i in itertools.count():
-                if i == 1:
-                    yield None
-                yield unittest.mock.sentinel.image_bytes
+        with unittest.mock.patch.object(self.ap, "_get_picture",
+                                        new=CoroutineMock()) as _get_picture:
+            _get_picture.return_value = None
+            run_coroutine(self.ap.fetch_avatar(TEST_JID1))
+            for peer in peers:
+                run_coroutine(self.ap.fetch_avatar(peer))
+                # keeps the entry of TEST_JID1 the most recently used one
+                self.assertIsNone(self.ap.get_avatar(TEST_JID1))
 
+        for peer in peers[:-1]:
+            with self.assertRaises(KeyError):
+                self.ap.get_avatar(peer)
+
+        run_coroutine(asyncio.sleep(0.1))
+
+        with self.assertRaises(KeyError):
+            self.ap.get_avatar(TEST_JID1)
+
+    def test_get_avatar_returns_result_from_fetch_avatar(self):
         with contextlib.ExitStack() as stack:
-            _get_image = stack.enter_context(unittest.mock.patch.object(
-                self.ap, "_get_image",
+            _get_picture = stack.enter_context(unittest.mock.patch.object(
+                self.ap, "_get_picture",
                 new=CoroutineMock()
             ))
-            _get_image.side_effect = generate_bytes()
-
-            render_avatar_image = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_avatar_image"
-            ))
-            render_avatar_image.side_effect = generate_images()
+            _get_picture.side_effect = [
+                unittest.mock.sentinel.image0,
+                None,
+            ]
 
             pic1 = run_coroutine(self.ap.fetch_avatar(
                 unittest.mock.sentinel.address1,
@@ -811,6 +1584,43 @@ class Testrender_dummy_avatar(unittest.TestCase):
         self.assertEqual(result, QPicture())
 
 
+class Testget_dummy_avatar(unittest.TestCase):
+    def setUp(self):
+        avatar._DUMMY_AVATAR_CACHE.clear()
+
+    def tearDown(self):
+        avatar._DUMMY_AVATAR_CACHE.clear()
+
+    def test_renders_and_caches(self):
+        font = unittest.mock.Mock(spec=Qt.QFont)
+        font.key.return_value = "font-key"
+
+        with unittest.mock.patch(
+                "jabbercat.avatar.render_dummy_avatar") as render_dummy_avatar:
+            result1 = avatar.get_dummy_avatar(font, "foo", 48, "bar")
+            result2 = avatar.get_dummy_avatar(font, "foo", 48, "bar")
+
+        render_dummy_avatar.assert_called_once_with(font, "foo", 48, "bar")
+        self.assertEqual(result1, render_dummy_avatar())
+        self.assertIs(result1, result2)
+
+    def test_cache_is_keyed_on_font_size_and_colour(self):
+        font = unittest.mock.Mock(spec=Qt.QFont)
+        font.key.return_value = "font-key"
+        other_font = unittest.mock.Mock(spec=Qt.QFont)
+        other_font.key.return_value = "other-font-key"
+
+        with unittest.mock.patch(
+                "jabbercat.avatar.render_dummy_avatar") as render_dummy_avatar:
+            avatar.get_dummy_avatar(font, "foo", 48)
+            avatar.get_dummy_avatar(other_font, "foo", 48)
+            avatar.get_dummy_avatar(font, "foo", 24)
+            avatar.get_dummy_avatar(font, "foo", 48, "bar")
+            avatar.get_dummy_avatar(font, "foo", 48)
+
+        self.assertEqual(len(render_dummy_avatar.mock_calls), 4)
+
+
 class TestRosterNameAvatarProvider(unittest.TestCase):
     def setUp(self):
         self.roster = unittest.mock.Mock(spec=aioxmpp.RosterClient)
@@ -868,8 +1678,8 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
         self.ag.prepare_client(client)
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             result = self.ag.get_avatar(
@@ -877,14 +1687,14 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
                 unittest.mock.sentinel.font,
             )
 
-        render_dummy_avatar.assert_called_once_with(
+        get_dummy_avatar.assert_called_once_with(
             unittest.mock.sentinel.font,
             unittest.mock.sentinel.name,
             48,
             str(TEST_JID1),
         )
 
-        self.assertEqual(result, render_dummy_avatar())
+        self.assertEqual(result, get_dummy_avatar())
 
     def test_get_avatar_returns_None_if_entry_not_available(self):
         client = self._prep_client()
@@ -896,8 +1706,8 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
         self.ag.prepare_client(client)
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             result = self.ag.get_avatar(
@@ -905,7 +1715,7 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
                 unittest.mock.sentinel.font,
             )
 
-        render_dummy_avatar.assert_not_called()
+        get_dummy_avatar.assert_not_called()
 
         self.assertIsNone(result)
 
@@ -919,8 +1729,8 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
         self.ag.prepare_client(client)
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             result = self.ag.get_avatar(
@@ -928,14 +1738,14 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
                 unittest.mock.sentinel.font,
             )
 
-        render_dummy_avatar.assert_not_called()
+        get_dummy_avatar.assert_not_called()
 
         self.assertIsNone(result)
 
     def test_get_avatar_returns_None_if_client_not_set_up(self):
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             result = self.ag.get_avatar(
@@ -943,7 +1753,7 @@ class TestRosterNameAvatarProvider(unittest.TestCase):
                 unittest.mock.sentinel.font,
             )
 
-        render_dummy_avatar.assert_not_called()
+        get_dummy_avatar.assert_not_called()
 
         self.assertIsNone(result)
 
@@ -978,6 +1788,35 @@ class TestAvatarManager(unittest.TestCase):
 
         self.assertEqual(result, QFontDatabase.systemFont())
 
+    def test_get_avatar_font_is_cached(self):
+        with contextlib.ExitStack() as stack:
+            QFontDatabase = stack.enter_context(unittest.mock.patch(
+                "jabbercat.Qt.QFontDatabase",
+            ))
+
+            result1 = self.am.get_avatar_font()
+            result2 = self.am.get_avatar_font()
+
+        QFontDatabase.systemFont.assert_called_once_with(
+            QFontDatabase.GeneralFont,
+        )
+        self.assertIs(result1, result2)
+
+    def test_flush_font_caches_drops_cached_font(self):
+        with contextlib.ExitStack() as stack:
+            QFontDatabase = stack.enter_context(unittest.mock.patch(
+                "jabbercat.Qt.QFontDatabase",
+            ))
+
+            self.am.get_avatar_font()
+            self.am.flush_font_caches()
+            self.am.get_avatar_font()
+
+        self.assertEqual(
+            QFontDatabase.systemFont.mock_calls,
+            [unittest.mock.call(QFontDatabase.GeneralFont)] * 2,
+        )
+
     def test_connects_to_client_signals(self):
         self.client.on_client_prepare.connect.assert_called_once_with(
             self.am._prepare_client,
@@ -1044,7 +1883,11 @@ class TestAvatarManager(unittest.TestCase):
                 client,
             )
 
-        XMPPAvatarProvider.assert_called_once_with(account)
+        XMPPAvatarProvider.assert_called_once_with(
+            account,
+            None,
+            self.am._content,
+        )
         XMPPAvatarProvider().prepare_client.assert_called_once_with(client)
         XMPPAvatarProvider().on_avatar_changed.connect\
             .assert_called_once_with(
@@ -1134,11 +1977,11 @@ class TestAvatarManager(unittest.TestCase):
             unittest.mock.sentinel.address,
         )
 
-    def test_get_avatar_falls_back_to_render_dummy_avatar_if_account_unknown(
+    def test_get_avatar_falls_back_to_get_dummy_avatar_if_account_unknown(
             self):
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             get_avatar_font = stack.enter_context(unittest.mock.patch.object(
@@ -1152,13 +1995,13 @@ class TestAvatarManager(unittest.TestCase):
                 TEST_JID1,
             )
 
-        render_dummy_avatar.assert_called_once_with(
+        get_dummy_avatar.assert_called_once_with(
             unittest.mock.sentinel.avatar_font,
             str(TEST_JID1),
             48,
         )
 
-    def test_get_avatar_falls_back_to_render_dummy_avatar_others_failed(self):
+    def test_get_avatar_falls_back_to_get_dummy_avatar_others_failed(self):
         client = unittest.mock.Mock()
 
         with contextlib.ExitStack() as stack:
@@ -1178,8 +2021,8 @@ class TestAvatarManager(unittest.TestCase):
             )
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             _fetch_in_background = stack.enter_context(
@@ -1210,13 +2053,13 @@ class TestAvatarManager(unittest.TestCase):
             unittest.mock.sentinel.avatar_font,
         )
 
-        render_dummy_avatar.assert_called_once_with(
+        get_dummy_avatar.assert_called_once_with(
             unittest.mock.sentinel.avatar_font,
             str(TEST_JID1),
             48,
         )
 
-        self.assertEqual(result, render_dummy_avatar())
+        self.assertEqual(result, get_dummy_avatar())
 
     def test_get_avatar_spawns_lookup_on_KeyError_from_xmpp_avatar_and_falls_back(self):  # NOQA
         client = unittest.mock.Mock()
@@ -1239,8 +2082,8 @@ class TestAvatarManager(unittest.TestCase):
             )
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             _fetch_in_background = stack.enter_context(
@@ -1300,8 +2143,8 @@ class TestAvatarManager(unittest.TestCase):
             )
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             _fetch_in_background = stack.enter_context(
@@ -1329,7 +2172,7 @@ class TestAvatarManager(unittest.TestCase):
         _fetch_in_background.assert_not_called()
 
         RosterNameAvatarProvider().get_avatar.assert_not_called()
-        render_dummy_avatar.assert_not_called()
+        get_dummy_avatar.assert_not_called()
 
         self.assertEqual(result, XMPPAvatarProvider().get_avatar())
 
@@ -1353,8 +2196,8 @@ class TestAvatarManager(unittest.TestCase):
             )
 
         with contextlib.ExitStack() as stack:
-            render_dummy_avatar = stack.enter_context(unittest.mock.patch(
-                "jabbercat.avatar.render_dummy_avatar"
+            get_dummy_avatar = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar"
             ))
 
             get_avatar_font = stack.enter_context(unittest.mock.patch.object(
@@ -1378,13 +2221,13 @@ class TestAvatarManager(unittest.TestCase):
             unittest.mock.sentinel.avatar_font,
         )
 
-        render_dummy_avatar.assert_called_once_with(
+        get_dummy_avatar.assert_called_once_with(
             unittest.mock.sentinel.avatar_font,
             unittest.mock.sentinel.name_surrogate,
             48,
         )
 
-        self.assertEqual(result, render_dummy_avatar())
+        self.assertEqual(result, get_dummy_avatar())
 
     def test__fetch_avatar_and_emit_signal(self):
         fetch_func = CoroutineMock()
@@ -1465,3 +2308,406 @@ class TestAvatarManager(unittest.TestCase):
         self.listener.on_avatar_changed.assert_not_called()
         provider.fetch_avatar.assert_not_called()
         _fetch_in_background.assert_not_called()
+
+    def test_get_avatar_pixmap_renders_avatar(self):
+        with contextlib.ExitStack() as stack:
+            get_avatar = stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            render_avatar_pixmap = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_pixmap",
+            ))
+
+            result = self.am.get_avatar_pixmap(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                24,
+                2.0,
+                unittest.mock.sentinel.name_surrogate,
+            )
+
+        get_avatar.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            unittest.mock.sentinel.address,
+            unittest.mock.sentinel.name_surrogate,
+        )
+        render_avatar_pixmap.assert_called_once_with(
+            get_avatar(),
+            24,
+            2.0,
+        )
+        self.assertEqual(result, render_avatar_pixmap())
+
+    def test_get_avatar_pixmap_caches_per_size_and_device_pixel_ratio(self):
+        with contextlib.ExitStack() as stack:
+            get_avatar = stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            render_avatar_pixmap = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_pixmap",
+            ))
+            render_avatar_pixmap.side_effect = lambda *args: object()
+
+            result1 = self.am.get_avatar_pixmap(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                24, 1.0,
+            )
+            result2 = self.am.get_avatar_pixmap(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                24, 1.0,
+            )
+            result3 = self.am.get_avatar_pixmap(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                24, 2.0,
+            )
+
+        self.assertIs(result1, result2)
+        self.assertIsNot(result1, result3)
+        self.assertEqual(len(get_avatar.mock_calls), 2)
+
+    def test_get_avatar_pixmap_counts_cache_hits_and_misses(self):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_pixmap",
+            ))
+
+            for _ in range(3):
+                self.am.get_avatar_pixmap(
+                    unittest.mock.sentinel.account,
+                    unittest.mock.sentinel.address,
+                    24, 1.0,
+                )
+
+        self.assertEqual(self.am.metrics.counters["pixmap.miss"], 1)
+        self.assertEqual(self.am.metrics.counters["pixmap.hit"], 2)
+        self.assertAlmostEqual(
+            self.am.metrics.ratio("pixmap.hit", "pixmap.miss"),
+            2/3,
+        )
+
+    def test_on_avatar_changed_invalidates_pixmap_cache(self):
+        def check_flushed(account, address):
+            render_avatar_pixmap.reset_mock()
+            self.am.get_avatar_pixmap(account, address, 24, 1.0)
+            render_avatar_pixmap.assert_called_once_with(
+                unittest.mock.ANY, 24, 1.0,
+            )
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            render_avatar_pixmap = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_pixmap",
+            ))
+
+            self.am.get_avatar_pixmap(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                24, 1.0,
+            )
+
+            self.am.on_avatar_changed.connect(check_flushed)
+
+            self.am._on_backend_avatar_changed(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+            )
+
+        self.listener.on_avatar_changed.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            unittest.mock.sentinel.address,
+        )
+
+    def _prepare_xmpp_provider(self):
+        account = unittest.mock.Mock(spec=jclib.identity.Account)
+        account.jid = TEST_JID2
+
+        with contextlib.ExitStack() as stack:
+            RosterNameAvatarProvider = stack.enter_context(
+                unittest.mock.patch(
+                    "jabbercat.avatar.RosterNameAvatarProvider",
+                )
+            )
+            RosterNameAvatarProvider().get_avatar.return_value = None
+
+            self.am._prepare_client(account, unittest.mock.Mock())
+
+        _, _, provider = self.am._AvatarManager__accountmap[account]
+        provider._get_picture = CoroutineMock()
+        provider._get_picture.return_value = None
+        return account, provider
+
+    def _paint(self, account):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.get_dummy_avatar",
+            ))
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.render_avatar_pixmap",
+            ))
+
+            self.am.get_avatar_pixmap(account, TEST_JID1, 24, 1.0)
+        run_coroutine(asyncio.sleep(0.01))
+
+    def test_get_avatar_pixmap_refetches_after_negative_ttl(self):
+        account, provider = self._prepare_xmpp_provider()
+        provider.NEGATIVE_TTL = 0.05
+
+        self._paint(account)
+        provider._get_picture.assert_called_once_with(TEST_JID1)
+
+        # the negative entry is fresh; the fallback is cached
+        self._paint(account)
+        self._paint(account)
+        provider._get_picture.assert_called_once_with(TEST_JID1)
+        self.assertEqual(self.am.metrics.counters["pixmap.hit"], 1)
+
+        run_coroutine(asyncio.sleep(0.05))
+        self._paint(account)
+        self.assertEqual(len(provider._get_picture.mock_calls), 2)
+
+    def test_get_avatar_pixmap_refetches_after_backoff(self):
+        account, provider = self._prepare_xmpp_provider()
+        provider._get_picture.side_effect = ConnectionError()
+        self.am.RETRY_BASE_DELAY = 0.05
+
+        self._paint(account)
+        provider._get_picture.assert_called_once_with(TEST_JID1)
+
+        self._paint(account)
+        provider._get_picture.assert_called_once_with(TEST_JID1)
+        self.assertEqual(self.am.metrics.counters["pixmap.hit"], 1)
+
+        run_coroutine(asyncio.sleep(0.05))
+        self._paint(account)
+        self.assertEqual(len(provider._get_picture.mock_calls), 2)
+
+    def test_get_avatar_data_uri_encodes_and_caches(self):
+        with contextlib.ExitStack() as stack:
+            get_avatar = stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            qtpicture_to_data_uri = stack.enter_context(unittest.mock.patch(
+                "jabbercat.utils.qtpicture_to_data_uri",
+            ))
+
+            result1 = self.am.get_avatar_data_uri(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                "nick",
+            )
+            result2 = self.am.get_avatar_data_uri(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+                "nick",
+            )
+
+        get_avatar.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            unittest.mock.sentinel.address,
+            "nick",
+        )
+        qtpicture_to_data_uri.assert_called_once_with(
+            get_avatar(), avatar.BASE_SIZE, avatar.BASE_SIZE,
+        )
+        self.assertEqual(result1, qtpicture_to_data_uri())
+        self.assertIs(result1, result2)
+
+    def test_on_avatar_changed_invalidates_data_uri_cache(self):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch.object(
+                self.am, "get_avatar",
+            ))
+            qtpicture_to_data_uri = stack.enter_context(unittest.mock.patch(
+                "jabbercat.utils.qtpicture_to_data_uri",
+            ))
+
+            self.am.get_avatar_data_uri(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+            )
+            self.am._on_backend_avatar_changed(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+            )
+            self.am.get_avatar_data_uri(
+                unittest.mock.sentinel.account,
+                unittest.mock.sentinel.address,
+            )
+
+        self.assertEqual(len(qtpicture_to_data_uri.mock_calls), 2)
+
+    def test_prefetch_fetches_uncached_avatars_in_background(self):
+        client = unittest.mock.Mock()
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.RosterNameAvatarProvider",
+            ))
+            XMPPAvatarProvider = stack.enter_context(unittest.mock.patch(
+                "jabbercat.avatar.XMPPAvatarProvider",
+            ))
+
+            self.am._prepare_client(
+                unittest.mock.sentinel.account,
+                client,
+            )
+
+        def get_avatar(address):
+            if address == TEST_JID1:
+                raise KeyError(address)
+            return unittest.mock.sentinel.avatar
+
+        XMPPAvatarProvider().get_avatar.side_effect = get_avatar
+
+        with unittest.mock.patch.object(
+                self.am, "_fetch_in_background") as _fetch_in_background:
+            self.am.prefetch([
+                (unittest.mock.sentinel.account, TEST_JID1),
+                (unittest.mock.sentinel.account, TEST_JID2),
+                (unittest.mock.sentinel.other_account, TEST_JID1),
+            ])
+
+        _fetch_in_background.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            XMPPAvatarProvider(),
+            TEST_JID1,
+        )
+
+    def test_cancel_fetch_cancels_pending_fetch(self):
+        with unittest.mock.patch.object(
+                self.am._scheduler, "cancel") as cancel:
+            self.am.cancel_fetch(unittest.mock.sentinel.account, TEST_JID1)
+
+        cancel.assert_called_once_with(unittest.mock.sentinel.account,
+                                       TEST_JID1)
+
+    def test_cancel_fetch_keeps_visible_fetches(self):
+        self.am.mark_visible([(unittest.mock.sentinel.account, TEST_JID1)],
+                             unittest.mock.sentinel.group)
+
+        with unittest.mock.patch.object(
+                self.am._scheduler, "cancel") as cancel:
+            self.am.cancel_fetch(unittest.mock.sentinel.account, TEST_JID1)
+
+        cancel.assert_not_called()
+
+    def test_mark_visible_forwards_to_scheduler(self):
+        with unittest.mock.patch.object(
+                self.am._scheduler, "mark_visible") as mark_visible:
+            self.am.mark_visible(
+                unittest.mock.sentinel.keys,
+                unittest.mock.sentinel.group,
+            )
+
+        mark_visible.assert_called_once_with(
+            unittest.mock.sentinel.keys,
+            unittest.mock.sentinel.group,
+        )
+
+    def test__fetch_avatar_and_emit_signal_records_failure_on_timeout(self):
+        fetch_func = CoroutineMock()
+        fetch_func.side_effect = asyncio.TimeoutError()
+
+        run_coroutine(self.am._fetch_avatar_and_emit_signal(
+            fetch_func,
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+
+        state = self.am.get_retry_state(unittest.mock.sentinel.account,
+                                        TEST_JID1)
+        self.assertEqual(state.failures, 1)
+        self.assertEqual(state.last_error, "timeout")
+        self.assertGreater(state.next_attempt,
+                           asyncio.get_event_loop().time())
+        self.assertIs(
+            self.am.retry_states[unittest.mock.sentinel.account, TEST_JID1],
+            state,
+        )
+        self.listener.on_avatar_changed.assert_not_called()
+
+    def test__fetch_avatar_and_emit_signal_records_failure_on_error(self):
+        fetch_func = CoroutineMock()
+        fetch_func.side_effect = ConnectionError("foo")
+
+        run_coroutine(self.am._fetch_avatar_and_emit_signal(
+            fetch_func,
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+        run_coroutine(self.am._fetch_avatar_and_emit_signal(
+            fetch_func,
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+
+        state = self.am.get_retry_state(unittest.mock.sentinel.account,
+                                        TEST_JID1)
+        self.assertEqual(state.failures, 2)
+        self.assertEqual(state.last_error, "foo")
+
+    def test__fetch_avatar_and_emit_signal_clears_retry_state(self):
+        fetch_func = CoroutineMock()
+        fetch_func.side_effect = asyncio.TimeoutError()
+
+        run_coroutine(self.am._fetch_avatar_and_emit_signal(
+            fetch_func,
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+
+        fetch_func.side_effect = None
+        run_coroutine(self.am._fetch_avatar_and_emit_signal(
+            fetch_func,
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+
+        self.assertIsNone(self.am.get_retry_state(
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        ))
+        self.listener.on_avatar_changed.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            TEST_JID1,
+        )
+
+    def test__fetch_in_background_respects_backoff(self):
+        provider = unittest.mock.Mock(spec=avatar.XMPPAvatarProvider)
+        provider.fetch_avatar = CoroutineMock()
+        provider.fetch_avatar.side_effect = asyncio.TimeoutError()
+
+        self.am._fetch_in_background(unittest.mock.sentinel.account,
+                                     provider,
+                                     TEST_JID1)
+        run_coroutine(asyncio.sleep(0.01))
+        provider.fetch_avatar.assert_called_once_with(TEST_JID1)
+
+        self.am._fetch_in_background(unittest.mock.sentinel.account,
+                                     provider,
+                                     TEST_JID1)
+        run_coroutine(asyncio.sleep(0.01))
+        provider.fetch_avatar.assert_called_once_with(TEST_JID1)
+
+    def test_RetryState_backs_off_exponentially(self):
+        state = avatar.RetryState()
+        self.assertTrue(state.may_retry(0))
+
+        state.record_failure("foo", 100, 5, 12)
+        self.assertEqual(state.next_attempt, 105)
+        self.assertFalse(state.may_retry(104))
+        self.assertTrue(state.may_retry(105))
+
+        state.record_failure("foo", 100, 5, 12)
+        self.assertEqual(state.next_attempt, 110)
+
+        state.record_failure("foo", 100, 5, 12)
+        self.assertEqual(state.next_attempt, 112)
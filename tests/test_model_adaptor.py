@@ -1,6 +1,8 @@
 import unittest
 import unittest.mock
 
+import jclib.instrumentable_list
+
 import jabbercat.model_adaptor as model_adaptor
 
 from jabbercat import Qt
@@ -217,3 +219,306 @@ class TestModelListAdaptor(unittest.TestCase):
 #     def tearDown(self):
 #         del self.model
 #         del self.base
+
+
+class TestBatchedModelListAdaptor(unittest.TestCase):
+    def setUp(self):
+        self.model = unittest.mock.Mock()
+        self.items = jclib.instrumentable_list.ModelList(["a", "b"])
+        self.adaptor = model_adaptor.BatchedModelListAdaptor(
+            self.items,
+            self.model,
+            threshold=3,
+        )
+
+    def test_is_model_list_adaptor(self):
+        self.assertIsInstance(
+            self.adaptor,
+            model_adaptor.ModelListAdaptor,
+        )
+
+    def test_appends_are_not_announced_immediately(self):
+        self.items.append("c")
+        self.items.extend(["d", "e"])
+
+        self.assertEqual(self.adaptor.pending_rows, 3)
+        self.assertSequenceEqual(self.model.mock_calls, [])
+        self.assertTrue(self.adaptor._flush_timer.isActive())
+
+    def test_flush_announces_contiguous_insertion(self):
+        self.items.append("c")
+        self.items.extend(["d", "e"])
+
+        self.adaptor.flush()
+
+        self.assertEqual(self.adaptor.pending_rows, 0)
+        self.assertSequenceEqual(
+            self.model.mock_calls,
+            [
+                unittest.mock.call.beginInsertRows(Qt.QModelIndex(), 2, 4),
+                unittest.mock.call.endInsertRows(),
+            ]
+        )
+        self.assertFalse(self.adaptor._flush_timer.isActive())
+
+    def test_flush_resets_model_above_threshold(self):
+        self.items.extend(["c", "d", "e", "f"])
+
+        self.adaptor.flush()
+
+        self.assertEqual(self.adaptor.pending_rows, 0)
+        self.assertSequenceEqual(
+            self.model.mock_calls,
+            [
+                unittest.mock.call.beginResetModel(),
+                unittest.mock.call.endResetModel(),
+            ]
+        )
+
+    def test_flush_without_pending_rows_is_noop(self):
+        self.adaptor.flush()
+        self.assertSequenceEqual(self.model.mock_calls, [])
+
+    def test_insert_flushes_pending_rows(self):
+        self.items.append("c")
+        self.items.insert(0, "x")
+
+        self.assertEqual(self.adaptor.pending_rows, 0)
+        self.assertSequenceEqual(
+            self.model.mock_calls,
+            [
+                unittest.mock.call.beginInsertRows(Qt.QModelIndex(), 2, 2),
+                unittest.mock.call.endInsertRows(),
+                unittest.mock.call.beginInsertRows(Qt.QModelIndex(), 0, 0),
+                unittest.mock.call.endInsertRows(),
+            ]
+        )
+
+    def test_remove_flushes_pending_rows(self):
+        self.items.append("c")
+        del self.items[0]
+
+        self.assertEqual(self.adaptor.pending_rows, 0)
+        self.assertSequenceEqual(
+            self.model.mock_calls,
+            [
+                unittest.mock.call.beginInsertRows(Qt.QModelIndex(), 2, 2),
+                unittest.mock.call.endInsertRows(),
+                unittest.mock.call.beginRemoveRows(Qt.QModelIndex(), 0, 0),
+                unittest.mock.call.endRemoveRows(),
+            ]
+        )
+
+
+class TestModelRowIndex(unittest.TestCase):
+    def setUp(self):
+        self.model = unittest.mock.Mock([
+            "rowsInserted",
+            "rowsAboutToBeRemoved",
+            "rowsMoved",
+            "modelReset",
+            "layoutChanged",
+            "rowCount",
+        ])
+        self.items = ["a", "b", "c"]
+        self.model.rowCount.side_effect = lambda parent: len(self.items)
+        self.key_func = unittest.mock.Mock()
+        self.key_func.side_effect = str.upper
+        self.index = model_adaptor.ModelRowIndex(
+            self.model,
+            self.items,
+            self.key_func,
+        )
+
+    def test_connects_to_model_signals(self):
+        self.model.rowsInserted.connect.assert_called_once_with(
+            self.index._rows_inserted,
+        )
+        self.model.rowsAboutToBeRemoved.connect.assert_called_once_with(
+            self.index._rows_about_to_be_removed,
+        )
+        self.model.rowsMoved.connect.assert_called_once_with(
+            self.index._rows_moved,
+        )
+        self.model.modelReset.connect.assert_called_once_with(
+            self.index.invalidate,
+        )
+        self.model.layoutChanged.connect.assert_called_once_with(
+            self.index.invalidate,
+        )
+
+    def test_row_of(self):
+        self.assertEqual(self.index.row_of("A"), 0)
+        self.assertEqual(self.index.row_of("C"), 2)
+
+    def test_row_of_raises_KeyError_for_unknown_key(self):
+        with self.assertRaises(KeyError):
+            self.index.row_of("X")
+
+    def test_row_of_builds_index_once(self):
+        self.index.row_of("A")
+        self.index.row_of("B")
+        self.index.row_of("C")
+        self.assertEqual(len(self.key_func.mock_calls), 3)
+
+    def test_row_of_prefers_lowest_row_for_duplicates(self):
+        self.items.append("a")
+        self.assertEqual(self.index.row_of("A"), 0)
+
+    def test_append_is_applied_incrementally(self):
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        self.items.extend(["d", "e"])
+        self.index._rows_inserted(Qt.QModelIndex(), 3, 4)
+
+        self.assertEqual(self.index.row_of("D"), 3)
+        self.assertEqual(self.index.row_of("E"), 4)
+        self.assertEqual(len(self.key_func.mock_calls), 2)
+
+    def test_insert_in_the_middle_rekeys_following_rows(self):
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        self.items.insert(1, "x")
+        self.index._rows_inserted(Qt.QModelIndex(), 1, 1)
+
+        self.assertEqual(self.index.row_of("A"), 0)
+        self.assertEqual(self.index.row_of("X"), 1)
+        self.assertEqual(self.index.row_of("B"), 2)
+        self.assertEqual(self.index.row_of("C"), 3)
+        # only the inserted row and the two rows after it were keyed
+        self.assertEqual(len(self.key_func.mock_calls), 3)
+
+    def test_burst_of_inserts_is_rekeyed_once(self):
+        self.items.extend(["d", "e"])
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        for row, item in [(1, "x"), (0, "y"), (2, "z")]:
+            self.items.insert(row, item)
+            self.index._rows_inserted(Qt.QModelIndex(), row, row)
+        self.key_func.assert_not_called()
+
+        self.assertEqual(
+            [self.index.row_of(key) for key in "YAZXBCDE"],
+            list(range(8)),
+        )
+        self.assertEqual(len(self.key_func.mock_calls), 8)
+
+    def test_lookup_before_change_does_not_rekey(self):
+        self.items.extend(["d", "e"])
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        self.items.insert(3, "x")
+        self.index._rows_inserted(Qt.QModelIndex(), 3, 3)
+
+        self.assertEqual(self.index.row_of("A"), 0)
+        self.assertEqual(self.index.row_of("C"), 2)
+        self.key_func.assert_not_called()
+
+    def test_removal_of_unindexed_duplicate_keeps_entry(self):
+        self.index.row_of("A")
+
+        self.items.append("a")
+        self.index._rows_inserted(Qt.QModelIndex(), 3, 3)
+        self.index._rows_about_to_be_removed(Qt.QModelIndex(), 3, 3)
+        del self.items[3]
+
+        self.assertEqual(self.index.row_of("A"), 0)
+        self.assertEqual(self.index.row_of("C"), 2)
+
+    def test_insert_of_duplicate_key_invalidates(self):
+        self.index.row_of("A")
+
+        self.items.insert(0, "c")
+        self.index._rows_inserted(Qt.QModelIndex(), 0, 0)
+
+        self.assertEqual(self.index.row_of("C"), 0)
+        self.assertEqual(self.index.row_of("A"), 1)
+
+    def test_removal_from_the_end_is_applied_incrementally(self):
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        self.index._rows_about_to_be_removed(Qt.QModelIndex(), 2, 2)
+        del self.items[2]
+
+        with self.assertRaises(KeyError):
+            self.index.row_of("C")
+        self.assertEqual(self.index.row_of("B"), 1)
+        self.assertEqual(len(self.key_func.mock_calls), 1)
+
+    def test_removal_in_the_middle_rekeys_following_rows(self):
+        self.items.extend(["d", "e"])
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        self.index._rows_about_to_be_removed(Qt.QModelIndex(), 1, 2)
+        del self.items[1:3]
+
+        with self.assertRaises(KeyError):
+            self.index.row_of("B")
+        with self.assertRaises(KeyError):
+            self.index.row_of("C")
+        self.assertEqual(self.index.row_of("A"), 0)
+        self.assertEqual(self.index.row_of("D"), 1)
+        self.assertEqual(self.index.row_of("E"), 2)
+        self.assertEqual(len(self.key_func.mock_calls), 4)
+
+    def test_move_down_rekeys_affected_range(self):
+        self.items.extend(["d", "e"])
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        # move "b" in front of "e"
+        self.items.insert(3, self.items.pop(1))
+        self.index._rows_moved(Qt.QModelIndex(), 1, 1, Qt.QModelIndex(), 4)
+
+        self.assertEqual(
+            [self.index.row_of(key) for key in "ABCDE"],
+            [0, 3, 1, 2, 4],
+        )
+        self.assertEqual(len(self.key_func.mock_calls), 3)
+
+    def test_move_up_rekeys_affected_range(self):
+        self.items.extend(["d", "e"])
+        self.index.row_of("A")
+        self.key_func.reset_mock()
+
+        # move "c" and "d" in front of "a"
+        self.items[0:0] = self.items[2:4]
+        del self.items[4:6]
+        self.index._rows_moved(Qt.QModelIndex(), 2, 3, Qt.QModelIndex(), 0)
+
+        self.assertEqual(
+            [self.index.row_of(key) for key in "ABCDE"],
+            [2, 3, 0, 1, 4],
+        )
+        self.assertEqual(len(self.key_func.mock_calls), 4)
+
+    def test_changes_with_duplicate_keys_invalidate(self):
+        self.items.append("a")
+        self.index.row_of("A")
+
+        self.index._rows_about_to_be_removed(Qt.QModelIndex(), 0, 0)
+        del self.items[0]
+
+        self.assertEqual(self.index.row_of("A"), 2)
+        self.assertEqual(self.index.row_of("B"), 0)
+
+    def test_ignores_rows_not_announced_by_model(self):
+        self.items.append("d")
+        self.model.rowCount.side_effect = lambda parent: 3
+
+        with self.assertRaises(KeyError):
+            self.index.row_of("D")
+        self.assertEqual(self.index.row_of("C"), 2)
+
+    def test_invalidate_forces_rebuild(self):
+        self.index.row_of("A")
+        self.items.reverse()
+        self.index.invalidate()
+
+        self.assertEqual(self.index.row_of("A"), 2)
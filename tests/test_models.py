@@ -1,11 +1,13 @@
 import collections.abc
 import contextlib
+import random
 import unittest
 import unittest.mock
 
 import PyQt5.Qt as Qt
 
 import aioxmpp
+import aioxmpp.callbacks
 
 import jclib.identity as identity
 import jclib.instrumentable_list
@@ -17,6 +19,7 @@ import jabbercat.avatar
 import jabbercat.utils as utils
 
 import jabbercat.models as models
+import jabbercat.search as search
 
 from aioxmpp.testutils import (
     make_listener,
@@ -360,6 +363,23 @@ class TestAccountsModel(unittest.TestCase):
         self.assertEqual(result, tr())
 
 
+class Testtag_key(unittest.TestCase):
+    def test_sorts_by_normalized_tag(self):
+        with unittest.mock.patch(
+                "jclib.utils.normalise_text_for_hash") as normalise:
+            normalise.side_effect = str.casefold
+
+            result = models.tag_key(["b", "A", "c"])
+
+        self.assertEqual(
+            result,
+            (("A", "a"), ("b", "b"), ("c", "c")),
+        )
+
+    def test_empty(self):
+        self.assertEqual(models.tag_key([]), ())
+
+
 class TestConversationsModel(unittest.TestCase):
     def setUp(self):
         def make_mock():
@@ -458,6 +478,134 @@ class TestConversationsModel(unittest.TestCase):
 
             self.metadata.get.reset_mock()
 
+    def test_data_label_is_cached(self):
+        self.metadata.get.return_value = "Romeo"
+        index = self.m.index(0, self.m.COLUMN_LABEL)
+
+        self.assertEqual(self.m.data(index, Qt.Qt.DisplayRole), "Romeo")
+        self.assertEqual(self.m.data(index, Qt.Qt.DisplayRole), "Romeo")
+
+        self.assertEqual(len(self.metadata.get.mock_calls), 1)
+
+    def test_data_sort_key_role(self):
+        self.metadata.get.return_value = "Romeo"
+        index = self.m.index(0, self.m.COLUMN_LABEL)
+
+        with unittest.mock.patch(
+                "jabbercat.models.collation_key") as collation_key:
+            result1 = self.m.data(index, models.ROLE_SORT_KEY)
+            result2 = self.m.data(index, models.ROLE_SORT_KEY)
+
+        collation_key.assert_called_once_with("Romeo")
+        self.assertEqual(result1, collation_key())
+        self.assertIs(result1, result2)
+
+    def test_name_change_invalidates_label(self):
+        self.metadata.get.return_value = "Romeo"
+        index = self.m.index(1, self.m.COLUMN_LABEL)
+        self.m.data(index, Qt.Qt.DisplayRole)
+
+        self.metadata.changed_signal.assert_called_once_with(
+            jclib.roster.RosterMetadata.NAME,
+        )
+        (_, (handler, _), _), = \
+            self.metadata.changed_signal().connect.mock_calls
+
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        self.metadata.get.return_value = "Juliet"
+        handler(jclib.roster.RosterMetadata.NAME,
+                self.cs[1].account, self.cs[1].address, "Juliet")
+
+        cb.assert_called_once_with(
+            index, index, [Qt.Qt.DisplayRole, models.ROLE_SORT_KEY],
+        )
+        self.assertEqual(self.m.data(index, Qt.Qt.DisplayRole), "Juliet")
+
+    def _make_message(self, body):
+        message = unittest.mock.Mock(["body"])
+        message.body.any.return_value = body
+        return message
+
+    def _prepare_preview(self, node, last_messages):
+        node.get_last_messages = unittest.mock.Mock()
+        node.get_last_messages.return_value = last_messages
+        node.on_message = aioxmpp.callbacks.AdHocSignal()
+
+    def test_data_preview_role_loads_last_message_once(self):
+        self._prepare_preview(self.cs[1], [
+            (unittest.mock.sentinel.ts, "uid", False, TEST_JID1,
+             "Romeo", "romeo", self._make_message(" Hello\nworld "))
+        ])
+        index = self.m.index(1, self.m.COLUMN_LABEL)
+
+        result1 = self.m.data(index, models.ROLE_PREVIEW)
+        result2 = self.m.data(index, models.ROLE_PREVIEW)
+
+        self.cs[1].get_last_messages.assert_called_once_with(max_count=1)
+        self.assertEqual(
+            result1,
+            ("Romeo", "Hello world", unittest.mock.sentinel.ts),
+        )
+        self.assertIs(result1, result2)
+
+    def test_data_preview_role_without_messages(self):
+        self._prepare_preview(self.cs[0], [])
+        index = self.m.index(0, self.m.COLUMN_LABEL)
+
+        self.assertIsNone(self.m.data(index, models.ROLE_PREVIEW))
+        self.assertIsNone(self.m.data(index, models.ROLE_PREVIEW))
+
+        self.cs[0].get_last_messages.assert_called_once_with(max_count=1)
+
+    def test_preview_follows_on_message(self):
+        self._prepare_preview(self.cs[1], [])
+        index = self.m.index(1, self.m.COLUMN_LABEL)
+        self.m.data(index, models.ROLE_PREVIEW)
+
+        cb = unittest.mock.Mock()
+        cb.return_value = None
+        self.m.dataChanged.connect(cb)
+
+        self.cs[1].on_message(2, "uid", True, TEST_JID2, "Juliet",
+                              "juliet", self._make_message("Hi"))
+
+        cb.assert_called_once_with(
+            self.m.index(1, 0, Qt.QModelIndex()),
+            self.m.index(1, 0, Qt.QModelIndex()),
+            [models.ROLE_PREVIEW],
+        )
+        self.assertEqual(
+            self.m.data(index, models.ROLE_PREVIEW),
+            ("Juliet", "Hi", 2),
+        )
+
+        # older messages, e.g. from a backlog fetch, do not replace it
+        self.cs[1].on_message(1, "uid", False, TEST_JID1, "Romeo",
+                              "romeo", self._make_message("Old"))
+        self.assertEqual(
+            self.m.data(index, models.ROLE_PREVIEW),
+            ("Juliet", "Hi", 2),
+        )
+        self.cs[1].get_last_messages.assert_called_once_with(max_count=1)
+
+    def test_preview_dropped_on_row_removal(self):
+        node = self.cs[1]
+        self._prepare_preview(node, [])
+        self.m.data(self.m.index(1, self.m.COLUMN_LABEL),
+                    models.ROLE_PREVIEW)
+
+        del self.cs[1]
+
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        node.on_message(2, "uid", True, TEST_JID2, "Juliet",
+                        "juliet", self._make_message("Hi"))
+
+        cb.assert_not_called()
+
     def test_data_label_column_object_role(self):
         for i, conv in enumerate(self.cs):
             self.assertIs(
@@ -500,6 +648,36 @@ class TestConversationsModel(unittest.TestCase):
             [Qt.Qt.DisplayRole],
         )
 
+    def test_unread_counter_change_follows_row_removal(self):
+        node = self.cs[2]
+        del self.cs[0]
+
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        self.cs.on_unread_count_changed(node, 3)
+
+        cb.assert_called_once_with(
+            self.m.index(1, 0, Qt.QModelIndex()),
+            self.m.index(1, 0, Qt.QModelIndex()),
+            [Qt.Qt.DisplayRole],
+        )
+
+    def test_ignores_unread_counter_change_for_unknown_node(self):
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        self.cs.on_unread_count_changed(unittest.mock.sentinel.node, 3)
+
+        cb.assert_not_called()
+
+    def test_row_of(self):
+        for i, node in enumerate(self.cs):
+            self.assertEqual(self.m.row_of(node), i)
+
+        with self.assertRaises(KeyError):
+            self.m.row_of(unittest.mock.sentinel.node)
+
     def test_emits_dataChanged_on_avatar_change(self):
         self.cs[0].account = unittest.mock.sentinel.account1
         self.cs[0].conversation_address = TEST_JID1
@@ -540,6 +718,32 @@ class TestConversationsModel(unittest.TestCase):
 
         cb.assert_not_called()
 
+    def test_avatar_change_follows_row_insertion(self):
+        for i, item in enumerate(self.cs):
+            item.account = unittest.mock.sentinel.account1
+            item.conversation_address = TEST_JID1.replace(localpart=str(i))
+
+        self.m._on_avatar_changed(unittest.mock.sentinel.account1, TEST_JID1)
+
+        new = unittest.mock.Mock(["label", "account", "address"])
+        new.account = unittest.mock.sentinel.account1
+        new.conversation_address = TEST_JID1
+        self.cs.insert(0, new)
+
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        self.m._on_avatar_changed(
+            unittest.mock.sentinel.account1,
+            TEST_JID1.replace(localpart="2"),
+        )
+
+        cb.assert_called_once_with(
+            self.m.index(3, 0),
+            self.m.index(3, 0),
+            [Qt.Qt.DecorationRole],
+        )
+
 
 class TestFlattenModelToSeparators(unittest.TestCase):
     ITEMS = [
@@ -891,6 +1095,109 @@ class TestFlattenModelToSeparators(unittest.TestCase):
         self._check_mapping_from_source_dynamic()
         self._check_mapping_to_source_dynamic()
 
+    def test_remove_inlined_child_of_later_root(self):
+        self.fm.setSourceModel(self.data)
+
+        self.data.item(2).takeRow(1)
+
+        self.listener.rowsRemoved.assert_called_once_with(
+            Qt.QModelIndex(), 7, 7,
+        )
+        self._check_mapping_from_source_dynamic()
+        self._check_mapping_to_source_dynamic()
+
+    def test_insert_root_in_the_middle(self):
+        self.fm.setSourceModel(self.data)
+        item = Qt.QStandardItem()
+        item.appendRow(Qt.QStandardItem())
+
+        self.data.insertRow(1, item)
+
+        self.assertSequenceEqual(
+            self.listener.mock_calls,
+            [
+                unittest.mock.call.rowsAboutToBeInserted(
+                    Qt.QModelIndex(), 4, 4),
+                unittest.mock.call.rowsInserted(Qt.QModelIndex(), 4, 4),
+                unittest.mock.call.rowsAboutToBeInserted(
+                    Qt.QModelIndex(), 5, 5),
+                unittest.mock.call.rowsInserted(Qt.QModelIndex(), 5, 5),
+            ]
+        )
+        self._check_mapping_from_source_dynamic()
+        self._check_mapping_to_source_dynamic()
+
+    def _flatten_source(self):
+        result = []
+        for i in range(self.data.rowCount()):
+            parent_idx = self.data.index(i, 0, Qt.QModelIndex())
+            result.append(parent_idx.data(Qt.Qt.DisplayRole))
+            for j in range(self.data.rowCount(parent_idx)):
+                result.append(
+                    self.data.index(j, 0, parent_idx).data(Qt.Qt.DisplayRole)
+                )
+        return result
+
+    def test_random_changes_match_flattened_source(self):
+        rng = random.Random(1)
+        self.fm.setSourceModel(self.data)
+
+        # replay the row signals of the proxy on a plain list
+        mirror = self._flatten_source()
+
+        def rows_inserted(parent, start, end):
+            for row in range(start, end + 1):
+                mirror.insert(
+                    row,
+                    self.fm.index(row, 0, Qt.QModelIndex()).data(
+                        Qt.Qt.DisplayRole
+                    )
+                )
+
+        def rows_removed(parent, start, end):
+            del mirror[start:end + 1]
+
+        self.fm.rowsInserted.connect(rows_inserted)
+        self.fm.rowsRemoved.connect(rows_removed)
+
+        for step in range(300):
+            label = str(step)
+            nroots = self.data.rowCount()
+            op = rng.randrange(4)
+            if op == 0 or nroots == 0:
+                item = Qt.QStandardItem(label)
+                for j in range(rng.randrange(3)):
+                    item.appendRow(
+                        Qt.QStandardItem("{}.{}".format(label, j))
+                    )
+                self.data.insertRow(rng.randint(0, nroots), item)
+            elif op == 1:
+                self.data.takeRow(rng.randrange(nroots))
+            elif op == 2:
+                parent = self.data.item(rng.randrange(nroots))
+                parent.insertRow(rng.randint(0, parent.rowCount()),
+                                 Qt.QStandardItem(label))
+            else:
+                parent = self.data.item(rng.randrange(nroots))
+                if parent.rowCount():
+                    parent.takeRow(rng.randrange(parent.rowCount()))
+
+            expected = self._flatten_source()
+            self.assertEqual(mirror, expected)
+            self.assertEqual(self.fm.rowCount(Qt.QModelIndex()),
+                             len(expected))
+            self.assertEqual(
+                [
+                    self.fm.index(i, 0, Qt.QModelIndex()).data(
+                        Qt.Qt.DisplayRole
+                    )
+                    for i in range(len(expected))
+                ],
+                expected,
+            )
+            self._check_mapping_from_source_dynamic()
+            self._check_mapping_to_source_dynamic()
+
 
 class TestRosterModel(unittest.TestCase):
     def setUp(self):
@@ -905,7 +1212,7 @@ class TestRosterModel(unittest.TestCase):
         self.listener = make_listener(self.m)
 
     def test_uses_model_list_adaptor(self):
-        items = unittest.mock.Mock([])
+        items = unittest.mock.Mock(["data_changed"])
 
         with contextlib.ExitStack() as stack:
             ModelListAdaptor = stack.enter_context(
@@ -916,6 +1223,168 @@ class TestRosterModel(unittest.TestCase):
 
         ModelListAdaptor.assert_called_once_with(items, result)
 
+    def test_uses_batched_model_list_adaptor_if_batched(self):
+        items = unittest.mock.Mock(["data_changed"])
+
+        with contextlib.ExitStack() as stack:
+            BatchedModelListAdaptor = stack.enter_context(
+                unittest.mock.patch(
+                    "jabbercat.model_adaptor.BatchedModelListAdaptor"
+                )
+            )
+
+            result = models.RosterModel(items, self.avatar, self.metadata,
+                                        batched=True)
+
+        BatchedModelListAdaptor.assert_called_once_with(items, result)
+
+    def test_row_count_hides_pending_rows_if_batched(self):
+        m = models.RosterModel(self.roster, self.avatar, self.metadata,
+                               batched=True)
+        self.roster.append(
+            unittest.mock.Mock(spec=jclib.roster.AbstractRosterItem)
+        )
+
+        self.assertEqual(m.rowCount(Qt.QModelIndex()), 3)
+
+        cb = unittest.mock.Mock()
+        m.dataChanged.connect(cb)
+        self.roster.data_changed(None, 3, 3, None, None, None)
+        cb.assert_not_called()
+
+        m._RosterModel__adaptor.flush()
+
+        self.assertEqual(m.rowCount(Qt.QModelIndex()), 4)
+
+    def test_row_of_ignores_pending_rows_if_batched(self):
+        m = models.RosterModel(self.roster, self.avatar, self.metadata,
+                               batched=True)
+        item = unittest.mock.Mock(spec=jclib.roster.AbstractRosterItem)
+        self.roster.append(item)
+
+        with self.assertRaises(KeyError):
+            m.row_of(item.account, item.address)
+
+        cb = unittest.mock.Mock()
+        cb.return_value = None
+        m.dataChanged.connect(cb)
+        m._on_avatar_changed(item.account, item.address)
+        cb.assert_not_called()
+
+        m._RosterModel__adaptor.flush()
+
+        self.assertEqual(m.row_of(item.account, item.address), 3)
+
+    def test_forward_data_changed_signal(self):
+        cb = unittest.mock.Mock()
+        self.m.dataChanged.connect(cb)
+
+        self.roster.data_changed(None, 1, 2, None, None, None)
+
+        cb.assert_called_once_with(
+            self.m.index(1, 0),
+            self.m.index(2, 0),
+            [],
+        )
+
+    def test_data_search_key(self):
+        self.roster[1].address = TEST_JID1
+        self.roster[1].label = "Ｒomeo"
+        self.roster[1].tags = ["Friends"]
+
+        self.assertEqual(
+            self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY),
+            ("romeo@montague.lit", "romeo", "friends"),
+        )
+
+    def test_data_search_key_is_cached(self):
+        self.roster[1].address = TEST_JID1
+        self.roster[1].label = "Romeo"
+        self.roster[1].tags = []
+
+        with unittest.mock.patch(
+                "jabbercat.models.normalize_for_search") as normalize:
+            normalize.side_effect = str.casefold
+            result1 = self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY)
+            result2 = self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY)
+
+        self.assertIs(result1, result2)
+        self.assertEqual(len(normalize.mock_calls), 2)
+
+    def test_data_changed_invalidates_search_key(self):
+        self.roster[1].address = TEST_JID1
+        self.roster[1].label = "Romeo"
+        self.roster[1].tags = []
+        self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY)
+
+        self.roster[1].label = "Juliet"
+        self.roster.data_changed(None, 1, 1, None, None, None)
+
+        self.assertEqual(
+            self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY),
+            ("romeo@montague.lit", "juliet"),
+        )
+
+    def test_data_sort_key(self):
+        self.roster[1].label = "Romeo"
+
+        with unittest.mock.patch(
+                "jabbercat.models.collation_key") as collation_key:
+            result1 = self.m.data(self.m.index(1, 0), models.ROLE_SORT_KEY)
+            result2 = self.m.data(self.m.index(1, 0), models.ROLE_SORT_KEY)
+
+        collation_key.assert_called_once_with("Romeo")
+        self.assertEqual(result1, collation_key())
+        self.assertIs(result1, result2)
+
+    def test_data_changed_invalidates_sort_key(self):
+        self.roster[1].label = "Romeo"
+        self.m.data(self.m.index(1, 0), models.ROLE_SORT_KEY)
+
+        self.roster[1].label = "Juliet"
+        self.roster.data_changed(None, 1, 1, None, None, None)
+
+        with unittest.mock.patch(
+                "jabbercat.models.collation_key") as collation_key:
+            self.m.data(self.m.index(1, 0), models.ROLE_SORT_KEY)
+
+        collation_key.assert_called_once_with("Juliet")
+
+    def test_data_tag_key(self):
+        self.roster[1].tags = ["b", "A", "c"]
+
+        with unittest.mock.patch(
+                "jabbercat.models.tag_key") as tag_key:
+            result1 = self.m.data(self.m.index(1, 0), models.ROLE_TAG_KEY)
+            result2 = self.m.data(self.m.index(1, 0), models.ROLE_TAG_KEY)
+
+        tag_key.assert_called_once_with(["b", "A", "c"])
+        self.assertEqual(result1, tag_key())
+        self.assertIs(result1, result2)
+
+    def test_data_changed_invalidates_tag_key(self):
+        self.roster[1].tags = ["a"]
+        self.m.data(self.m.index(1, 0), models.ROLE_TAG_KEY)
+
+        self.roster[1].tags = ["a", "b"]
+        self.roster.data_changed(None, 1, 1, None, None, None)
+
+        self.assertEqual(
+            self.m.data(self.m.index(1, 0), models.ROLE_TAG_KEY),
+            models.tag_key(["a", "b"]),
+        )
+
+    def test_removal_drops_search_key(self):
+        self.roster[1].address = TEST_JID1
+        self.roster[1].label = "Romeo"
+        self.roster[1].tags = []
+        self.m.data(self.m.index(1, 0), models.ROLE_SEARCH_KEY)
+
+        item = self.roster[1]
+        del self.roster[1]
+
+        self.assertNotIn(item, self.m._search_keys)
+
     def test_connects_to_on_avatar_changed_weakly(self):
         self.avatar.on_avatar_changed.connect.assert_called_once_with(
             self.m._on_avatar_changed,
@@ -1103,6 +1572,115 @@ class TestRosterModel(unittest.TestCase):
 
         cb.assert_not_called()
 
+    def test_tooltip_is_cached(self):
+        with unittest.mock.patch.object(
+                self.m, "_format_tooltip") as _format_tooltip:
+            result1 = self.m.data(self.m.index(1, 0), Qt.Qt.ToolTipRole)
+            result2 = self.m.data(self.m.index(1, 0), Qt.Qt.ToolTipRole)
+
+        _format_tooltip.assert_called_once_with(self.roster[1])
+        self.assertEqual(result1, _format_tooltip())
+        self.assertEqual(result2, _format_tooltip())
+
+    def test_format_tooltip_uses_avatar_data_uri(self):
+        self.roster[1].label = "Juliet"
+        self.roster[1].address = TEST_JID2
+        self.avatar.get_avatar_data_uri.return_value = "data:image/png,foo"
+
+        result = self.m._format_tooltip(self.roster[1])
+
+        self.avatar.get_avatar_data_uri.assert_called_once_with(
+            self.roster[1].account,
+            TEST_JID2,
+        )
+        self.assertIn("data:image/png,foo", result)
+        self.assertIn("Juliet", result)
+
+    def _check_tooltip_invalidated(self, row, invalidate):
+        with unittest.mock.patch.object(
+                self.m, "_format_tooltip") as _format_tooltip:
+            self.m.data(self.m.index(row, 0), Qt.Qt.ToolTipRole)
+            invalidate()
+            self.m.data(self.m.index(row, 0), Qt.Qt.ToolTipRole)
+
+        self.assertEqual(len(_format_tooltip.mock_calls), 2)
+
+    def test_data_changed_invalidates_tooltip(self):
+        self._check_tooltip_invalidated(
+            1,
+            lambda: self.roster.data_changed(None, 1, 1, None, None, None),
+        )
+
+    def test_avatar_change_invalidates_tooltip(self):
+        self.roster[1].account = unittest.mock.sentinel.account
+        self.roster[1].address = TEST_JID1
+        self._check_tooltip_invalidated(
+            1,
+            lambda: self.m._on_avatar_changed(
+                unittest.mock.sentinel.account, TEST_JID1,
+            ),
+        )
+
+    def test_connects_to_presence_changes(self):
+        self.metadata.changed_signal.assert_any_call(
+            jclib.metadata.PresenceMetadata.STANZA,
+        )
+        self.metadata.changed_signal().connect.assert_any_call(
+            self.m._on_presence_changed,
+            aioxmpp.callbacks.AdHocSignal.WEAK,
+        )
+
+    def test_presence_change_invalidates_tooltip(self):
+        self.roster[1].account = unittest.mock.sentinel.account
+        self.roster[1].address = TEST_JID1
+        self._check_tooltip_invalidated(
+            1,
+            lambda: self.m._on_presence_changed(
+                jclib.metadata.PresenceMetadata.STANZA,
+                unittest.mock.sentinel.account,
+                TEST_JID1.replace(resource="balcony"),
+                unittest.mock.sentinel.presence,
+            ),
+        )
+
+    def test_row_of(self):
+        self.roster[0].account = unittest.mock.sentinel.account1
+        self.roster[0].address = TEST_JID1
+        self.roster[1].account = unittest.mock.sentinel.account2
+        self.roster[1].address = TEST_JID1
+        self.roster[2].account = unittest.mock.sentinel.account1
+        self.roster[2].address = TEST_JID2
+
+        self.assertEqual(
+            self.m.row_of(unittest.mock.sentinel.account2, TEST_JID1),
+            1,
+        )
+
+        with self.assertRaises(KeyError):
+            self.m.row_of(unittest.mock.sentinel.account2, TEST_JID2)
+
+    def test_row_of_follows_removal(self):
+        for i, item in enumerate(self.roster):
+            item.account = unittest.mock.sentinel.account1
+            item.address = TEST_JID1.replace(localpart=str(i))
+
+        self.assertEqual(
+            self.m.row_of(unittest.mock.sentinel.account1,
+                          TEST_JID1.replace(localpart="2")),
+            2,
+        )
+
+        del self.roster[0]
+
+        self.assertEqual(
+            self.m.row_of(unittest.mock.sentinel.account1,
+                          TEST_JID1.replace(localpart="2")),
+            1,
+        )
+        with self.assertRaises(KeyError):
+            self.m.row_of(unittest.mock.sentinel.account1,
+                          TEST_JID1.replace(localpart="0"))
+
 
 class TestRosterFilterModel(unittest.TestCase):
     def setUp(self):
@@ -1115,6 +1693,7 @@ class TestRosterFilterModel(unittest.TestCase):
         self.roster[0].tags = ["foo", "bar"]
         self.roster[1].tags = ["bar"]
         self.roster[2].tags = ["foo", "baz"]
+        self._setup_labels()
 
         self.avatar = unittest.mock.Mock(spec=jabbercat.avatar.AvatarManager)
         self.metadata = unittest.mock.Mock(spec=jclib.metadata.MetadataFrontend)
@@ -1207,6 +1786,483 @@ class TestRosterFilterModel(unittest.TestCase):
         self.assertFalse(self.rfm.filterAcceptsRow(1, Qt.QModelIndex()))
         self.assertTrue(self.rfm.filterAcceptsRow(2, Qt.QModelIndex()))
 
+    def test_filter_by_text_matches_on_tag(self):
+        self.roster[0].address = TEST_JID1
+        self.roster[0].label = "Romeo Montague"
+        self.roster[1].address = TEST_JID2
+        self.roster[1].label = "Juliet Capulet"
+        self.roster[2].address = aioxmpp.JID.fromstr("test@server.example")
+        self.roster[2].label = "Meaningful Label"
+
+        self.rfm.filter_by_text = "BA"
+
+        self.assertTrue(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+        self.assertTrue(self.rfm.filterAcceptsRow(1, Qt.QModelIndex()))
+        self.assertTrue(self.rfm.filterAcceptsRow(2, Qt.QModelIndex()))
+
+        self.rfm.filter_by_text = "baz"
+
+        self.assertFalse(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+        self.assertFalse(self.rfm.filterAcceptsRow(1, Qt.QModelIndex()))
+        self.assertTrue(self.rfm.filterAcceptsRow(2, Qt.QModelIndex()))
+
+    def test_filter_by_text_normalizes_query_once(self):
+        for item in self.roster:
+            item.address = TEST_JID1
+            item.label = "Romeo"
+        self.roster.data_changed(None, 0, 2, None, None, None)
+
+        for i in range(3):
+            self.rm.data(self.rm.index(i, 0), models.ROLE_SEARCH_KEY)
+
+        with unittest.mock.patch(
+                "jabbercat.models.normalize_for_search") as normalize:
+            normalize.side_effect = str.casefold
+            self.rfm.filter_by_text = "ROMEO"
+            for i in range(3):
+                self.assertTrue(
+                    self.rfm.filterAcceptsRow(i, Qt.QModelIndex())
+                )
+
+        normalize.assert_called_once_with("ROMEO")
+
+    def _setup_labels(self):
+        self.roster[0].address = TEST_JID1
+        self.roster[0].label = "Romeo Montague"
+        self.roster[1].address = TEST_JID2
+        self.roster[1].label = "Juliet Capulet"
+        self.roster[2].address = aioxmpp.JID.fromstr("test@server.example")
+        self.roster[2].label = "Meaningful Label"
+
+    def _score(self, row):
+        index = self.rfm.mapFromSource(self.rm.index(row, 0))
+        return self.rfm.data(index, models.ROLE_FILTER_SCORE)
+
+    def test_filter_score_is_None_without_text_filter(self):
+        self._setup_labels()
+        for i in range(3):
+            self.assertIsNone(self._score(i))
+
+    def test_filter_score_ranks_matches(self):
+        self._setup_labels()
+
+        self.rfm.filter_by_text = "montague"
+
+        self.assertTrue(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+        self.assertEqual(self._score(0), search.SCORE_SUBSTRING)
+
+        self.rfm.filter_by_text = "romeo"
+
+        self.assertEqual(self._score(0), search.SCORE_PREFIX)
+
+    def test_filter_by_text_is_fuzzy(self):
+        self._setup_labels()
+
+        self.rfm.filter_by_text = "capulett"
+
+        self.assertFalse(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+        self.assertTrue(self.rfm.filterAcceptsRow(1, Qt.QModelIndex()))
+        self.assertFalse(self.rfm.filterAcceptsRow(2, Qt.QModelIndex()))
+        self.assertLess(self._score(1), search.SCORE_SUBSTRING)
+
+    def test_filter_by_text_follows_data_changes(self):
+        self._setup_labels()
+        self.rfm.filter_by_text = "juliet"
+        self.assertFalse(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+
+        self.roster[0].label = "Juliet"
+        self.roster.data_changed(None, 0, 0, None, None, None)
+
+        self.assertTrue(self.rfm.filterAcceptsRow(0, Qt.QModelIndex()))
+        self.assertEqual(self._score(0), search.SCORE_PREFIX)
+
+    def test_removed_items_are_dropped_from_search_index(self):
+        self._setup_labels()
+        self.rfm.filter_by_text = "juliet"
+        item = self.roster[1]
+        self.assertIn(item, self.rfm._search_index)
+
+        del self.roster[1]
+
+        self.assertNotIn(item, self.rfm._search_index)
+
+    def test_filter_by_text_emits_dataChanged_for_scores(self):
+        self._setup_labels()
+        cb = unittest.mock.Mock()
+        self.rfm.dataChanged.connect(cb)
+
+        self.rfm.filter_by_text = "a"
+
+        nrows = self.rfm.rowCount(Qt.QModelIndex())
+        cb.assert_called_once_with(
+            self.rfm.index(0, 0),
+            self.rfm.index(nrows - 1, 0),
+            [models.ROLE_FILTER_SCORE],
+        )
+
+    def _count_evaluated_rows(self, query):
+        with unittest.mock.patch.object(
+                self.rfm, "_filter_accepts_row",
+                wraps=self.rfm._filter_accepts_row) as evaluate:
+            self.rfm.filter_by_text = query
+        return sorted({call[1][0] for call in evaluate.mock_calls})
+
+    def test_extending_query_only_reevaluates_accepted_rows(self):
+        self._setup_labels()
+        self.rfm.filter_by_text = "mont"
+
+        self.assertEqual(self._count_evaluated_rows("monta"), [0])
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+    def test_query_with_new_matches_reevaluates_all_rows(self):
+        self._setup_labels()
+        self.rfm.filter_by_text = "mont"
+
+        self.assertEqual(self._count_evaluated_rows("m"), [0, 1, 2])
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 2)
+
+    def test_row_insertion_keeps_rejected_rows(self):
+        self._setup_labels()
+        self.rfm.filter_by_text = "mont"
+
+        new_item = unittest.mock.Mock(spec=jclib.roster.AbstractRosterItem)
+        new_item.address = aioxmpp.JID.fromstr("montague@montague.lit")
+        new_item.label = "Montague"
+        new_item.tags = []
+        self.roster.insert(0, new_item)
+
+        self.assertEqual(self._count_evaluated_rows("monta"), [0, 1])
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 2)
+
+    def test_tags_filter_uses_tag_index(self):
+        self.rfm.filterAcceptsRow(0, Qt.QModelIndex())
+        self.rfm.filterAcceptsRow(1, Qt.QModelIndex())
+        self.rfm.filterAcceptsRow(2, Qt.QModelIndex())
+
+        self.assertSetEqual(
+            self.rfm._tag_index.matching({"foo"}),
+            {self.roster[0], self.roster[2]},
+        )
+
+    def test_toggling_tag_only_refilters_affected_rows(self):
+        self.tags_check_model.setData(
+            self.tags_check_model.index(1, 0),
+            Qt.Qt.Checked,
+            Qt.Qt.CheckStateRole,
+        )
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 2)
+
+        with unittest.mock.patch.object(
+                self.rfm, "_filter_accepts_row",
+                wraps=self.rfm._filter_accepts_row) as evaluate:
+            self.tags_check_model.setData(
+                self.tags_check_model.index(0, 0),
+                Qt.Qt.Checked,
+                Qt.Qt.CheckStateRole,
+            )
+
+        self.assertEqual(
+            sorted({call[1][0] for call in evaluate.mock_calls}),
+            [1],
+        )
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+        self.assertEqual(
+            self.rfm.data(self.rfm.index(0, 0), models.ROLE_OBJECT),
+            self.roster[0],
+        )
+
+    def test_toggling_tag_does_not_notify_through_source_model(self):
+        data_changed = unittest.mock.Mock()
+        data_changed.return_value = None
+        self.rm.dataChanged.connect(data_changed)
+
+        self.tags_check_model.setData(
+            self.tags_check_model.index(2, 0),
+            Qt.Qt.Checked,
+            Qt.Qt.CheckStateRole,
+        )
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+        self.tags_check_model.setData(
+            self.tags_check_model.index(2, 0),
+            Qt.Qt.Unchecked,
+            Qt.Qt.CheckStateRole,
+        )
+
+        data_changed.assert_not_called()
+        self.assertEqual(
+            [self.rfm.data(self.rfm.index(row, 0), models.ROLE_OBJECT)
+             for row in range(self.rfm.rowCount(Qt.QModelIndex()))],
+            list(self.roster),
+        )
+
+    def test_filter_roles(self):
+        self.assertSetEqual(
+            self.rfm.filter_roles(),
+            {models.ROLE_SEARCH_KEY, models.ROLE_TAGS, Qt.Qt.DisplayRole},
+        )
+
+    def test_decoration_change_does_not_evaluate_filter(self):
+        self.tags_check_model.setData(
+            self.tags_check_model.index(2, 0),
+            Qt.Qt.Checked,
+            Qt.Qt.CheckStateRole,
+        )
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+        with unittest.mock.patch.object(
+                self.rfm, "_filter_accepts_row",
+                wraps=self.rfm._filter_accepts_row) as evaluate:
+            for row in range(3):
+                self.rm.dataChanged.emit(self.rm.index(row, 0),
+                                         self.rm.index(row, 0),
+                                         [Qt.Qt.DecorationRole])
+
+        evaluate.assert_not_called()
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+    def test_tags_filter_follows_tag_changes(self):
+        self.tags_check_model.setData(
+            self.tags_check_model.index(2, 0),
+            Qt.Qt.Checked,
+            Qt.Qt.CheckStateRole,
+        )
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+        self.roster[1].tags = ["bar", "baz"]
+        self.roster.data_changed(None, 1, 1, None, None, None)
+
+        self.assertTrue(self.rfm.filterAcceptsRow(1, Qt.QModelIndex()))
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 2)
+
+    def test_tag_changes_are_ignored_while_filtering_by_text(self):
+        self.rfm.filter_by_text = "capulet"
+
+        with unittest.mock.patch.object(
+                self.rfm, "_filter_accepts_row",
+                wraps=self.rfm._filter_accepts_row) as evaluate:
+            self.tags_check_model.setData(
+                self.tags_check_model.index(2, 0),
+                Qt.Qt.Checked,
+                Qt.Qt.CheckStateRole,
+            )
+
+        evaluate.assert_not_called()
+        self.assertEqual(self.rfm.rowCount(Qt.QModelIndex()), 1)
+
+
+class TestRoleAwareProxyModel(unittest.TestCase):
+    def setUp(self):
+        self.source = Qt.QStandardItemModel()
+        for label in ["b", "c", "a"]:
+            self.source.appendRow(Qt.QStandardItem(label))
+        self.m = models.RoleAwareProxyModel()
+        self.m.setSourceModel(self.source)
+        self.m.setDynamicSortFilter(True)
+        self.m.sort(0, Qt.Qt.AscendingOrder)
+        self.listener = unittest.mock.Mock()
+        for cb in ["dataChanged", "layoutChanged"]:
+            handler = getattr(self.listener, cb)
+            handler.return_value = None
+            getattr(self.m, cb).connect(handler)
+
+    def _labels(self):
+        return [
+            self.m.data(self.m.index(i, 0), Qt.Qt.DisplayRole)
+            for i in range(self.m.rowCount(Qt.QModelIndex()))
+        ]
+
+    def _count_comparisons(self):
+        return unittest.mock.patch.object(
+            self.m, "_less_than",
+            wraps=self.m._less_than,
+        )
+
+    def test_sorted(self):
+        self.assertEqual(self._labels(), ["a", "b", "c"])
+
+    def test_sort_roles(self):
+        self.assertSetEqual(self.m.sort_roles(), {Qt.Qt.DisplayRole})
+        self.m.setSortRole(Qt.Qt.ToolTipRole)
+        self.assertSetEqual(self.m.sort_roles(), {Qt.Qt.ToolTipRole})
+
+    def test_filter_roles(self):
+        self.assertSetEqual(self.m.filter_roles(), {Qt.Qt.DisplayRole})
+        self.m.setFilterRole(Qt.Qt.ToolTipRole)
+        self.assertSetEqual(self.m.filter_roles(), {Qt.Qt.ToolTipRole})
+
+    def test_other_roles_are_forwarded_without_comparing(self):
+        index = self.source.index(0, 0)
+
+        with self._count_comparisons() as less_than:
+            self.source.setData(index, "foo", Qt.Qt.DecorationRole)
+
+        less_than.assert_not_called()
+        self.assertFalse(self.m._order_unchanged)
+        self.assertFalse(self.m._filter_unchanged)
+        self.listener.dataChanged.assert_called_once_with(
+            self.m.mapFromSource(index),
+            self.m.mapFromSource(index),
+            [Qt.Qt.DecorationRole],
+        )
+        self.listener.layoutChanged.assert_not_called()
+
+    def test_sort_role_change_resorts(self):
+        with self._count_comparisons() as less_than:
+            self.source.setData(self.source.index(0, 0), "d",
+                                Qt.Qt.DisplayRole)
+
+        less_than.assert_called_with(unittest.mock.ANY, unittest.mock.ANY)
+        self.assertEqual(self._labels(), ["a", "c", "d"])
+
+    def test_empty_roles_compare_rows(self):
+        with self._count_comparisons() as less_than:
+            self.source.dataChanged.emit(self.source.index(0, 0),
+                                         self.source.index(0, 0),
+                                         [])
+
+        less_than.assert_called_with(unittest.mock.ANY, unittest.mock.ANY)
+
+    def test_filter_role_change_places_accepted_rows(self):
+        self.m.setFilterRole(Qt.Qt.ToolTipRole)
+        self.m.setFilterFixedString("foo")
+        self.assertEqual(self._labels(), [])
+
+        for row in [1, 0, 2]:
+            self.source.setData(self.source.index(row, 0), "foo",
+                                Qt.Qt.ToolTipRole)
+
+        self.assertEqual(self._labels(), ["a", "b", "c"])
+
+    def test_inserted_rows_are_sorted(self):
+        for label in ["z", "d", "f"]:
+            self.source.insertRow(0, Qt.QStandardItem(label))
+            # an unrelated change in between must not affect placement
+            self.source.setData(self.source.index(1, 0), "foo",
+                                Qt.Qt.DecorationRole)
+        self.source.appendRow(Qt.QStandardItem("0"))
+
+        self.assertEqual(self._labels(), ["0", "a", "b", "c", "d", "f", "z"])
+        self.listener.layoutChanged.assert_not_called()
+
+    def test_set_source_model_moves_bracket_to_new_model(self):
+        source = Qt.QStandardItemModel()
+        for label in ["y", "x"]:
+            source.appendRow(Qt.QStandardItem(label))
+        self.m.setSourceModel(source)
+
+        with self._count_comparisons() as less_than:
+            self.source.setData(self.source.index(0, 0), "d",
+                                Qt.Qt.DisplayRole)
+            source.setData(source.index(0, 0), "foo", Qt.Qt.DecorationRole)
+
+        less_than.assert_not_called()
+        self.assertEqual(self._labels(), ["x", "y"])
+
+
+class TestSortKeyProxyModel(unittest.TestCase):
+    def setUp(self):
+        self.source = Qt.QStandardItemModel()
+        for label in ["b", "C", "a"]:
+            item = Qt.QStandardItem(label)
+            item.setData(models.collation_key(label), models.ROLE_SORT_KEY)
+            self.source.appendRow(item)
+        self.m = models.SortKeyProxyModel()
+        self.m.setSourceModel(self.source)
+        self.m.setSortRole(models.ROLE_SORT_KEY)
+        self.m.sort(0, Qt.Qt.AscendingOrder)
+
+    def _labels(self):
+        return [
+            self.m.data(self.m.index(i, 0), Qt.Qt.DisplayRole)
+            for i in range(self.m.rowCount(Qt.QModelIndex()))
+        ]
+
+    def test_sorts_by_collation_key(self):
+        self.assertEqual(self._labels(), ["a", "b", "C"])
+
+    def test_decoration_change_does_not_compare_rows(self):
+        with unittest.mock.patch.object(
+                self.m, "_less_than",
+                wraps=self.m._less_than) as less_than:
+            self.source.setData(self.source.index(0, 0), "x",
+                                Qt.Qt.DecorationRole)
+
+        less_than.assert_not_called()
+        self.assertEqual(self._labels(), ["a", "b", "C"])
+
+    def test_falls_back_to_default_comparison(self):
+        self.m.setSortRole(Qt.Qt.DisplayRole)
+        self.m.sort(0, Qt.Qt.AscendingOrder)
+        self.assertEqual(self._labels(), ["C", "a", "b"])
+
+
+class TestRosterSortModel(unittest.TestCase):
+    def setUp(self):
+        self.source = Qt.QStandardItemModel()
+        for label, score in [("a", None), ("b", None), ("c", None)]:
+            item = Qt.QStandardItem(label)
+            item.setData(score, models.ROLE_FILTER_SCORE)
+            self.source.appendRow(item)
+        self.m = models.RosterSortModel()
+        self.m.setSourceModel(self.source)
+        self.m.setDynamicSortFilter(True)
+        self.m.sort(0, Qt.Qt.AscendingOrder)
+
+    def _labels(self):
+        return [
+            self.m.data(self.m.index(i, 0), Qt.Qt.DisplayRole)
+            for i in range(self.m.rowCount(Qt.QModelIndex()))
+        ]
+
+    def test_sorts_by_sort_role_without_scores(self):
+        self.assertEqual(self._labels(), ["a", "b", "c"])
+
+    def test_sorts_by_descending_score(self):
+        for row, score in enumerate([1.0, 0.5, 2.0]):
+            self.source.setData(self.source.index(row, 0), score,
+                                models.ROLE_FILTER_SCORE)
+
+        self.assertEqual(self._labels(), ["c", "a", "b"])
+
+    def test_equal_scores_fall_back_to_sort_role(self):
+        for row, score in enumerate([1.0, 1.0, 2.0]):
+            self.source.setData(self.source.index(row, 0), score,
+                                models.ROLE_FILTER_SCORE)
+
+        self.assertEqual(self._labels(), ["c", "a", "b"])
+
+    def test_score_change_resorts(self):
+        for row, score in enumerate([1.0, 0.5, 2.0]):
+            self.source.setData(self.source.index(row, 0), score,
+                                models.ROLE_FILTER_SCORE)
+
+        self.source.setData(self.source.index(1, 0), 3.0,
+                            models.ROLE_FILTER_SCORE)
+
+        self.assertEqual(self._labels(), ["b", "c", "a"])
+
+    def test_decoration_change_does_not_compare_rows(self):
+        with unittest.mock.patch.object(
+                self.m, "_less_than",
+                wraps=self.m._less_than) as less_than:
+            self.source.setData(self.source.index(0, 0), "x",
+                                Qt.Qt.DecorationRole)
+
+        less_than.assert_not_called()
+        self.assertEqual(self._labels(), ["a", "b", "c"])
+
+    def test_inserted_rows_are_sorted_by_score(self):
+        for row, score in enumerate([1.0, 0.5, 2.0]):
+            self.source.setData(self.source.index(row, 0), score,
+                                models.ROLE_FILTER_SCORE)
+
+        item = Qt.QStandardItem("d")
+        item.setData(1.5, models.ROLE_FILTER_SCORE)
+        self.source.insertRow(0, item)
+
+        self.assertEqual(self._labels(), ["c", "d", "a", "b"])
+
 
 class TestTagsModel(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,214 @@
+import unittest
+
+import jabbercat.search as search
+
+
+class Testtrigrams(unittest.TestCase):
+    def test_pads_string(self):
+        self.assertSetEqual(
+            search.trigrams("abcd"),
+            {" ab", "abc", "bcd", "cd "},
+        )
+
+    def test_short_string(self):
+        self.assertSetEqual(
+            search.trigrams("a"),
+            {" a "},
+        )
+
+    def test_empty_string(self):
+        self.assertSetEqual(
+            search.trigrams(""),
+            set(),
+        )
+
+
+class Testquery_trigrams(unittest.TestCase):
+    def test_does_not_pad(self):
+        self.assertSetEqual(
+            search.query_trigrams("abcd"),
+            {"abc", "bcd"},
+        )
+
+    def test_short_query(self):
+        self.assertSetEqual(
+            search.query_trigrams("ab"),
+            set(),
+        )
+
+
+class TestTrigramIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = search.TrigramIndex()
+        self.index.add("romeo", ["romeo@montague.lit", "romeo montague",
+                                 "friends"])
+        self.index.add("juliet", ["juliet@capulet.lit", "juliet capulet"])
+        self.index.add("tybalt", ["tybalt@capulet.lit", "tybalt",
+                                  "enemies"])
+
+    def test_len_and_contains(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertIn("romeo", self.index)
+        self.assertNotIn("mercutio", self.index)
+
+    def test_strings_of(self):
+        self.assertEqual(
+            self.index.strings_of("tybalt"),
+            ("tybalt@capulet.lit", "tybalt", "enemies"),
+        )
+        self.assertIsNone(self.index.strings_of("mercutio"))
+
+    def test_search_prefix(self):
+        self.assertDictEqual(
+            self.index.search("jul"),
+            {"juliet": search.SCORE_PREFIX},
+        )
+
+    def test_search_substring(self):
+        self.assertDictEqual(
+            self.index.search("capulet"),
+            {
+                "juliet": search.SCORE_SUBSTRING,
+                "tybalt": search.SCORE_SUBSTRING,
+            }
+        )
+
+    def test_search_prefers_prefix_over_substring(self):
+        self.index.add("capulet", ["capulet@capulet.lit"])
+        result = self.index.search("capulet")
+        self.assertEqual(result["capulet"], search.SCORE_PREFIX)
+        self.assertEqual(result["juliet"], search.SCORE_SUBSTRING)
+
+    def test_search_tolerates_typos(self):
+        result = self.index.search("montagve")
+        self.assertEqual(list(result), ["romeo"])
+        self.assertLess(result["romeo"], search.SCORE_SUBSTRING)
+        self.assertGreaterEqual(result["romeo"], search.MIN_SIMILARITY)
+
+    def test_search_respects_min_similarity(self):
+        self.assertDictEqual(self.index.search("montagve", 0.9), {})
+
+    def test_search_short_query(self):
+        self.assertDictEqual(
+            self.index.search("ty"),
+            {"tybalt": search.SCORE_PREFIX},
+        )
+        self.assertDictEqual(
+            self.index.search("y"),
+            {"tybalt": search.SCORE_SUBSTRING},
+        )
+
+    def test_search_without_match(self):
+        self.assertDictEqual(self.index.search("mercutio"), {})
+
+    def test_score_agrees_with_search(self):
+        for query in ["jul", "capulet", "montagve", "ty", "xyz"]:
+            result = self.index.search(query)
+            for document in ["romeo", "juliet", "tybalt"]:
+                self.assertEqual(
+                    self.index.score(document, query),
+                    result.get(document),
+                    (document, query),
+                )
+
+    def test_score_raises_KeyError_for_unknown_document(self):
+        with self.assertRaises(KeyError):
+            self.index.score("mercutio", "foo")
+
+    def test_add_replaces_strings(self):
+        self.index.add("tybalt", ["tybalt@montague.lit"])
+        self.assertNotIn("tybalt", self.index.search("capulet"))
+        self.assertIn("tybalt", self.index.search("montague"))
+        self.assertEqual(len(self.index), 3)
+
+    def test_remove(self):
+        self.index.remove("juliet")
+        self.assertNotIn("juliet", self.index)
+        self.assertDictEqual(
+            self.index.search("capulet"),
+            {"tybalt": search.SCORE_SUBSTRING},
+        )
+
+    def test_remove_drops_empty_postings(self):
+        self.index.remove("tybalt")
+        self.assertNotIn("yba", self.index._postings)
+        self.assertNotIn("ene", self.index._postings)
+
+    def test_remove_unknown_document_is_noop(self):
+        self.index.remove("mercutio")
+        self.assertEqual(len(self.index), 3)
+
+    def test_clear(self):
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertDictEqual(self.index.search("capulet"), {})
+
+
+class TestTagIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = search.TagIndex()
+        self.index.add("romeo", ["montague", "friends"])
+        self.index.add("juliet", ["capulet", "friends"])
+        self.index.add("tybalt", ["capulet"])
+
+    def test_len_and_contains(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertIn("romeo", self.index)
+        self.assertNotIn("mercutio", self.index)
+
+    def test_tags_of(self):
+        self.assertEqual(self.index.tags_of("tybalt"), frozenset(["capulet"]))
+        self.assertIsNone(self.index.tags_of("mercutio"))
+
+    def test_matching_single_tag(self):
+        self.assertSetEqual(
+            self.index.matching({"capulet"}),
+            {"juliet", "tybalt"},
+        )
+
+    def test_matching_intersects_tags(self):
+        self.assertSetEqual(
+            self.index.matching({"capulet", "friends"}),
+            {"juliet"},
+        )
+
+    def test_matching_unknown_tag(self):
+        self.assertSetEqual(
+            self.index.matching({"capulet", "nurse"}),
+            set(),
+        )
+
+    def test_matching_without_tags_returns_all(self):
+        self.assertSetEqual(
+            self.index.matching(set()),
+            {"romeo", "juliet", "tybalt"},
+        )
+
+    def test_matching_returns_copy(self):
+        self.index.matching({"capulet"}).clear()
+        self.assertSetEqual(
+            self.index.matching({"capulet"}),
+            {"juliet", "tybalt"},
+        )
+
+    def test_add_replaces_tags(self):
+        self.index.add("tybalt", ["montague"])
+        self.assertSetEqual(self.index.matching({"capulet"}), {"juliet"})
+        self.assertSetEqual(
+            self.index.matching({"montague"}),
+            {"romeo", "tybalt"},
+        )
+
+    def test_remove(self):
+        self.index.remove("juliet")
+        self.assertNotIn("juliet", self.index)
+        self.assertSetEqual(self.index.matching({"friends"}), {"romeo"})
+
+    def test_remove_unknown_document_is_noop(self):
+        self.index.remove("mercutio")
+        self.assertEqual(len(self.index), 3)
+
+    def test_clear(self):
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertSetEqual(self.index.matching(set()), set())
@@ -1,4 +1,5 @@
 import contextlib
+import random
 import unittest
 import unittest.mock
 
@@ -514,3 +515,117 @@ class TestDragNDropUtils(unittest.TestCase):
             utils.DRAG_MIME_TYPE,
             "application/vnd.org.jabbercat.drag-key"
         )
+
+
+class TestFenwickTree(unittest.TestCase):
+    def setUp(self):
+        self.t = utils.FenwickTree([3, 1, 0, 4, 2])
+
+    def test_sequence_interface(self):
+        self.assertEqual(len(self.t), 5)
+        self.assertEqual(self.t[3], 4)
+        self.assertEqual(list(self.t), [3, 1, 0, 4, 2])
+
+    def test_prefix_sum(self):
+        self.assertSequenceEqual(
+            [self.t.prefix_sum(i) for i in range(6)],
+            [0, 3, 4, 4, 8, 10],
+        )
+        self.assertEqual(self.t.total(), 10)
+
+    def test_add(self):
+        self.t.add(1, 2)
+        self.assertEqual(self.t[1], 3)
+        self.assertEqual(self.t.prefix_sum(2), 6)
+        self.assertEqual(self.t.total(), 12)
+
+    def test_setitem(self):
+        self.t[0] = 1
+        self.assertEqual(self.t.prefix_sum(1), 1)
+        self.assertEqual(self.t.total(), 8)
+
+    def test_find(self):
+        self.assertSequenceEqual(
+            [self.t.find(position) for position in range(11)],
+            [0, 0, 0, 1, 3, 3, 3, 3, 4, 4, 5],
+        )
+
+    def test_find_on_empty_tree(self):
+        self.assertEqual(utils.FenwickTree().find(0), 0)
+
+    def test_insert(self):
+        self.t.insert(1, [5, 6])
+        self.assertEqual(list(self.t), [3, 5, 6, 1, 0, 4, 2])
+        self.assertEqual(self.t.prefix_sum(3), 14)
+
+    def test_delete(self):
+        self.t.delete(1, 3)
+        self.assertEqual(list(self.t), [3, 4, 2])
+        self.assertEqual(self.t.prefix_sum(2), 7)
+
+    def test_random_operations_match_list(self):
+        rng = random.Random(1)
+        values = []
+        t = utils.FenwickTree()
+        for _ in range(500):
+            op = rng.randrange(3)
+            if op == 0 or not values:
+                index = rng.randint(0, len(values))
+                new = [rng.randint(1, 5) for _ in range(rng.randint(1, 3))]
+                values[index:index] = new
+                t.insert(index, new)
+            elif op == 1:
+                index = rng.randrange(len(values))
+                delta = rng.randint(1 - values[index], 5)
+                values[index] += delta
+                t.add(index, delta)
+            else:
+                start = rng.randrange(len(values))
+                stop = rng.randint(start, len(values))
+                del values[start:stop]
+                t.delete(start, stop)
+
+            self.assertEqual(list(t), values)
+            for i in range(len(values) + 1):
+                self.assertEqual(t.prefix_sum(i), sum(values[:i]))
+            for position in range(sum(values)):
+                i = t.find(position)
+                self.assertLessEqual(t.prefix_sum(i), position)
+                self.assertLess(position, t.prefix_sum(i + 1))
+
+
+class TestFontCache(unittest.TestCase):
+    def setUp(self):
+        self.factory = unittest.mock.Mock()
+        self.cache = utils.FontCache(self.factory)
+        self.font = Qt.QFont("Sans", 10)
+
+    def test_get_calls_factory(self):
+        result = self.cache.get(self.font)
+        self.factory.assert_called_once_with(self.font)
+        self.assertEqual(result, self.factory())
+
+    def test_get_caches_for_equal_font(self):
+        result1 = self.cache.get(self.font)
+        result2 = self.cache.get(Qt.QFont(self.font))
+        self.assertIs(result1, result2)
+        self.assertEqual(len(self.factory.mock_calls), 1)
+
+    def test_get_calls_factory_again_for_other_font(self):
+        self.cache.get(self.font)
+        other = Qt.QFont(self.font)
+        other.setPointSizeF(12)
+        self.cache.get(other)
+        self.assertSequenceEqual(
+            self.factory.mock_calls,
+            [
+                unittest.mock.call(self.font),
+                unittest.mock.call(other),
+            ]
+        )
+
+    def test_clear(self):
+        self.cache.get(self.font)
+        self.cache.clear()
+        self.cache.get(self.font)
+        self.assertEqual(len(self.factory.mock_calls), 2)
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import unittest
+import unittest.mock
+
+import aioxmpp
+import aioxmpp.callbacks
+
+import jabbercat.avatar as avatar
+import jabbercat.Qt as Qt
+import jabbercat.webintegration as webintegration
+
+from aioxmpp.testutils import (
+    CoroutineMock,
+    run_coroutine,
+)
+
+
+TEST_JID1 = aioxmpp.JID.fromstr("romeo@montague.lit")
+TEST_JID2 = aioxmpp.JID.fromstr("juliet@capulet.lit")
+
+
+class TestAvatarURLSchemeHandler(unittest.TestCase):
+    def setUp(self):
+        self.accounts = unittest.mock.Mock()
+        self.accounts.lookup_jid.return_value = unittest.mock.sentinel.account
+        self.avatar_manager = unittest.mock.Mock(spec=avatar.AvatarManager)
+        self.avatar_manager.on_avatar_changed = \
+            aioxmpp.callbacks.AdHocSignal()
+        self.handler = webintegration.AvatarURLSchemeHandler(
+            self.accounts,
+            self.avatar_manager,
+        )
+        self.handler._render_avatar = unittest.mock.Mock()
+
+        self.encode_png = unittest.mock.Mock()
+        self.encode_png.return_value = b"png"
+        patcher = unittest.mock.patch(
+            "jabbercat.webintegration._encode_png",
+            new=self.encode_png,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        del self.handler
+
+    def _get_png(self, epoch="1"):
+        return self.handler._get_png(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+            None,
+            epoch,
+        )
+
+    def test_get_png_encodes_rendered_avatar(self):
+        result = run_coroutine(self._get_png())
+
+        self.handler._render_avatar.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+            None,
+        )
+        self.encode_png.assert_called_once_with(
+            self.handler._render_avatar(),
+        )
+        self.assertEqual(result, b"png")
+
+    def test_get_png_uses_cache(self):
+        run_coroutine(self._get_png())
+        result = run_coroutine(self._get_png())
+
+        self.assertEqual(result, b"png")
+        self.assertEqual(len(self.encode_png.mock_calls), 1)
+
+    def test_get_png_caches_per_epoch(self):
+        run_coroutine(self._get_png("1"))
+        run_coroutine(self._get_png("2"))
+
+        self.assertEqual(len(self.encode_png.mock_calls), 2)
+
+    def test_get_png_shares_encoding_in_flight(self):
+        result1, result2 = run_coroutine(asyncio.gather(
+            self._get_png(),
+            self._get_png(),
+        ))
+
+        self.assertEqual(result1, b"png")
+        self.assertEqual(result2, b"png")
+        self.assertEqual(len(self.encode_png.mock_calls), 1)
+        self.assertDictEqual(self.handler._encoding, {})
+
+    def test_avatar_change_drops_cache(self):
+        run_coroutine(self._get_png())
+
+        self.avatar_manager.on_avatar_changed(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+        )
+        self.encode_png.return_value = b"new png"
+
+        self.assertEqual(run_coroutine(self._get_png()), b"new png")
+        self.assertEqual(len(self.encode_png.mock_calls), 2)
+
+    def test_avatar_change_detaches_encoding_in_flight(self):
+        release = threading.Event()
+        # the encodings may finish in any order, so derive the result from
+        # the rendered image instead of the order of the calls
+        self.handler._render_avatar.side_effect = [
+            unittest.mock.sentinel.old_image,
+            unittest.mock.sentinel.new_image,
+        ]
+        results = {
+            unittest.mock.sentinel.old_image: b"old png",
+            unittest.mock.sentinel.new_image: b"new png",
+        }
+
+        def encode_png(image):
+            release.wait(1)
+            return results[image]
+
+        self.encode_png.side_effect = encode_png
+
+        old_request = asyncio.ensure_future(self._get_png())
+        run_coroutine(asyncio.sleep(0))
+
+        self.avatar_manager.on_avatar_changed(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+        )
+
+        new_request = asyncio.ensure_future(self._get_png())
+        run_coroutine(asyncio.sleep(0))
+        release.set()
+
+        run_coroutine(asyncio.wait([old_request, new_request]))
+
+        self.assertEqual(old_request.result(), b"old png")
+        self.assertEqual(new_request.result(), b"new png")
+        self.assertEqual(run_coroutine(self._get_png()), b"new png")
+        self.assertEqual(len(self.encode_png.mock_calls), 2)
+        self.assertDictEqual(self.handler._encoding, {})
+
+    def _make_request(self):
+        request = unittest.mock.Mock()
+        request.requestUrl.return_value = Qt.QUrl(
+            "avatar:/?account={}&peer={}#1".format(TEST_JID1, TEST_JID2)
+        )
+        return request
+
+    def test_requestStarted_replies_with_png(self):
+        request = self._make_request()
+        self.handler._get_png = CoroutineMock()
+        self.handler._get_png.return_value = b"png"
+
+        self.handler.requestStarted(request)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.accounts.lookup_jid.assert_called_once_with(TEST_JID1)
+        self.handler._get_png.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+            None,
+            "1",
+        )
+        request.reply.assert_called_once_with(
+            b"image/png",
+            unittest.mock.ANY,
+        )
+        _, (_, buffer_), _ = request.reply.mock_calls[0]
+        self.assertEqual(bytes(buffer_.data()), b"png")
+
+    def test_requestStarted_skips_reply_if_job_was_destroyed(self):
+        request = self._make_request()
+
+        async def get_png(*args):
+            # the web engine drops the job while the image is encoded
+            for (_, (callback,), _) in request.destroyed.connect.mock_calls:
+                callback()
+            return b"png"
+
+        self.handler._get_png = unittest.mock.Mock(side_effect=get_png)
+
+        self.handler.requestStarted(request)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.handler._get_png.assert_called_once_with(
+            unittest.mock.sentinel.account,
+            TEST_JID2,
+            None,
+            "1",
+        )
+        request.reply.assert_not_called()
+        request.destroyed.disconnect.assert_not_called()
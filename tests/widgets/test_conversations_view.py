@@ -0,0 +1,60 @@
+import unittest
+import unittest.mock
+
+import jabbercat.avatar
+
+from jabbercat import Qt
+
+import jabbercat.widgets.conversations_view as conversations_view
+
+
+class TestConversationItemDelegate(unittest.TestCase):
+    def setUp(self):
+        self.avatar = unittest.mock.Mock(spec=jabbercat.avatar.AvatarManager)
+        self.delegate = conversations_view.ConversationItemDelegate(
+            self.avatar,
+        )
+        self.painter = unittest.mock.Mock(spec=Qt.QPainter)
+        self.option = Qt.QStyleOptionViewItem()
+        self.option.rect = Qt.QRect(0, 0, 200, 40)
+        self.preview = ("Romeo", "O, she doth teach the torches to burn "
+                        "bright! " * 4, None)
+
+    def _draw(self, font):
+        metrics = unittest.mock.Mock(spec=Qt.QFontMetrics)
+        metrics.ascent.return_value = 10
+        metrics.descent.return_value = 2
+        metrics.elidedText.return_value = "elided with " + font.family()
+        self.delegate._draw_preview_text(
+            self.painter,
+            self.option,
+            Qt.QColor(Qt.Qt.black),
+            Qt.QPoint(0, 0),
+            font,
+            metrics,
+            self.preview,
+        )
+        return metrics
+
+    def _drawn_text(self):
+        _, _, text = self.painter.drawText.mock_calls[-1][1]
+        return text
+
+    def test_reuses_elided_preview(self):
+        font = Qt.QFont("Foo")
+        self._draw(font)
+        metrics = self._draw(font)
+
+        metrics.elidedText.assert_not_called()
+        self.assertEqual(self._drawn_text(), "elided with Foo")
+
+    def test_elides_preview_again_for_other_font(self):
+        self._draw(Qt.QFont("Foo"))
+        metrics = self._draw(Qt.QFont("Bar"))
+
+        metrics.elidedText.assert_called_once_with(
+            unittest.mock.ANY,
+            Qt.Qt.ElideRight,
+            unittest.mock.ANY,
+        )
+        self.assertEqual(self._drawn_text(), "elided with Bar")
@@ -0,0 +1,82 @@
+import unittest
+import unittest.mock
+
+import jabbercat.avatar
+
+from jabbercat import Qt
+
+import jabbercat.widgets.misc as misc
+
+
+class TestAvatarPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.avatar = unittest.mock.Mock(spec=jabbercat.avatar.AvatarManager)
+
+        self.model = Qt.QStandardItemModel()
+        for i in range(30):
+            item = Qt.QStandardItem(str(i))
+            item.setSizeHint(Qt.QSize(100, 20))
+            self.model.appendRow(item)
+
+        self.view = Qt.QListView()
+        self.view.setVerticalScrollMode(Qt.QAbstractItemView.ScrollPerPixel)
+        self.view.setModel(self.model)
+        self.view.resize(100, 100)
+        self.view.show()
+
+        self.prefetcher = misc.AvatarPrefetcher(
+            self.view,
+            self.avatar,
+            lambda index: ("a", index.data()),
+            overscan=2,
+        )
+
+    def tearDown(self):
+        self.view.hide()
+        del self.prefetcher
+        del self.view
+
+    def _keys(self, rows):
+        return [("a", str(row)) for row in rows]
+
+    def _cancelled(self):
+        return sorted(
+            (args for _, args, _ in self.avatar.cancel_fetch.mock_calls),
+            key=lambda key: int(key[1]),
+        )
+
+    def test_prefetches_visible_rows_and_overscan(self):
+        self.prefetcher.update()
+
+        _, (visible, _), _ = self.avatar.mark_visible.mock_calls[-1]
+        self.assertEqual(visible, self._keys(range(0, 5)))
+        self.avatar.prefetch.assert_called_once_with(
+            self._keys(range(0, 7)),
+        )
+        self.avatar.cancel_fetch.assert_not_called()
+
+    def test_cancels_rows_which_left_the_range(self):
+        self.prefetcher.update()
+
+        self.view.verticalScrollBar().setValue(200)
+        self.prefetcher.update()
+
+        self.assertEqual(self._cancelled(), self._keys(range(0, 7)))
+        _, (prefetched,), _ = self.avatar.prefetch.mock_calls[-1]
+        self.assertSetEqual(set(prefetched), set(self._keys(range(8, 17))))
+
+    def test_keeps_rows_which_stay_in_range(self):
+        self.prefetcher.update()
+
+        self.view.verticalScrollBar().setValue(60)
+        self.prefetcher.update()
+
+        self.assertEqual(self._cancelled(), self._keys(range(0, 1)))
+
+    def test_cancels_all_rows_when_hidden(self):
+        self.prefetcher.update()
+
+        self.view.hide()
+        self.prefetcher.update()
+
+        self.assertEqual(self._cancelled(), self._keys(range(0, 7)))
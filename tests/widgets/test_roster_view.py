@@ -0,0 +1,165 @@
+import unittest
+import unittest.mock
+
+import jabbercat.avatar
+
+from jabbercat import Qt
+
+import jabbercat.widgets.roster_view as roster_view
+
+
+class TestRosterItemDelegate(unittest.TestCase):
+    def setUp(self):
+        self.avatar = unittest.mock.Mock(spec=jabbercat.avatar.AvatarManager)
+        self.delegate = roster_view.RosterItemDelegate(self.avatar)
+
+        self.model = Qt.QStandardItemModel()
+        for i in range(20):
+            item = Qt.QStandardItem(str(i))
+            item.setSizeHint(Qt.QSize(100, 20))
+            self.model.appendRow(item)
+
+        self.view = Qt.QListView()
+        self.view.setModel(self.model)
+        self.view.resize(100, 100)
+        self.view.setVerticalScrollMode(Qt.QAbstractItemView.ScrollPerPixel)
+        self.view.doItemsLayout()
+        self.delegate.watch_view(self.view)
+
+        # keep the wrapper alive so that the patched update is found
+        self.viewport = self.view.viewport()
+        self.update = unittest.mock.Mock()
+        self.viewport.update = self.update
+
+        self.tag_rect = Qt.QRectF(10, 5, 20, 8)
+
+    def tearDown(self):
+        del self.viewport.update
+        del self.view
+        del self.delegate
+
+    def _hover(self, row, tag="foo"):
+        return (
+            Qt.QPersistentModelIndex(self.model.index(row, 0)),
+            tag,
+            self.tag_rect,
+            self.view,
+        )
+
+    def _expected_rect(self, row):
+        item_rect = self.view.visualRect(self.model.index(row, 0))
+        return self.tag_rect.translated(
+            Qt.QPointF(item_rect.topLeft())
+        ).toAlignedRect()
+
+    def test_set_hover_repaints_tag(self):
+        self.delegate._set_hover(self._hover(1))
+
+        self.update.assert_called_once_with(self._expected_rect(1))
+        self.assertEqual(
+            self.delegate._hovered_tag(self.model.index(1, 0)),
+            "foo",
+        )
+        self.assertIsNone(self.delegate._hovered_tag(self.model.index(2, 0)))
+
+    def test_set_hover_ignores_same_tag(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        self.delegate._set_hover(self._hover(1))
+
+        self.update.assert_not_called()
+
+    def test_set_hover_repaints_old_and_new_tag(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        self.delegate._set_hover(self._hover(2, "bar"))
+
+        self.assertSequenceEqual(
+            self.update.mock_calls,
+            [
+                unittest.mock.call(self._expected_rect(1)),
+                unittest.mock.call(self._expected_rect(2)),
+            ]
+        )
+
+    def test_clear_hover_repaints_where_the_item_is_now(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        self.model.insertRow(0, Qt.QStandardItem("new"))
+        self.view.doItemsLayout()
+        self.delegate.clear_hover()
+
+        self.assertIsNone(self.delegate._hover)
+        self.update.assert_called_once_with(self._expected_rect(2))
+
+    def test_clear_hover_skips_removed_item(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        self.model.removeRow(1)
+        self.delegate.clear_hover()
+
+        self.assertIsNone(self.delegate._hover)
+        self.update.assert_not_called()
+
+    def test_leaving_viewport_clears_hover(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        Qt.QApplication.sendEvent(self.viewport, Qt.QEvent(Qt.QEvent.Leave))
+
+        self.assertIsNone(self.delegate._hover)
+        self.update.assert_called_once_with(self._expected_rect(1))
+
+    def test_scrolling_clears_hover(self):
+        self.delegate._set_hover(self._hover(1))
+        self.update.reset_mock()
+
+        self.view.verticalScrollBar().setValue(30)
+
+        self.assertIsNone(self.delegate._hover)
+        self.update.assert_called_once_with(self._expected_rect(1))
+        self.assertEqual(
+            self._expected_rect(1),
+            self.tag_rect.translated(0, -10).toAlignedRect(),
+        )
+
+    def test_entering_viewport_clears_hover(self):
+        self.delegate._set_hover(self._hover(1))
+
+        self.view.viewportEntered.emit()
+
+        self.assertIsNone(self.delegate._hover)
+
+    def test_mouse_move_over_tag_stores_rect_relative_to_item(self):
+        index = self.model.index(3, 0)
+        option = Qt.QStyleOptionViewItem()
+        option.rect = self.view.visualRect(index)
+        option.widget = self.view
+        event = Qt.QMouseEvent(
+            Qt.QEvent.MouseMove,
+            Qt.QPointF(option.rect.topLeft()) + Qt.QPointF(15, 8),
+            Qt.Qt.NoButton,
+            Qt.Qt.NoButton,
+            Qt.Qt.NoModifier,
+        )
+
+        with unittest.mock.patch.object(
+                self.delegate, "_hit_test_tags") as hit_test_tags, \
+                unittest.mock.patch.object(
+                    self.delegate, "_get_tag_key"):
+            hit_test_tags.return_value = (
+                "foo",
+                self.tag_rect.translated(Qt.QPointF(option.rect.topLeft())),
+            )
+            self.delegate.editorEvent(event, self.model, option, index)
+
+        hover_index, tag, rect, view = self.delegate._hover
+        self.assertEqual(hover_index, index)
+        self.assertEqual(tag, "foo")
+        self.assertEqual(rect, self.tag_rect)
+        self.assertIs(view, self.view)
+        self.update.assert_called_once_with(self._expected_rect(3))